@@ -1,14 +1,40 @@
+import asyncio
 import sys
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+STARTED = time.perf_counter()
 
 # Add project root to path so 'src' can be imported
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from src.hybrid_recommender import recommend_for_user, similar_products, search_product
+from api.schemas import EventBatch, SortOrder
+
+IMPORTED = time.perf_counter()
+# Loads the catalog + active model version (per-phase timings are logged by the snapshot)
+from src.hybrid_recommender import (
+    cache_stats,
+    current,
+    query_log,
+    record_events,
+    reload_in_background,
+    search_params,
+    status,
+    warm_cache,
+    watch,
+)
+from src.payload_cache import encode
 import uvicorn
 
+LOADED = time.perf_counter()
+
+# Required in the X-Admin-Token header of /admin/* calls; admin endpoints are off without it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 app = FastAPI()
 
 app.add_middleware(
@@ -19,13 +45,118 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_model_watch():
+    """Pick up newly published model versions / catalog changes without a restart."""
+    watch()
+    # Off the startup path: the first requests are served while the cache fills
+    threading.Thread(target=warm_cache, name="cache-warm", daemon=True).start()
+    print(f"⏱️ API ready in {time.perf_counter() - STARTED:.2f}s "
+          f"(framework imports {IMPORTED - STARTED:.2f}s, recommender {LOADED - IMPORTED:.2f}s, "
+          f"startup {time.perf_counter() - LOADED:.2f}s)")
+
+@app.on_event("shutdown")
+def flush_query_log():
+    """Write out searches still buffered for cache warming."""
+    query_log.flush()
+
+def json_response(body: bytes):
+    """Responses are assembled from pre-encoded product payloads."""
+    return Response(content=body, media_type="application/json")
+
+# Each handler takes the current snapshot once, so rows and payloads always come
+# from the same catalog even if a reload swaps snapshots mid-request.
+# Single-result endpoints go through the snapshot's response cache.
+
 @app.get("/recommend/user/{user_id}")
 def recommend_user(user_id: int, n: int = 10):
-    return recommend_for_user(user_id, n)
+    snap = current()
+    return json_response(snap.cached_json(
+        ("user", user_id, n), lambda: snap.payload_json(snap.recommend_rows_for_user(user_id, n)), live=True
+    ))
+
+@app.get("/recommend/users")
+def recommend_users(user_ids: list[int] = Query(...), n: int = 10):
+    """Batch recommendations: ?user_ids=1&user_ids=2 -> {"1": [...], "2": [...]}"""
+    snap = current()
+    user_ids = list(dict.fromkeys(user_ids))
+    results = snap.recommend_rows_for_users(user_ids, n)
+    return json_response(
+        b"{" + b",".join(
+            encode(str(u)) + b":" + snap.payload_json(rows) for u, rows in zip(user_ids, results)
+        ) + b"}"
+    )
+
+@app.get("/recommend/hybrid/{user_id}")
+def recommend_hybrid(user_id: int, n: int = 10):
+    """CF scores blended with similarity to the user's content profile."""
+    snap = current()
+    return json_response(snap.cached_json(
+        ("hybrid", user_id, n), lambda: snap.payload_json(snap.hybrid_rows_for_user(user_id, n)), live=True
+    ))
+
+@app.get("/recommend/popular")
+def recommend_popular(n: int = 10, category: str = None):
+    snap = current()
+    return json_response(snap.cached_json(
+        ("popular", n, category), lambda: snap.payload_json(snap.popular_rows(n, category)), live=True
+    ))
+
+@app.get("/recommend/trending")
+def recommend_trending(n: int = 10):
+    snap = current()
+    return json_response(snap.cached_json(
+        ("trending", n), lambda: snap.payload_json(snap.trending_rows(n)), live=True
+    ))
 
 @app.get("/recommend/product/{product_id}")
 def recommend_product(product_id: int, n: int = 10):
-    return similar_products(product_id, n)
+    snap = current()
+    return json_response(snap.cached_json(
+        ("similar", product_id, n), lambda: snap.payload_json(snap.similar_product_rows(product_id, n))
+    ))
+
+@app.get("/recommend/product/{product_id}/also-bought")
+def recommend_also_bought(product_id: int, n: int = 10):
+    """Customers also bought: item-item CF neighbors, topped up with similar products."""
+    snap = current()
+    return json_response(snap.cached_json(
+        ("also_bought", product_id, n), lambda: snap.payload_json(snap.also_bought_rows(product_id, n)), live=True
+    ))
+
+@app.post("/events")
+def log_events(batch: EventBatch):
+    """Append interaction events to the log and fold them into the live CF models."""
+    try:
+        applied = record_events([e.model_dump() for e in batch.events])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"applied": applied}
+
+def require_admin(token):
+    if not ADMIN_TOKEN or token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/model")
+def model_status(x_admin_token: str = Header(None)):
+    """Model version / catalog being served and the state of the last reload."""
+    require_admin(x_admin_token)
+    return status()
+
+@app.post("/admin/reload", status_code=202)
+def reload_model(force: bool = False, x_admin_token: str = Header(None)):
+    """
+    Load the active model version and catalog in the background and swap them in;
+    requests keep being served from the old snapshot until it is ready.
+    """
+    require_admin(x_admin_token)
+    return {"started": reload_in_background(force), **status()}
+
+@app.get("/admin/metrics")
+def metrics(x_admin_token: str = Header(None)):
+    """Response / query-vector / LLM parse cache hit rates, sizes and hit vs. miss latency."""
+    require_admin(x_admin_token)
+    return {**cache_stats(), "llm_parse": parse_cache.stats()}
 
 @app.get("/search")
 def search_products_endpoint(
@@ -34,31 +165,57 @@ def search_products_endpoint(
     min_price: float = None,
     max_price: float = None,
     category: str = None,
-    brand: str = None
+    brand: str = None,
+    sort: SortOrder = None
 ):
     """
     Search products.
-    First tries partial keyword match.
-    If few/no results, uses vector semantic search.
+    One pass over the filtered rows scores every candidate by BM25 keyword match
+    and vector similarity and ranks them by the blended score
+    (HYBRID_KEYWORD_WEIGHT / HYBRID_VECTOR_WEIGHT).
     Supports filtering by price, category, and brand.
+    Without a query, results follow `sort` (rating, discount, price_asc, price_desc, stock).
     """
-    return search_product(
+    params = search_params(
         q, 
         n, 
         min_price=min_price, 
         max_price=max_price, 
         category=category, 
-        brand=brand
+        brand=brand,
+        sort=sort.value if sort else None
     )
+    query_log.append(params)
+    return json_response(current().search_json(**params))
+
+
 
+# litellm itself is imported by a startup thread (see preload_litellm)
+from src.llm_parser import GROQ_API_KEY, aparse_query_with_llm, load_litellm, parse_cache
+from src.query_parser import FAST_PARSE_MIN_CONFIDENCE
 
+# /smart-search runs on the event loop, so waiting on the LLM holds no thread.
+# Its CPU-bound search step runs here instead of in the shared threadpool that
+# serves the sync endpoints.
+SEARCH_THREADS = int(os.getenv("SEARCH_THREADS", "4"))
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="smart-search")
 
-from src.llm_parser import parse_query_with_llm
+@app.on_event("startup")
+def preload_litellm():
+    """Import litellm (seconds) in the background so no /smart-search pays for it on the event loop."""
+    if GROQ_API_KEY:
+        threading.Thread(target=load_litellm, name="litellm-import", daemon=True).start()
+
+def _smart_search_products(params):
+    query_log.append(params)
+    return current().search_json(**params)
 
 @app.get("/smart-search")
-def smart_search_endpoint(q: str = "", history: str = None, n: int = 5):
+async def smart_search_endpoint(q: str = "", history: str = None, n: int = 5):
     """
-    Smart search using LLM to parse natural language query into filters.
+    Smart search: parses a natural language query into filters.
+    Simple queries are parsed locally from the catalog vocabularies; the LLM is
+    only called when that parse is not confident or depends on the history.
     Supports 'history' as a JSON string of previous messages.
     """
     import json
@@ -69,10 +226,14 @@ def smart_search_endpoint(q: str = "", history: str = None, n: int = 5):
         except:
             pass
 
-    filters = parse_query_with_llm(q, history=parsed_history)
-    print(f"Parsed Agentic State: {filters}")
+    filters = current().query_parser.parse(q, history=parsed_history)
+    if filters["confidence"] >= FAST_PARSE_MIN_CONFIDENCE:
+        print(f"Parsed Agentic State (fast path, confidence {filters['confidence']}): {filters}")
+    else:
+        filters = await aparse_query_with_llm(q, history=parsed_history)
+        print(f"Parsed Agentic State: {filters}")
     
-    products = search_product(
+    params = search_params(
         query=filters.get("search_term", q),
         n=n,
         min_price=filters.get("min_price"),
@@ -80,18 +241,22 @@ def smart_search_endpoint(q: str = "", history: str = None, n: int = 5):
         category=filters.get("category"),
         brand=filters.get("brand")
     )
+    products = await asyncio.get_running_loop().run_in_executor(
+        search_executor, _smart_search_products, params
+    )
 
-    return {
-        "conversational_response": filters.get("conversational_response"),
-        "products": products,
-        "filters": {
+    # Same envelope as before; the product list is spliced in from cached payloads
+    return json_response(
+        b'{"conversational_response":' + encode(filters.get("conversational_response")) +
+        b',"products":' + products +
+        b',"filters":' + encode({
             "search_term": filters.get("search_term"),
             "brand": filters.get("brand"),
             "max_price": filters.get("max_price"),
             "category": filters.get("category")
-        },
-        "intent": filters.get("intent")
-    }
+        }) +
+        b',"intent":' + encode(filters.get("intent")) + b'}'
+    )
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,25 @@
+import os
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.filter_index import SORT_ORDERS
+
+# Events per POST /events; each touched user / product is re-scored on the request path
+EVENTS_MAX_BATCH = int(os.getenv("EVENTS_MAX_BATCH", "1000"))
+
+
+class Event(BaseModel):
+    user_id: int
+    product_id: int
+    event_type: str  # view | cart | purchase
+    ts: Optional[float] = None  # unix seconds; defaults to the time it is logged
+
+
+class EventBatch(BaseModel):
+    events: List[Event] = Field(..., max_length=EVENTS_MAX_BATCH)
+
+
+# /search `sort` values; anything else is rejected with a 422
+SortOrder = Enum("SortOrder", {name: name for name in SORT_ORDERS}, type=str)
@@ -0,0 +1 @@
+"""Synthetic-data benchmarks for training and serving (see benchmarks/run.py)."""
@@ -0,0 +1,156 @@
+"""
+Synthetic catalog + interactions with the same schemas as data/products.csv
+and data/interactions.csv, for benchmarking at sizes the real data does not reach.
+
+Titles and descriptions are built from per-category product types, generated
+brand names, specs and description templates modeled on the scraped catalog,
+so TF-IDF vocabularies and keyword hit rates look like the real thing.
+Interaction popularity is Zipf-distributed; users mostly stay in a few categories.
+
+python -m benchmarks.generate <n_products> <n_interactions> <out_dir>
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PRODUCT_COLUMNS = [
+    "product_id", "title", "category_id", "description", "image_link",
+    "price", "discount", "stock", "seller_name", "scraped_url",
+]
+INTERACTION_COLUMNS = ["user_id", "product_id", "event_type", "weight", "ts"]
+EVENTS = (("view", 1.0, 0.7), ("cart", 3.0, 0.2), ("purchase", 5.0, 0.1))  # type, weight, share
+
+CATEGORIES = {
+    7: ["Rotary Drill Machine", "Jigsaw", "Air Blower", "Impact Wrench", "Angle Grinder", "Electric Nibbler",
+        "Hammer Drill", "Circular Saw", "Heat Gun", "Marble Cutter"],
+    8: ["Temperature Sensor", "Pressure Gauge", "Digital Multimeter", "Clamp Meter", "Infrared Thermometer",
+        "Moisture Meter", "Sound Level Meter"],
+    9: ["SMF Battery", "Inverter Battery", "Lithium Ion Battery", "Tubular Battery", "Battery Charger"],
+    10: ["Solar LED Lamp", "Solar Lantern", "LED Flood Light", "Emergency Light", "LED Batten", "Street Light"],
+    11: ["Safety Helmet", "Safety Shoes", "Safety Gloves", "Safety Goggles", "Ear Muff", "Reflective Jacket"],
+    12: ["Spiral Pointed Tap", "Parallel Shank Drill", "End Mill", "Hole Saw", "Reamer", "Countersink"],
+    13: ["Pipe Wrench", "Combination Spanner", "Socket Set", "Screwdriver Set", "Adjustable Wrench", "Plier"],
+    14: ["Submersible Pump", "Monoblock Pump", "Pressure Washer", "Garden Sprayer", "Water Pump"],
+}
+COLORS = ["Red", "Blue", "Black", "Yellow", "Green", "Orange", "Grey", "White", "Silver"]
+MATERIALS = ["Stainless Steel", "HSS", "Carbide", "ABS Plastic", "Aluminium", "Cast Iron", "Rubber"]
+USES = ["electricians", "plumbers", "carpenters", "home use", "construction workers", "workshops",
+        "industrial maintenance", "automotive repair", "fabricators", "farmers"]
+SYLLABLES = ["ing", "co", "bel", "tor", "max", "pro", "vol", "tek", "gro", "ve", "ra", "mis", "ter",
+             "jak", "hill", "sky", "am", "ron", "to", "tem", "mir", "an", "da", "dex", "fort"]
+TEMPLATES = [
+    "The {brand} {title_type} is a powerful tool that can handle a variety of jobs. "
+    "With a power input of {power} W, it is ideal for {use} and {use2}.",
+    "{brand} {title_type} is a premium quality product from {brand}. All {brand} products are "
+    "manufactured using quality assured {material} and advanced techniques.",
+    "Looking for a {title_type} that doesn't disappoint? The {brand} {model} weighs around {weight} kg "
+    "and comes in {color}, so it is easy to carry to any site.",
+    "Browse through the extensive list of {title_type}s. Shop online for other {brand} {title_type}s "
+    "available at the lowest price range.",
+    "Featuring a {size} mm {material} body, this {title_type} offers reliable performance for {use}.",
+]
+
+
+def _brands(rng, n):
+    """Pronounceable made-up brand names."""
+    names = set()
+    while len(names) < n:
+        parts = rng.choice(SYLLABLES, size=rng.integers(2, 4))
+        names.add("".join(parts).capitalize())
+    return sorted(names)
+
+
+def generate_products(n, seed=0):
+    rng = np.random.default_rng(seed)
+    brands = _brands(rng, max(20, min(2000, n // 50)))
+    category_ids = np.array(list(CATEGORIES))
+    cats = rng.choice(category_ids, size=n)
+    brand_idx = rng.zipf(1.5, size=n) % len(brands)
+    power = rng.choice([300, 350, 500, 600, 700, 750, 1050, 1200, 2000], size=n)
+    size = rng.choice([5, 6, 8, 10, 12, 13, 16, 20], size=n)
+
+    titles, descriptions = [], []
+    for i in range(n):
+        brand = brands[brand_idx[i]]
+        title_type = CATEGORIES[cats[i]][rng.integers(len(CATEGORIES[cats[i]]))]
+        model = f"{brand[:3].upper()}-{rng.integers(10, 9999)}{chr(65 + rng.integers(26))}"
+        color = COLORS[rng.integers(len(COLORS))]
+        fields = {
+            "brand": brand, "title_type": title_type, "model": model, "color": color,
+            "power": power[i], "size": size[i], "weight": round(float(rng.uniform(0.2, 12)), 2),
+            "material": MATERIALS[rng.integers(len(MATERIALS))],
+            "use": USES[rng.integers(len(USES))], "use2": USES[rng.integers(len(USES))],
+        }
+        titles.append(f"{brand} {size[i]}mm {power[i]}W {color} {title_type}, {model}")
+        picked = rng.choice(len(TEMPLATES), size=rng.integers(2, 5), replace=False)
+        descriptions.append(" ".join(TEMPLATES[t].format(**fields) for t in sorted(picked)))
+
+    ids = np.arange(1, n + 1)
+    return pd.DataFrame({
+        "product_id": ids,
+        "title": titles,
+        "category_id": cats.astype(float),
+        "description": descriptions,
+        # real rows carry large inline base64 images; a short stand-in keeps files manageable
+        "image_link": [f"data:image/webp;base64,UklGR{i:08x}AABXRUJQVlA4" for i in ids],
+        "price": np.round(rng.lognormal(7.5, 1.0, size=n), 2),
+        "discount": rng.choice([0, 5, 10, 15, 20, 30, 40, 50], size=n).astype(float),
+        "stock": rng.integers(0, 200, size=n),
+        "seller_name": np.nan,
+        "scraped_url": [f"https://example.com/p/{i}" for i in ids],
+    })[PRODUCT_COLUMNS]
+
+
+def generate_interactions(n, products, seed=0):
+    """Zipf product popularity; each user draws most of their events from 1-3 favourite categories."""
+    rng = np.random.default_rng(seed + 1)
+    now = time.time()
+    n_users = max(10, n // 8)
+    product_ids = products["product_id"].to_numpy()
+    cats = products["category_id"].to_numpy()
+    by_cat = {c: product_ids[cats == c] for c in np.unique(cats)}
+    cat_list = list(by_cat)
+
+    users = (rng.zipf(1.2, size=n) - 1) % n_users + 1
+    favourite = rng.integers(len(cat_list), size=(n_users + 1, 3))
+    in_favourite = rng.random(n) < 0.8
+    picks = np.empty(n, dtype=product_ids.dtype)
+    picks[~in_favourite] = product_ids[(rng.zipf(1.3, size=int((~in_favourite).sum())) - 1) % len(product_ids)]
+    slot = favourite[users, rng.integers(3, size=n)]
+    for c_idx, c in enumerate(cat_list):
+        mask = in_favourite & (slot == c_idx)
+        pool = by_cat[c]
+        picks[mask] = pool[(rng.zipf(1.3, size=int(mask.sum())) - 1) % len(pool)]
+
+    kinds = rng.choice(len(EVENTS), size=n, p=[share for _, _, share in EVENTS])
+    return pd.DataFrame({
+        "user_id": users,
+        "product_id": picks,
+        "event_type": np.array([e for e, _, _ in EVENTS])[kinds],
+        "weight": np.array([w for _, w, _ in EVENTS])[kinds],
+        # spread over the 180 days before generation, oldest first, like a fetch_data.py export
+        "ts": np.sort(rng.uniform(now - 180 * 86400, now, size=n)).round(3),
+    })[INTERACTION_COLUMNS]
+
+
+def generate(n_products, n_interactions, out_dir, seed=0):
+    """Write products.csv + interactions.csv into out_dir (skipped if they already exist)."""
+    os.makedirs(out_dir, exist_ok=True)
+    products_path = os.path.join(out_dir, "products.csv")
+    interactions_path = os.path.join(out_dir, "interactions.csv")
+    if os.path.exists(products_path) and os.path.exists(interactions_path):
+        return out_dir
+    products = generate_products(n_products, seed)
+    generate_interactions(n_interactions, products, seed).to_csv(interactions_path, index=False)
+    products.to_csv(products_path, index=False)
+    return out_dir
+
+
+if __name__ == "__main__":
+    n_products, n_interactions, out_dir = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+    generate(n_products, n_interactions, out_dir)
+    print(f"📦 {n_products} products / {n_interactions} interactions -> {out_dir}")
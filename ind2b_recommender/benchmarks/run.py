@@ -0,0 +1,224 @@
+"""
+Benchmark runner.
+
+For each size, synthetic data is generated (or reused) under benchmarks/data/<size>/,
+then every task runs in a fresh subprocess pointed at it through DATA_DIR / MODEL_DIR:
+  train_model        python src/train_model.py (content + CF), wall time + peak RSS
+  build_als          python src/build_als.py, wall time + peak RSS
+  serve              imports the API's recommender once (load time), then times
+                     search_product / search_by_vector / similar_products / recommend_for_user
+                     per call -> p50 / p95 / p99 ms, calls per second, peak RSS so far
+
+Results are written as JSON (one record per size + task) so runs on different
+commits can be compared with --baseline.
+
+python -m benchmarks.run [--sizes 1k,10k] [--queries 200] [--out path] [--baseline old.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import runpy
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)  # project root
+sys.path.append(BASE_DIR)
+
+from benchmarks.generate import generate
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+SCRIPTS = {"train_model": "src/train_model.py", "build_als": "src/build_als.py"}
+SERVE_FUNCTIONS = ("search_product", "search_by_vector", "similar_products", "recommend_for_user")
+TASKS = tuple(SCRIPTS) + ("serve",)
+RESULT_PREFIX = "BENCH_RESULT "
+REGRESSION_RATIO = 1.2  # --baseline flags metrics that got this much worse
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _latency_stats(ms, seconds):
+    ms = np.asarray(ms)
+    return {
+        "calls": int(ms.size),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "throughput_per_s": round(ms.size / seconds, 1) if seconds > 0 else None,
+    }
+
+
+# ======================
+# WORKERS (run in the subprocess)
+# ======================
+def _run_script(task):
+    """Run a training script as __main__; its own output goes to stderr."""
+    t = time.perf_counter()
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        runpy.run_path(os.path.join(BASE_DIR, SCRIPTS[task]), run_name="__main__")
+    finally:
+        sys.stdout = stdout
+    return [{"task": task, "seconds": round(time.perf_counter() - t, 3), "peak_rss_mb": round(_peak_rss_mb(), 1)}]
+
+
+def _serve_calls(hr, n_queries, seed=0):
+    """(name, callable, args list) per serving function, with inputs drawn from the loaded data."""
+    rng = np.random.default_rng(seed)
+    titles = hr.products_df["title"].dropna().tolist()
+    words = [t.split() for t in rng.choice(titles, size=n_queries)]
+    # 1-3 title words, like typed queries ("drill", "red jigsaw 600w")
+    queries = [" ".join(w[:rng.integers(1, 4)]).strip(",").lower() for w in words]
+    product_ids = rng.choice(hr.products_df["product_id"].to_numpy(), size=n_queries).tolist()
+    users = list(hr.cf_model.user_ids) or [0]
+    user_ids = [users[i] for i in rng.integers(len(users), size=n_queries)]
+    return [
+        ("search_product", hr.search_product, [(q,) for q in queries]),
+        ("search_by_vector", hr.search_by_vector, [(q,) for q in queries]),
+        ("similar_products", hr.similar_products, [(p,) for p in product_ids]),
+        ("recommend_for_user", hr.recommend_for_user, [(u,) for u in user_ids]),
+    ]
+
+
+def _run_serve(n_queries):
+    t = time.perf_counter()
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        import src.hybrid_recommender as hr
+    finally:
+        sys.stdout = stdout
+    results = [{"task": "load_recommender", "seconds": round(time.perf_counter() - t, 3),
+                "peak_rss_mb": round(_peak_rss_mb(), 1)}]
+
+    for name, fn, calls in _serve_calls(hr, n_queries):
+        for args in calls[:min(10, len(calls))]:  # warm-up
+            fn(*args)
+        ms = []
+        start = time.perf_counter()
+        for args in calls:
+            t = time.perf_counter()
+            fn(*args)
+            ms.append((time.perf_counter() - t) * 1000)
+        stats = _latency_stats(ms, time.perf_counter() - start)
+        results.append({"task": name, **stats, "peak_rss_mb": round(_peak_rss_mb(), 1)})
+    return results
+
+
+def worker(task, n_queries):
+    results = _run_serve(n_queries) if task == "serve" else _run_script(task)
+    print(RESULT_PREFIX + json.dumps(results))
+
+
+# ======================
+# DRIVER
+# ======================
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_task(task, data_dir, model_dir, n_queries):
+    """Run one task in a subprocess against data_dir / model_dir -> list of result records."""
+    env = {**os.environ, "DATA_DIR": data_dir, "MODEL_DIR": model_dir}
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--worker", task, "--queries", str(n_queries)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    lines = [l for l in proc.stdout.splitlines() if l.startswith(RESULT_PREFIX)]
+    if proc.returncode != 0 or not lines:
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+        return [{"task": task, "error": "\n".join(tail)}]
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+
+def run(sizes, n_queries, data_root):
+    results = []
+    for label in sizes:
+        n = SIZES[label]
+        data_dir = os.path.join(data_root, label)
+        t = time.perf_counter()
+        generate(n, n, data_dir)
+        print(f"📦 {label}: data ready in {time.perf_counter() - t:.1f}s ({data_dir})")
+        model_dir = os.path.join(data_dir, "models")
+        for task in TASKS:
+            for record in run_task(task, data_dir, model_dir, n_queries):
+                record = {"size": label, "products": n, "interactions": n, **record}
+                results.append(record)
+                print(f"   {json.dumps(record)}")
+    return {
+        "commit": _git_commit(),
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "queries": n_queries,
+        "results": results,
+    }
+
+
+def compare(baseline, current, ratio=REGRESSION_RATIO):
+    """Lines for every (size, task, metric) that got `ratio` times worse than the baseline."""
+    lower_is_better = ("seconds", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+    old = {(r["size"], r["task"]): r for r in baseline["results"]}
+    lines = []
+    for r in current["results"]:
+        before = old.get((r["size"], r["task"]))
+        if before is None:
+            continue
+        for key in lower_is_better + ("throughput_per_s",):
+            a, b = before.get(key), r.get(key)
+            if not a or not b:
+                continue
+            worse = b / a if key in lower_is_better else a / b
+            if worse >= ratio:
+                lines.append(f"{r['size']} {r['task']} {key}: {a} -> {b} ({worse:.2f}x worse)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,10k", help=f"comma-separated, from {list(SIZES)}")
+    parser.add_argument("--queries", type=int, default=200, help="timed calls per serving function")
+    parser.add_argument("--data-root", default=os.path.join(BENCH_DIR, "data"))
+    parser.add_argument("--out", help="JSON output path (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--worker", choices=TASKS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker, args.queries)
+
+    sizes = [s.strip().lower() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes {unknown}, expected {list(SIZES)}")
+
+    report = run(sizes, args.queries, args.data_root)
+    out = args.out or os.path.join(BENCH_DIR, "results", f"{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report)
+        print(f"⚠️ {len(regressions)} regressions vs {args.baseline}" if regressions else "✅ No regressions")
+        for line in regressions:
+            print(f"   {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Implicit-feedback ALS (Hu, Koren & Volinsky) with a conjugate-gradient solver.
+
+Interaction weights r become confidences c = 1 + alpha * r on a binary
+preference. Each half-step solves every user's (or item's) regularized least
+squares system with a few warm-started CG steps instead of a k x k inverse;
+blocks of rows are solved together with sparse products, across threads.
+
+Layout in models/:
+  als_factors.npz   float32 user_factors [U, f], item_factors [P, f], user_ids, product_ids, reg, alpha
+Seen items for masking come from cf_matrix.npz (see collaborative.py).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from src.collaborative import InteractionMatrix, CFModel, reserve_rows, top_unseen
+
+ALS_FILE = "als_factors.npz"
+SOLVE_BLOCK_ROWS = 4096
+FOLD_IN_CG_STEPS = 8  # new events re-solve only the touched users, against fixed item factors
+
+
+def _solve_block(conf, X, Y, YtY, reg, cg_steps):
+    """
+    Warm-started CG for rows of X (in place) on
+    (YtY + Y^T (C_u - I) Y + reg I) x_u = Y^T C_u p_u, for one CSR block of confidences.
+    """
+    x = X
+    row_of_nnz = np.repeat(np.arange(conf.shape[0]), np.diff(conf.indptr))
+    cols = conf.indices
+    extra = conf.data - 1.0  # c_ui - 1 on observed entries
+    Y_nnz = Y[cols]
+
+    def apply(v):
+        # (YtY + reg I) v + sum_i (c_ui - 1) (y_i . v) y_i
+        dots = np.einsum("ij,ij->i", Y_nnz, v[row_of_nnz])
+        weighted = sparse.csr_matrix((extra * dots, cols, conf.indptr), shape=conf.shape)
+        return v @ YtY + reg * v + weighted @ Y
+
+    b = sparse.csr_matrix((conf.data, cols, conf.indptr), shape=conf.shape) @ Y
+    r = b - apply(x)
+    p = r.copy()
+    rs_old = np.einsum("ij,ij->i", r, r)
+    for _ in range(cg_steps):
+        if not rs_old.any():
+            break
+        Ap = apply(p)
+        pAp = np.einsum("ij,ij->i", p, Ap)
+        alpha = np.divide(rs_old, pAp, out=np.zeros_like(rs_old), where=pAp > 0)
+        x += alpha[:, None] * p
+        r -= alpha[:, None] * Ap
+        rs_new = np.einsum("ij,ij->i", r, r)
+        beta = np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=rs_old > 0)
+        p = r + beta[:, None] * p
+        rs_old = rs_new
+    return x
+
+
+def _half_step(conf, X, Y, reg, cg_steps, executor, block_rows=SOLVE_BLOCK_ROWS):
+    """Update every row of X given fixed Y; blocks run on the thread pool."""
+    YtY = Y.T @ Y
+    starts = range(0, X.shape[0], block_rows)
+    futures = [
+        executor.submit(
+            _solve_block, conf[s:s + block_rows], X[s:s + block_rows], Y, YtY, reg, cg_steps
+        )
+        for s in starts
+    ]
+    for s, future in zip(starts, futures):
+        X[s:s + block_rows] = future.result()
+
+
+def train_als(matrix, factors=64, iterations=15, reg=0.01, alpha=40.0, cg_steps=3,
+              n_jobs=None, seed=0, verbose=False):
+    """
+    Fit implicit ALS on a CSR user x product weight matrix.
+    Returns float32 (user_factors [U, factors], item_factors [P, factors]).
+    """
+    matrix = matrix.tocsr().astype(np.float32)
+    conf = matrix.copy()
+    conf.data = 1.0 + alpha * conf.data
+    conf_t = conf.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    n_users, n_items = matrix.shape
+    X = (rng.standard_normal((n_users, factors)) * 0.01).astype(np.float32)
+    Y = (rng.standard_normal((n_items, factors)) * 0.01).astype(np.float32)
+    reg = np.float32(reg)
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1) as executor:
+        for it in range(iterations):
+            _half_step(conf, X, Y, reg, cg_steps, executor)
+            _half_step(conf_t, Y, X, reg, cg_steps, executor)
+            if verbose:
+                print(f"   ALS iteration {it + 1}/{iterations}")
+    return X, Y
+
+
+class ALSModel(CFModel):
+    """Factor matrices + the user-item matrix used to mask already-seen products."""
+
+    def __init__(self, user_factors, item_factors, matrix, user_ids=None, product_ids=None, reg=0.01, alpha=40.0):
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self._bind(matrix, user_ids, product_ids)
+        self.reg = reg
+        self.alpha = alpha
+        self._YtY = None
+
+    @classmethod
+    def build(cls, matrix, user_ids, product_ids, **params):
+        user_factors, item_factors = train_als(matrix, **params)
+        return cls(
+            user_factors, item_factors, matrix, user_ids, product_ids,
+            reg=params.get("reg", 0.01), alpha=params.get("alpha", 40.0),
+        )
+
+    def save(self, model_dir):
+        np.savez(
+            os.path.join(model_dir, ALS_FILE),
+            user_factors=self.user_factors[:len(self.user_ids)],
+            item_factors=self.item_factors[:len(self.product_ids)],
+            user_ids=np.asarray(self.user_ids),
+            product_ids=np.asarray(self.product_ids),
+            reg=np.float32(self.reg),
+            alpha=np.float32(self.alpha),
+        )
+
+    @classmethod
+    def load(cls, model_dir, data=None):
+        """
+        Factors must line up with cf_matrix.npz (both are written by the same training
+        run). `data`: the snapshot's InteractionMatrix, if already loaded.
+        """
+        data = data or InteractionMatrix.load(model_dir)
+        with np.load(os.path.join(model_dir, ALS_FILE)) as saved:
+            if saved["user_ids"].tolist() != data.user_ids or saved["product_ids"].tolist() != data.product_ids:
+                raise ValueError("ALS factors are out of date with cf_matrix.npz; retrain")
+            return cls(
+                saved["user_factors"], saved["item_factors"], data,
+                reg=float(saved["reg"]), alpha=float(saved["alpha"]),
+            )
+
+    def _prepare_updates(self):
+        if self._YtY is None:
+            self._YtY = self.item_factors.T @ self.item_factors  # zero rows for new products add nothing
+
+    def _refresh(self, rows, cols, weights, cg_steps=FOLD_IN_CG_STEPS):
+        """
+        Fold in the touched users: their factors are re-solved against the fixed
+        item factors. New products get zero factors until the next compaction retrains them.
+        """
+        n_users, n_products = self.matrix.shape
+        # Spare rows are zero, so new users / products start with zero factors
+        user_factors = reserve_rows(self.user_factors, n_users)
+        item_factors = reserve_rows(self.item_factors, n_products)
+
+        touched = np.unique(rows)
+        conf = self.matrix.rows(touched, n_products).astype(np.float32)
+        conf.data = 1.0 + self.alpha * conf.data
+        user_factors[touched] = _solve_block(
+            conf, user_factors[touched], item_factors[:n_products], self._YtY, np.float32(self.reg), cg_steps
+        )
+        self.item_factors = item_factors
+        self.user_factors = user_factors
+
+    def recommend(self, uidxs, n, k=None, exclude=None, block_rows=SOLVE_BLOCK_ROWS):
+        """
+        Top-n unseen product columns per user from factor dot products,
+        O(factors * products) per user -> (ids int32 [B, n], scores float32 [B, n]).
+        `k` (neighbor count) is accepted for interface parity with UserKNN and ignored.
+        """
+        uidxs = np.asarray(uidxs, dtype=np.int64)
+        ids = np.full((len(uidxs), n), -1, dtype=np.int32)
+        scores = np.zeros((len(uidxs), n), dtype=np.float32)
+        item_factors = self.item_factors  # may have spare rows, or lag the matrix by one update
+        n_products = min(self.matrix.shape[1], len(item_factors))
+        for start in range(0, len(uidxs), block_rows):
+            block = uidxs[start:start + block_rows]
+            item_scores = self.user_factors[block] @ item_factors[:n_products].T
+            block_ids, block_scores = top_unseen(
+                item_scores, self.matrix.rows(block, n_products), n, exclude, min_score=-np.inf
+            )
+            ids[start:start + len(block)] = block_ids
+            scores[start:start + len(block)] = block_scores
+        return ids, scores
@@ -0,0 +1,176 @@
+"""
+IVF (inverted file) approximate nearest-neighbor index, numpy/scipy only.
+
+Rows are clustered with spherical k-means; a query scores the centroids,
+probes the `nprobe` closest lists and scores only the rows in them exactly.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import model_store, vector_search
+
+ASSIGN_BLOCK_ROWS = 4096
+
+
+def _dense(a):
+    return a.toarray() if sparse.issparse(a) else np.asarray(a)
+
+
+def _normalize_rows(a):
+    norms = np.linalg.norm(a, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return a / norms
+
+
+def assign_lists(matrix, centroids, block_rows=ASSIGN_BLOCK_ROWS):
+    """Closest centroid (max inner product) for every row, scored in blocks."""
+    n = matrix.shape[0]
+    labels = np.empty(n, dtype=np.int32)
+    for start in range(0, n, block_rows):
+        stop = min(n, start + block_rows)
+        sims = _dense(matrix[start:stop] @ centroids.T)
+        labels[start:stop] = sims.argmax(axis=1)
+    return labels
+
+
+def train_kmeans(matrix, n_lists, n_iter=10, sample_size=50000, seed=0):
+    """Spherical k-means centroids (float32, L2-normalized) on a row sample."""
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    sample = matrix
+    if n > sample_size:
+        sample = matrix[np.sort(rng.choice(n, sample_size, replace=False))]
+    s = sample.shape[0]
+    n_lists = max(1, min(n_lists, s))
+
+    centroids = _normalize_rows(_dense(sample[rng.choice(s, n_lists, replace=False)]).astype(np.float32))
+    for _ in range(n_iter):
+        labels = assign_lists(sample, centroids)
+        # Sum rows per cluster with a sparse indicator matrix
+        indicator = sparse.csr_matrix(
+            (np.ones(s, dtype=np.float32), (labels, np.arange(s))), shape=(n_lists, s)
+        )
+        sums = _dense(indicator @ sample).astype(np.float32)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            # Re-seed empty lists from random rows
+            sums[empty] = _dense(sample[rng.choice(s, empty.size, replace=False)])
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Centroids plus CSR-style inverted lists (list_offsets into list_rows)."""
+
+    def __init__(self, centroids, list_offsets, list_rows, nprobe=8):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_iter=10, nprobe=8, seed=0):
+        n = matrix.shape[0]
+        if n_lists is None:
+            n_lists = int(np.sqrt(n)) or 1
+        centroids = train_kmeans(matrix, n_lists, n_iter=n_iter, seed=seed)
+        labels = assign_lists(matrix, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int32)
+        counts = np.bincount(labels, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, offsets, order, nprobe=nprobe)
+
+    def save(self, path, product_ids):
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            product_ids=np.asarray(product_ids),
+        )
+
+    @classmethod
+    def load(cls, path, nprobe=8):
+        """Returns (index, product_ids) so callers can check row alignment."""
+        with np.load(path) as saved:
+            index = cls(saved["centroids"], saved["list_offsets"], saved["list_rows"], nprobe=nprobe)
+            return index, saved["product_ids"]
+
+    def candidates(self, query_vec, nprobe=None):
+        """Sorted rows in the `nprobe` lists closest to the query."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        sims = _dense(query_vec @ self.centroids.T).ravel()
+        probes = vector_search.top_k(sims, nprobe, min_score=-np.inf)
+        parts = [self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in probes]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts)).astype(np.int64)
+
+    def search(self, query_vec, matrix, k, rows=None, nprobe=None):
+        """Approximate top-k (rows, scores); `rows` restricts to filter candidates."""
+        cand = self.candidates(query_vec, nprobe)
+        if rows is not None:
+            cand = np.intersect1d(cand, rows, assume_unique=True)
+        return vector_search.search(query_vec, matrix, k, rows=cand)
+
+
+def recall_report(index, matrix, query_vecs, k=10, nprobes=(1, 2, 4, 8, 16)):
+    """Recall@k and latency of the IVF path vs. exact scoring, per nprobe."""
+    exact, exact_ms = [], []
+    for q in query_vecs:
+        t = time.perf_counter()
+        exact.append(set(vector_search.search(q, matrix, k)[0].tolist()))
+        exact_ms.append((time.perf_counter() - t) * 1000)
+
+    report = []
+    for nprobe in nprobes:
+        if nprobe > index.n_lists:
+            continue
+        recalls, ann_ms = [], []
+        for q, truth in zip(query_vecs, exact):
+            t = time.perf_counter()
+            got = set(index.search(q, matrix, k, nprobe=nprobe)[0].tolist())
+            ann_ms.append((time.perf_counter() - t) * 1000)
+            if truth:
+                recalls.append(len(got & truth) / len(truth))
+        report.append({
+            "nprobe": nprobe,
+            "recall@k": round(float(np.mean(recalls)) if recalls else 1.0, 4),
+            "ann_ms_p50": round(float(np.percentile(ann_ms, 50)), 3),
+            "ann_ms_p95": round(float(np.percentile(ann_ms, 95)), 3),
+            "exact_ms_p50": round(float(np.percentile(exact_ms, 50)), 3),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    # Recall-vs-latency report for the saved index, using catalog titles as queries
+    import pickle
+    import pandas as pd
+
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    MODEL_DIR = model_store.active_dir(os.path.join(BASE_DIR, "models"))
+    DATA_DIR = os.path.join(BASE_DIR, "data")
+
+    tfidf = pickle.load(open(os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl"), "rb"))
+    tfidf_matrix = pickle.load(open(os.path.join(MODEL_DIR, "tfidf_matrix.pkl"), "rb"))
+    index, _ = IVFIndex.load(os.path.join(MODEL_DIR, "ann_ivf.npz"))
+    titles = pd.read_csv(os.path.join(DATA_DIR, "products.csv"))["title"].dropna()
+    queries = [tfidf.transform([t]) for t in titles.sample(min(200, len(titles)), random_state=0)]
+
+    print(f"📊 IVF recall report ({index.n_lists} lists, {len(queries)} queries)")
+    for row in recall_report(index, tfidf_matrix, queries):
+        print(row)
@@ -1,37 +1,37 @@
 """
-User-based KNN Collaborative Filtering (Pure Python)
+Implicit-feedback ALS matrix factorization (numpy/scipy, conjugate gradient)
+
+Retrains the CF artifacts of the active model version with the current
+ALS_* settings. ALS has to see the same matrix the API serves (the active
+cf_matrix.npz plus the event-log tail), and every artifact scored from that
+matrix has to match it, so this runs the same fold-in as
+`python src/train_model.py --compact` and publishes the result.
 """
 
-import pandas as pd
-import numpy as np
-import pickle
 import os
-from sklearn.metrics.pairwise import cosine_similarity
-
-
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
-MODEL_DIR = os.path.join(BASE_DIR, "models")
-DATA_DIR = os.path.join(BASE_DIR, "data")
+import sys
 
-os.makedirs(MODEL_DIR, exist_ok=True)
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Load interactions
-df = pd.read_csv(f"{DATA_DIR}/interactions.csv")
+from src import model_store, train_model
+from src.catalog import load_catalog
+from src.payload_cache import catalog_fingerprint
 
-# Build user-item matrix
-matrix = df.pivot_table(index='user_id', columns='product_id', values='weight', fill_value=0)
+MODEL_DIR = train_model.MODELS_ROOT
+DATA_DIR = train_model.DATA_DIR
 
-user_ids = matrix.index.tolist()
-product_ids = matrix.columns.tolist()
+# New model version, starting from a copy of the active one
+stage_dir = model_store.stage(MODEL_DIR)
+train_model.MODEL_DIR = stage_dir  # train_model reads and writes artifacts here
 
-# Compute cosine similarity between users
-print("🚀 Training user-user similarity...")
-similarity = cosine_similarity(matrix)
+print(f"🚀 Training implicit ALS ({train_model.ALS_PARAMS})...")
+if not train_model.compact_collaborative_filtering():
+    model_store.discard(stage_dir)
+    print("❌ ALS training failed. The active model version is unchanged.")
+    sys.exit(1)
 
-# Save results
-pickle.dump(user_ids, open(f"{MODEL_DIR}/user_ids.pkl", "wb"))
-pickle.dump(product_ids, open(f"{MODEL_DIR}/product_ids.pkl", "wb"))
-pickle.dump(matrix, open(f"{MODEL_DIR}/user_item_matrix.pkl", "wb"))
-pickle.dump(similarity, open(f"{MODEL_DIR}/user_similarity.pkl", "wb"))
+version = model_store.publish(MODEL_DIR, stage_dir, catalog_fingerprint(load_catalog(DATA_DIR).hot))
+print(f"📦 Published model version {version}")
 
-print("🎯 User-KNN ready!")
+print("🎯 ALS ready! Serve it with CF_MODEL=als")
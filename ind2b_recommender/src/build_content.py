@@ -1,38 +1,35 @@
 """
 Content-based similarity using TF-IDF on title + description
+
+Rebuilds the content artifacts of the active model version (TF-IDF vectorizer
+and matrix, top-K neighbor table, ANN index, dense embeddings) from
+data/products.csv with the same recipe as `python src/train_model.py`, and
+publishes the result as a new version. CF artifacts are carried over as is.
 """
 
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
 import os
+import sys
 
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
-MODEL_DIR = os.path.join(BASE_DIR, "models")
-DATA_DIR = os.path.join(BASE_DIR, "data")
-os.makedirs(MODEL_DIR, exist_ok=True)
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Load product data
-df = pd.read_csv(f"{DATA_DIR}/products.csv")
+from src import model_store, train_model
+from src.catalog import load_catalog
+from src.payload_cache import catalog_fingerprint
 
-# Build combined text field
-df["text"] = (
-    df["title"].fillna("") + " " +
-    df["description"].fillna("") + " " +
-    df["sku"].fillna("") + " " +
-    df["category_id"].astype(str) + " " +
-    df["sub_category_id"].astype(str)
-)
+MODEL_DIR = train_model.MODELS_ROOT
+DATA_DIR = train_model.DATA_DIR
 
-vec = TfidfVectorizer(stop_words="english", max_features=5000)
-tfidf_matrix = vec.fit_transform(df["text"])
+# New model version, starting from a copy of the active one
+stage_dir = model_store.stage(MODEL_DIR)
+train_model.MODEL_DIR = stage_dir  # train_model reads and writes artifacts here
 
-# Store similarity matrix
-similarity = cosine_similarity(tfidf_matrix)
+if not train_model.train_content_based():
+    model_store.discard(stage_dir)
+    print("❌ Content training failed. The active model version is unchanged.")
+    sys.exit(1)
 
-pickle.dump(vec, open(f"{MODEL_DIR}/tfidf_vectorizer.pkl", "wb"))
-pickle.dump(similarity, open(f"{MODEL_DIR}/content_similarity.pkl", "wb"))
-df.to_csv("../data/products_indexed.csv", index=False)
+version = model_store.publish(MODEL_DIR, stage_dir, catalog_fingerprint(load_catalog(DATA_DIR).hot))
+print(f"📦 Published model version {version}")
 
 print("🎉 Content-based model saved!")
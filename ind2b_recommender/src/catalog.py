@@ -0,0 +1,313 @@
+"""
+Catalog loader: slim hot table in RAM, heavy fields in a memory-mapped side store.
+
+products.csv carries inline base64 images (`image_link`) and long descriptions.
+Only the columns used for filtering/ranking stay in the serving DataFrame; the
+rest live in data/catalog_store/ as one pre-encoded JSON fragment per row
+(`"description":"...","image_link":"..."`), read lazily through mmap and only
+when a response includes that product.
+
+data/catalog_store/ holds typed columnar snapshots written by the ingest scripts
+(and re-imported from products.csv whenever the CSV changes). Each snapshot is
+an immutable directory; CURRENT names the active one and is swapped atomically,
+so a reader always sees one complete snapshot:
+  CURRENT                      name of the active snapshot directory
+  <snapshot>/snapshot.json     manifest: rows, source CSV stamp, column kinds
+  <col>.npy                    numeric hot column (memory-mapped)
+  <col>.heap / <col>.offsets.npy / <col>.null.npy   string hot column (UTF-8 heap)
+  cold.bin / cold_offsets.npy  heavy columns as pre-encoded JSON fragments
+A catalog_store/ without CURRENT (written before snapshots were versioned) is
+read in place until the next import. CSV stays the import/export format only.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Columns kept resident: ids, ranking and filter keys
+HOT_COLUMNS = (
+    "product_id",
+    "title",
+    "price",
+    "discount",
+    "stock",
+    "rating",
+    "category_id",
+    "sub_category_id",
+    "category_name",
+    "sub_category_name",
+    "seller_name",
+    "seller_id",
+    "brand",
+    "model",
+)
+
+STORE_DIRNAME = "catalog_store"
+MANIFEST = "snapshot.json"
+COLD_HEAP = "cold.bin"
+COLD_OFFSETS = "cold_offsets.npy"
+SNAPSHOT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+KEEP_SNAPSHOTS = 2  # the active snapshot plus the previous one, for readers still loading it
+
+
+def _clean(value):
+    # Same cleaning as the payloads: NaN -> ""
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _mmap_file(path):
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# ======================
+# COLD STORE
+# ======================
+class ColdStore:
+    """Row-indexed heap of pre-encoded JSON fragments for the heavy columns."""
+
+    def __init__(self, heap, offsets, columns):
+        self.heap = heap
+        self.offsets = offsets
+        self.columns = list(columns)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @staticmethod
+    def write(cold_df, store_dir):
+        columns = list(cold_df.columns)
+        offsets = np.zeros(len(cold_df) + 1, dtype=np.int64)
+        with open(os.path.join(store_dir, COLD_HEAP), "wb") as f:
+            for i, values in enumerate(cold_df.itertuples(index=False, name=None)):
+                record = {c: _clean(v) for c, v in zip(columns, values)}
+                # Fragment without the surrounding braces, so it can be spliced into a payload
+                frag = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)[1:-1].encode("utf-8")
+                f.write(frag)
+                offsets[i + 1] = offsets[i] + len(frag)
+        np.save(os.path.join(store_dir, COLD_OFFSETS), offsets)
+
+    @classmethod
+    def open(cls, store_dir, columns):
+        offsets = np.load(os.path.join(store_dir, COLD_OFFSETS), mmap_mode="r")
+        return cls(_mmap_file(os.path.join(store_dir, COLD_HEAP)), offsets, columns)
+
+    def fragment(self, row):
+        """Encoded `"col":value,...` bytes for one row (may be empty)."""
+        return self.heap[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+    def record(self, row):
+        frag = self.fragment(row)
+        return json.loads(b"{" + frag + b"}") if frag else {}
+
+    def column(self, name):
+        """Decode one heavy column for every row (one-off index builds only)."""
+        return [self.record(i).get(name) for i in range(len(self))]
+
+
+class Catalog:
+    """`hot` DataFrame (positional rows) + `cold` ColdStore with the same row order."""
+
+    def __init__(self, hot, cold):
+        self.hot = hot
+        self.cold = cold
+
+    def frame(self, columns):
+        """Temporary frame with the requested hot and cold columns (for index builds)."""
+        out = pd.DataFrame(index=self.hot.index)
+        for col in columns:
+            if col in self.hot.columns:
+                out[col] = self.hot[col]
+            elif col in self.cold.columns:
+                out[col] = self.cold.column(col)
+        return out
+
+    def to_frame(self):
+        """Full catalog (hot + cold columns), e.g. for CSV export."""
+        return self.frame(list(self.hot.columns) + self.cold.columns)
+
+
+def split_columns(columns):
+    hot = [c for c in columns if c in HOT_COLUMNS]
+    cold = [c for c in columns if c not in HOT_COLUMNS]
+    return hot, cold
+
+
+# ======================
+# COLUMNAR SNAPSHOT
+# ======================
+def _write_hot_column(series, store_dir):
+    name = series.name
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        np.save(os.path.join(store_dir, f"{name}.npy"), series.to_numpy())
+        return {"name": name, "kind": "numeric"}
+
+    # String heap: UTF-8 bytes back to back, offsets[i]:offsets[i+1] per row
+    values = series.tolist()
+    null = np.array([v is None or (isinstance(v, float) and v != v) for v in values], dtype=bool)
+    encoded = [b"" if n else str(v).encode("utf-8") for v, n in zip(values, null)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(store_dir, f"{name}.heap"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(store_dir, f"{name}.offsets.npy"), offsets)
+    np.save(os.path.join(store_dir, f"{name}.null.npy"), null)
+    return {"name": name, "kind": "string"}
+
+
+def _read_hot_column(spec, store_dir):
+    name = spec["name"]
+    if spec["kind"] == "numeric":
+        return np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r")
+    heap = _mmap_file(os.path.join(store_dir, f"{name}.heap"))
+    offsets = np.load(os.path.join(store_dir, f"{name}.offsets.npy"))
+    null = np.load(os.path.join(store_dir, f"{name}.null.npy"))
+    values = [
+        None if null[i] else heap[offsets[i]:offsets[i + 1]].decode("utf-8")
+        for i in range(len(null))
+    ]
+    return pd.Series(values, dtype=object)
+
+
+def snapshot_dir(data_dir):
+    """Directory of the active snapshot (catalog_store itself for the unversioned layout)."""
+    store_dir = os.path.join(data_dir, STORE_DIRNAME)
+    path = os.path.join(store_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        return store_dir
+    with open(path) as f:
+        name = f.read().strip()
+    return os.path.join(store_dir, name) if name else store_dir
+
+
+def _prune_snapshots(store_dir, active, keep=KEEP_SNAPSHOTS):
+    """Delete all but the newest `keep` snapshots (never the active one) and unversioned leftovers."""
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if os.path.isfile(path) and name != CURRENT_FILE and not name.startswith("."):
+            os.remove(path)  # flat files of the unversioned layout
+    snapshots = sorted(
+        n for n in os.listdir(store_dir)
+        if not n.startswith(".") and os.path.isdir(os.path.join(store_dir, n))
+    )
+    for name in snapshots[:-keep] if keep > 0 else []:
+        if name != active:
+            # Processes serving it keep their mmaps
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+
+def write_snapshot(df, data_dir, source=None):
+    """
+    Write the columnar snapshot for `df` as a new directory under data_dir/catalog_store
+    and make it the active one. `source` is the path of the CSV it mirrors, so loaders
+    can tell when the CSV changed. Returns the snapshot directory.
+    """
+    store_dir = os.path.join(data_dir, STORE_DIRNAME)
+    os.makedirs(store_dir, exist_ok=True)
+    # Unique per writer; sorts by write time
+    name = f"{time.time_ns()}-{os.getpid()}"
+    tmp_dir = os.path.join(store_dir, f".tmp-{name}")
+    os.makedirs(tmp_dir)
+
+    df = df.reset_index(drop=True)
+    hot_cols, cold_cols = split_columns(df.columns.tolist())
+    hot_specs = [_write_hot_column(df[c], tmp_dir) for c in hot_cols]
+    ColdStore.write(df[cold_cols], tmp_dir)
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump({
+            "version": SNAPSHOT_VERSION,
+            "snapshot": name,
+            "rows": len(df),
+            "created_at": time.time(),
+            "source": source_stamp(source) if source else None,
+            "hot": hot_specs,
+            "cold": cold_cols,
+        }, f)
+
+    # Publish the complete directory, then swap the pointer
+    snapshot = os.path.join(store_dir, name)
+    os.replace(tmp_dir, snapshot)
+    tmp_path = os.path.join(store_dir, f".{CURRENT_FILE}.tmp-{name}")
+    with open(tmp_path, "w") as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(store_dir, CURRENT_FILE))
+    _prune_snapshots(store_dir, name)
+    return snapshot
+
+
+def _read_manifest_at(snapshot):
+    path = os.path.join(snapshot, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_manifest(data_dir):
+    return _read_manifest_at(snapshot_dir(data_dir))
+
+
+def load_snapshot(data_dir):
+    # Resolve CURRENT once, so the manifest and the columns come from the same snapshot
+    snapshot = snapshot_dir(data_dir)
+    manifest = _read_manifest_at(snapshot)
+    hot = pd.DataFrame({spec["name"]: _read_hot_column(spec, snapshot) for spec in manifest["hot"]})
+    return Catalog(hot, ColdStore.open(snapshot, manifest["cold"]))
+
+
+def load_catalog(data_dir, csv_name="products.csv", import_stale=True):
+    """
+    Load from the columnar snapshot; (re-)import products.csv first if it is missing or stale.
+    With import_stale=False a missing or stale snapshot raises ValueError instead.
+    """
+    csv_path = os.path.join(data_dir, csv_name)
+    manifest = read_manifest(data_dir)
+    fresh = manifest is not None and manifest.get("version") == SNAPSHOT_VERSION
+    if fresh and os.path.exists(csv_path):
+        fresh = manifest.get("source") == source_stamp(csv_path)
+    if not fresh:
+        if not import_stale:
+            raise ValueError(
+                f"Catalog snapshot in {os.path.join(data_dir, STORE_DIRNAME)} is missing or older than "
+                f"{csv_name}. Run `python src/catalog.py import` (or train_model.py) first."
+            )
+        write_snapshot(pd.read_csv(csv_path), data_dir, source=csv_path)
+    return load_snapshot(data_dir)
+
+
+def export_csv(data_dir, csv_path):
+    """Write the snapshot back out as CSV."""
+    load_snapshot(data_dir).to_frame().to_csv(csv_path, index=False)
+
+
+if __name__ == "__main__":
+    # python src/catalog.py import | export [csv_path]
+    DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    command = sys.argv[1] if len(sys.argv) > 1 else "import"
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(DATA_DIR, "products.csv")
+    if command == "import":
+        snapshot = write_snapshot(pd.read_csv(csv_path), DATA_DIR, source=csv_path)
+        print(f"📦 Snapshot written to {snapshot}")
+    elif command == "export":
+        export_csv(DATA_DIR, csv_path)
+        print(f"📁 Exported snapshot to {csv_path}")
+    else:
+        print(f"Unknown command '{command}'. Use 'import' or 'export'.")
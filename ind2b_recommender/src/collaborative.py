@@ -0,0 +1,555 @@
+"""
+User-based and item-based KNN collaborative filtering on a sparse user-item matrix.
+
+Layout in models/:
+  cf_matrix.npz         CSR user x product weights + user_ids / product_ids (shared with ALS)
+  user_neighbors.npz    optional top-K neighbor table per user (ids, float32 scores)
+  item_neighbors.npz    top-K co-interaction neighbors per product (ids, float32 scores, product_ids)
+
+User vectors are L2-normalized once at load, so user-user cosine similarity is a
+sparse mat-vec; no users x users matrix is ever materialized. Item-item
+neighbors are computed offline, so serving only sums a user's neighbor lists.
+
+Between compactions the loaded matrix is never rewritten: new events replace
+just the rows they touch (PatchedMatrix), and only those rows are
+re-normalized, so applying events costs O(touched rows), not O(history).
+
+The API loads cf_matrix.npz once per snapshot (InteractionMatrix) and every
+CF model it serves (UserKNN / ItemKNN / ALSModel) shares that one matrix and
+its id maps; add_interactions() merges a batch into it once and then lets
+each model refresh what it derives from the touched rows.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src import vector_search
+
+CF_FILE = "cf_matrix.npz"
+NEIGHBORS_FILE = "user_neighbors.npz"
+ITEM_NEIGHBORS_FILE = "item_neighbors.npz"
+BATCH_BLOCK_BYTES = 64 * 1024 * 1024  # dense users x products score block in recommend()
+
+
+def normalize_rows(matrix):
+    """Row-wise L2-normalized copy of a CSR matrix (empty rows stay empty)."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix, dtype=np.float32)
+
+
+def build_user_item(interactions):
+    """
+    (CSR float32 user x product weights, user_ids, product_ids) from an interactions frame.
+    Repeated (user, product) pairs are averaged, like the old pivot_table.
+    """
+    pairs = interactions.groupby(["user_id", "product_id"], sort=False)["weight"].mean().reset_index()
+    users = pd.Categorical(pairs["user_id"])
+    products = pd.Categorical(pairs["product_id"])
+    matrix = sparse.csr_matrix(
+        (pairs["weight"].to_numpy(dtype=np.float32), (users.codes, products.codes)),
+        shape=(len(users.categories), len(products.categories)),
+    )
+    matrix.sort_indices()
+    return matrix, users.categories.tolist(), products.categories.tolist()
+
+
+def save_matrix(model_dir, matrix, user_ids, product_ids):
+    """Write cf_matrix.npz; any saved neighbor table belonged to the previous matrix."""
+    neighbors_path = os.path.join(model_dir, NEIGHBORS_FILE)
+    if os.path.exists(neighbors_path):
+        os.remove(neighbors_path)
+    np.savez(
+        os.path.join(model_dir, CF_FILE),
+        data=matrix.data,
+        indices=matrix.indices,
+        indptr=matrix.indptr,
+        shape=np.array(matrix.shape),
+        user_ids=np.asarray(user_ids),
+        product_ids=np.asarray(product_ids),
+    )
+
+
+def load_matrix(model_dir):
+    """(CSR user x product weights, user_ids, product_ids)"""
+    with np.load(os.path.join(model_dir, CF_FILE)) as saved:
+        matrix = sparse.csr_matrix(
+            (saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"])
+        )
+        return matrix, saved["user_ids"].tolist(), saved["product_ids"].tolist()
+
+
+def top_unseen(item_scores, seen, n, exclude=None, min_score=0.0):
+    """
+    Per-row top-n of a dense [B, products] score block, skipping the nonzero
+    columns of the sparse `seen` block and the `exclude` column mask. Columns
+    past the end of `exclude` (products added after it was built) are skipped too.
+    """
+    item_scores[seen.nonzero()] = -np.inf
+    if exclude is not None:
+        known = item_scores[:, :len(exclude)]
+        known[:, exclude] = -np.inf
+        item_scores[:, len(exclude):] = -np.inf
+    return vector_search.top_k_rows(item_scores, n, min_score=min_score)
+
+
+def _unit(data):
+    norm = np.sqrt(np.dot(data, data))
+    return (data / norm).astype(np.float32) if norm > 0 else data
+
+
+class PatchedMatrix:
+    """
+    A CSR `base` (as trained or compacted) plus replacement rows for the rows
+    changed since. Rewriting a row costs O(its length); the base is only merged
+    with the patches by to_csr(), at training / compaction time.
+
+    Requests read while events are applied: a row is stored before it is listed
+    in `patched` and before `shape` grows to include it, and readers drop
+    columns beyond the width they started with.
+    """
+
+    def __init__(self, base):
+        self.base = base.tocsr()
+        self.shape = self.base.shape
+        self.patches = {}  # row -> (sorted int32 columns, float32 values)
+        self.patched = np.empty(0, dtype=np.int64)
+        self._base_t = None  # CSR transpose of the base (see base_t)
+
+    def row(self, i):
+        """(columns, values) of row i."""
+        patch = self.patches.get(i)
+        if patch is not None:
+            return patch
+        if i < self.base.shape[0]:
+            start, stop = self.base.indptr[i], self.base.indptr[i + 1]
+            return self.base.indices[start:stop], self.base.data[start:stop]
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+    @property
+    def base_t(self):
+        """CSR transpose of the base, built once (the base does not change until compaction)."""
+        if self._base_t is None:
+            self._base_t = self.base.T.tocsr()
+        return self._base_t
+
+    def set_row(self, i, cols, data):
+        is_new = i not in self.patches
+        self.patches[i] = (cols, data)
+        if is_new:
+            self.patched = np.append(self.patched, i)
+
+    def resize(self, shape):
+        self.shape = (max(self.shape[0], shape[0]), max(self.shape[1], shape[1]))
+
+    def add(self, rows, cols, weights):
+        """Add `weights` at (rows, cols), rewriting each touched row once. Returns the touched rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+        order = np.argsort(rows, kind="stable")
+        touched, starts = np.unique(rows[order], return_index=True)
+        for r, group in zip(touched.tolist(), np.split(order, starts[1:])):
+            old_cols, old_data = self.row(r)
+            merged, inverse = np.unique(np.concatenate([old_cols, cols[group]]), return_inverse=True)
+            data = np.bincount(inverse, weights=np.concatenate([old_data, weights[group]]), minlength=len(merged))
+            self.set_row(r, merged.astype(np.int32), data.astype(np.float32))
+        return touched
+
+    def rows(self, rows, n_cols=None):
+        """CSR [len(rows), n_cols] of the given rows (n_cols defaults to the current width)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        n_cols = self.shape[1] if n_cols is None else n_cols
+        n_base_rows, n_base_cols = self.base.shape
+        if not ((rows >= n_base_rows).any() or np.isin(rows, self.patched).any()) and n_base_cols <= n_cols:
+            block = self.base[rows]
+            block.resize((len(rows), n_cols))
+            return block
+        parts = [self.row(i) for i in rows.tolist()]
+        keeps = [cols < n_cols for cols, _ in parts]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([int(k.sum()) for k in keeps])
+        indices = np.concatenate([np.empty(0, dtype=np.int32)] + [c[k] for (c, _), k in zip(parts, keeps)])
+        data = np.concatenate([np.empty(0, dtype=np.float32)] + [d[k] for (_, d), k in zip(parts, keeps)])
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n_cols))
+
+    __getitem__ = rows
+
+    def left_multiply(self, weights):
+        """`weights` [B, n_rows] (sparse) @ this matrix, reading only the rows `weights` uses."""
+        n_cols = self.shape[1]
+        weights = weights.tocsr()
+        used = np.unique(weights.indices)
+        return (weights[:, used] @ self.rows(used, n_cols)).tocsr()
+
+    def similarities(self, rows):
+        """Dense [len(rows), n_rows] dot products of `rows` with every row (cosine for unit rows)."""
+        n_rows, n_cols = self.shape
+        patched = self.patched
+        patched = patched[patched < n_rows]
+        query = self.rows(rows, n_cols)
+        n_base_rows, n_base_cols = self.base.shape
+        sims = np.zeros((query.shape[0], n_rows), dtype=np.float32)
+        sims[:, :n_base_rows] = (query[:, :n_base_cols] @ self.base_t).toarray()
+        if len(patched):
+            sims[:, patched] = (query @ self.rows(patched, n_cols).T).toarray()
+        return sims
+
+    def to_csr(self):
+        """The base with the patched rows merged in, as one CSR matrix."""
+        if not len(self.patched) and self.shape == self.base.shape:
+            return self.base
+        matrix = self.base.copy()
+        matrix.resize(self.shape)
+        patched = self.patched
+        if len(patched):
+            keep = np.ones(self.shape[0], dtype=np.float32)
+            keep[patched] = 0
+            place = sparse.csr_matrix(
+                (np.ones(len(patched), dtype=np.float32), (patched, np.arange(len(patched)))),
+                shape=(self.shape[0], len(patched)),
+            )
+            matrix = sparse.diags(keep) @ matrix + place @ self.rows(patched)
+            matrix.eliminate_zeros()
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        matrix.sort_indices()
+        return matrix
+
+
+class InteractionMatrix:
+    """
+    User x product weights (a PatchedMatrix) and their id maps. One per snapshot,
+    shared by every CF model built on it, so cf_matrix.npz is held in memory once.
+    """
+
+    def __init__(self, matrix, user_ids, product_ids):
+        self.matrix = matrix if isinstance(matrix, PatchedMatrix) else PatchedMatrix(matrix)
+        self.user_ids = list(user_ids)
+        self.product_ids = list(product_ids)
+        self.user_to_idx = {u: i for i, u in enumerate(self.user_ids)}
+        self.product_to_idx = {p: i for i, p in enumerate(self.product_ids)}
+
+    @classmethod
+    def load(cls, model_dir):
+        return cls(*load_matrix(model_dir))
+
+    def merge(self, users, products, weights):
+        """
+        Add new interaction weights to the matrix, growing it for unseen users /
+        products -> (user rows, product columns, new user ids, new product ids).
+        New ids get the next row / column numbers; they are registered by `commit`.
+        """
+        new_users = [u for u in dict.fromkeys(users) if u not in self.user_to_idx]
+        new_products = [p for p in dict.fromkeys(products) if p not in self.product_to_idx]
+        user_idx = {u: len(self.user_ids) + i for i, u in enumerate(new_users)}
+        product_idx = {p: len(self.product_ids) + i for i, p in enumerate(new_products)}
+
+        rows = np.array([self.user_to_idx.get(u, user_idx.get(u)) for u in users], dtype=np.int64)
+        cols = np.array([self.product_to_idx.get(p, product_idx.get(p)) for p in products], dtype=np.int64)
+        self.matrix.add(rows, cols, weights)
+        self.matrix.resize((len(self.user_ids) + len(new_users), len(self.product_ids) + len(new_products)))
+        return rows, cols, new_users, new_products
+
+    def commit(self, new_users, new_products):
+        # Ids go last: a request that can see a new id also sees arrays large enough for it
+        for uid in new_users:
+            self.user_to_idx[uid] = len(self.user_ids)
+            self.user_ids.append(uid)
+        for pid in new_products:
+            self.product_to_idx[pid] = len(self.product_ids)
+            self.product_ids.append(pid)
+
+
+class CFModel:
+    """Shared plumbing of the CF models: the InteractionMatrix they are built on."""
+
+    def _bind(self, matrix, user_ids, product_ids):
+        # `matrix` is a CSR (with its ids) or an InteractionMatrix shared with other models
+        data = matrix if isinstance(matrix, InteractionMatrix) else InteractionMatrix(matrix, user_ids, product_ids)
+        self.data = data
+        self.matrix = data.matrix
+        self.user_ids, self.product_ids = data.user_ids, data.product_ids
+        self.user_to_idx, self.product_to_idx = data.user_to_idx, data.product_to_idx
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _prepare_updates(self):
+        """Build state the first add_interactions needs from the unpatched matrix."""
+
+    def _refresh(self, rows, cols, weights):
+        """Update derived state for a batch already merged into the shared matrix."""
+        raise NotImplementedError
+
+    def add_interactions(self, users, products, weights):
+        add_interactions([self], users, products, weights)
+
+
+def add_interactions(models, users, products, weights):
+    """
+    Apply new (decayed) interaction weights in place to CF models that share one
+    InteractionMatrix: the matrix is updated once, then each model refreshes.
+    """
+    data = models[0].data
+    if any(m.data is not data for m in models):
+        raise ValueError("add_interactions: models must share one InteractionMatrix")
+    for m in models:
+        m._prepare_updates()
+    rows, cols, new_users, new_products = data.merge(users, products, weights)
+    for m in models:
+        m._refresh(rows, cols, weights)
+    data.commit(new_users, new_products)
+
+
+def reserve_rows(array, n_rows, fill=0):
+    """
+    `array` with room for at least `n_rows` rows. Grows geometrically, so adding
+    users / products one event at a time costs amortized O(1) per row.
+    Rows past the logical length hold `fill`.
+    """
+    if n_rows <= len(array):
+        return array
+    grown = np.full((max(n_rows, 2 * len(array)),) + array.shape[1:], fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _grow_table(ids, scores, n_rows):
+    """Room in a neighbor table for newly added users / products (empty rows)."""
+    return reserve_rows(ids, n_rows, fill=-1), reserve_rows(scores, n_rows)
+
+
+def _refresh_neighbor_rows(vectors, rows, ids, scores, block_bytes=vector_search.NEIGHBOR_BLOCK_BYTES):
+    """
+    Recompute the neighbor-table rows of `rows` against all `vectors` (a PatchedMatrix, in place).
+    Scored in blocks like vector_search.build_neighbor_table, so a large event batch
+    never materializes a dense touched x all-rows array.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    block_rows = max(1, block_bytes // (vector_search.NEIGHBOR_BYTES_PER_SCORE * max(1, vectors.shape[0])))
+    for start in range(0, len(rows), block_rows):
+        block = rows[start:start + block_rows]
+        sims = vectors.similarities(block)
+        sims[np.arange(len(block)), block] = -np.inf
+        ids[block], scores[block] = vector_search.top_k_rows(sims, ids.shape[1])
+
+
+class UserKNN(CFModel):
+    """Sparse user-item weights plus L2-normalized user vectors for neighbor lookups."""
+
+    def __init__(self, matrix, user_ids=None, product_ids=None, neighbor_ids=None, neighbor_scores=None):
+        self._bind(matrix, user_ids, product_ids)
+        self.user_vectors = PatchedMatrix(normalize_rows(self.matrix.to_csr()))
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+
+    @classmethod
+    def empty(cls):
+        return cls(sparse.csr_matrix((0, 0), dtype=np.float32), [], [])
+
+    @classmethod
+    def build(cls, interactions, top_k=0):
+        """Fit from an interactions frame; `top_k` > 0 also precomputes the neighbor table."""
+        return cls.from_matrix(*build_user_item(interactions), top_k=top_k)
+
+    @classmethod
+    def from_matrix(cls, matrix, user_ids, product_ids, top_k=0):
+        model = cls(matrix, user_ids, product_ids)
+        if top_k > 0:
+            model.neighbor_ids, model.neighbor_scores = vector_search.build_neighbor_table(
+                model.user_vectors.base, k=top_k
+            )
+        return model
+
+    def save(self, model_dir):
+        save_matrix(model_dir, self.matrix.to_csr(), self.user_ids, self.product_ids)
+        if self.neighbor_ids is not None:
+            n = len(self)
+            np.savez(os.path.join(model_dir, NEIGHBORS_FILE), ids=self.neighbor_ids[:n], scores=self.neighbor_scores[:n])
+
+    @classmethod
+    def load(cls, model_dir, data=None):
+        """`data`: the snapshot's InteractionMatrix, if already loaded."""
+        model = cls(data or InteractionMatrix.load(model_dir))
+        neighbors_path = os.path.join(model_dir, NEIGHBORS_FILE)
+        if os.path.exists(neighbors_path):
+            with np.load(neighbors_path) as saved:
+                if len(saved["ids"]) == len(model):
+                    model.neighbor_ids, model.neighbor_scores = saved["ids"], saved["scores"]
+        return model
+
+    def _refresh(self, rows, cols, weights):
+        """
+        Only the touched users' rows are re-normalized. With a precomputed table,
+        their neighbor lists are recomputed; other users' lists pick the change
+        up at the next compaction.
+        """
+        touched = np.unique(rows)
+        for r in touched.tolist():
+            cols, data = self.matrix.row(r)
+            self.user_vectors.set_row(r, cols, _unit(data))
+        self.user_vectors.resize(self.matrix.shape)
+        if self.neighbor_ids is not None:
+            ids, scores = _grow_table(self.neighbor_ids, self.neighbor_scores, self.matrix.shape[0])
+            _refresh_neighbor_rows(self.user_vectors, touched, ids, scores)
+            self.neighbor_ids, self.neighbor_scores = ids, scores
+
+    def neighbors(self, uidxs, k):
+        """
+        Top-k similar users for each query user, self excluded
+        -> (ids int32 [B, k], cosine scores float32 [B, k]), unused slots hold id -1.
+        """
+        uidxs = np.asarray(uidxs, dtype=np.int64)
+        if self.neighbor_ids is not None and k <= self.neighbor_ids.shape[1]:
+            return self.neighbor_ids[uidxs, :k], self.neighbor_scores[uidxs, :k]
+        # On demand: sparse product of the query users against all user vectors
+        sims = self.user_vectors.similarities(uidxs)
+        sims[np.arange(len(uidxs)), uidxs] = -np.inf
+        return vector_search.top_k_rows(sims, k)
+
+    def neighbor_weights(self, uidxs, k):
+        """Sparse [B, users] matrix of each query user's neighbor similarities."""
+        ids, scores = self.neighbors(uidxs, k)
+        keep = ids >= 0
+        return sparse.csr_matrix(
+            (scores[keep], (np.nonzero(keep)[0], ids[keep])), shape=(len(ids), self.matrix.shape[0])
+        )
+
+    def recommend(self, uidxs, n, k, exclude=None, block_bytes=BATCH_BLOCK_BYTES):
+        """
+        Top-n unseen product columns for many users at once
+        -> (ids int32 [B, n], scores float32 [B, n]), unused slots hold id -1.
+        Scores are neighbor-similarity-weighted sums of the neighbors' interactions,
+        computed for a block of users with one sparse matrix product.
+        `exclude` is an optional boolean mask of product columns never to return.
+        """
+        uidxs = np.asarray(uidxs, dtype=np.int64)
+        ids = np.full((len(uidxs), n), -1, dtype=np.int32)
+        scores = np.zeros((len(uidxs), n), dtype=np.float32)
+        n_products = len(self.product_ids)
+        if n_products == 0:
+            return ids, scores
+
+        # Dense per block: users x products scores (and users x users sims when computed on demand)
+        block_rows = max(1, block_bytes // (4 * max(n_products, len(self))))
+        for start in range(0, len(uidxs), block_rows):
+            block = uidxs[start:start + block_rows]
+            item_scores = self.matrix.left_multiply(self.neighbor_weights(block, k)).toarray()
+            seen = self.matrix.rows(block, item_scores.shape[1])
+            block_ids, block_scores = top_unseen(item_scores, seen, n, exclude)
+            ids[start:start + len(block)] = block_ids
+            scores[start:start + len(block)] = block_scores
+        return ids, scores
+
+
+class ItemKNN(CFModel):
+    """
+    Item-item CF: top-K co-interaction cosine neighbors per product.
+    A user's score for product j is sum over history items i of weight_ui * sim(i, j),
+    so serving costs history length x K, independent of catalog size.
+    """
+
+    def __init__(self, matrix, user_ids=None, product_ids=None, neighbor_ids=None, neighbor_scores=None):
+        self._bind(matrix, user_ids, product_ids)
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+        # Product x user weights and their unit rows, built on the first add_interactions
+        self._columns = None
+        self._item_vectors = None
+
+    @classmethod
+    def build(cls, matrix, user_ids, product_ids, top_k=50):
+        item_vectors = normalize_rows(matrix.T.tocsr())
+        ids, scores = vector_search.build_neighbor_table(item_vectors, k=top_k)
+        return cls(matrix, user_ids, product_ids, ids, scores)
+
+    def save(self, model_dir):
+        n = len(self.product_ids)
+        np.savez(
+            os.path.join(model_dir, ITEM_NEIGHBORS_FILE),
+            ids=self.neighbor_ids[:n],
+            scores=self.neighbor_scores[:n],
+            product_ids=np.asarray(self.product_ids),
+        )
+
+    @classmethod
+    def load(cls, model_dir, data=None):
+        """
+        Neighbor table must line up with cf_matrix.npz (both are written by the same
+        training run). `data`: the snapshot's InteractionMatrix, if already loaded.
+        """
+        data = data or InteractionMatrix.load(model_dir)
+        with np.load(os.path.join(model_dir, ITEM_NEIGHBORS_FILE)) as saved:
+            if saved["product_ids"].tolist() != data.product_ids:
+                raise ValueError("item neighbors are out of date with cf_matrix.npz; retrain")
+            return cls(data, neighbor_ids=saved["ids"], neighbor_scores=saved["scores"])
+
+    def _prepare_updates(self):
+        if self._columns is None:
+            # Product x user view of the matrix, shared with its other users (base_t)
+            columns = self.matrix.base_t if not len(self.matrix.patched) else self.matrix.to_csr().T.tocsr()
+            self._columns = PatchedMatrix(columns)
+            self._item_vectors = PatchedMatrix(normalize_rows(columns))
+
+    def _refresh(self, rows, cols, weights):
+        """
+        Recompute the neighbor lists of the touched products and of the products in
+        the touched users' histories. Only the touched products' columns are
+        rewritten and re-normalized.
+        """
+        touched_items = self._columns.add(cols, rows, weights)
+        self._columns.resize(self.matrix.shape[::-1])
+        for c in touched_items.tolist():
+            user_rows, data = self._columns.row(c)
+            self._item_vectors.set_row(c, user_rows, _unit(data))
+        self._item_vectors.resize(self._columns.shape)
+
+        affected = np.union1d(touched_items, self.matrix.rows(np.unique(rows)).indices)
+        ids, scores = _grow_table(self.neighbor_ids, self.neighbor_scores, self.matrix.shape[1])
+        _refresh_neighbor_rows(self._item_vectors, affected, ids, scores)
+        self.neighbor_ids, self.neighbor_scores = ids, scores
+
+    def similar(self, product_id, n=10):
+        """(product columns, scores) most often co-interacted with `product_id`, best first."""
+        col = self.product_to_idx.get(product_id)
+        if col is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        ids, scores = self.neighbor_ids[col, :n], self.neighbor_scores[col, :n]
+        keep = ids >= 0
+        return ids[keep], scores[keep]
+
+    def score_history(self, cols, weights, n, exclude=None):
+        """
+        Top-n (product columns, scores) for an interaction history given as
+        product columns + weights; history items themselves are never returned.
+        """
+        cols = np.asarray(cols, dtype=np.int64)
+        ids = self.neighbor_ids[cols].ravel()
+        scores = (self.neighbor_scores[cols] * np.asarray(weights, dtype=np.float32)[:, None]).ravel()
+        keep = ids >= 0
+        if exclude is not None:
+            keep &= ids < len(exclude)
+            keep[keep] = ~exclude[ids[keep]]
+        candidates, inverse = np.unique(ids[keep], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[keep], minlength=len(candidates))
+        totals[np.isin(candidates, cols)] = 0.0
+        best = vector_search.top_k(totals, n)
+        return candidates[best], totals[best]
+
+    def recommend(self, uidxs, n, k=None, exclude=None):
+        """
+        Top-n unseen product columns per user from their stored history
+        -> (ids int32 [B, n], scores float32 [B, n]), unused slots hold id -1.
+        `k` is accepted for interface parity with UserKNN and ignored.
+        """
+        ids = np.full((len(uidxs), n), -1, dtype=np.int32)
+        scores = np.zeros((len(uidxs), n), dtype=np.float32)
+        for b, u in enumerate(uidxs):
+            history, weights = self.matrix.row(u)
+            cols, found = self.score_history(history, weights, n, exclude)
+            ids[b, :len(cols)] = cols
+            scores[b, :len(cols)] = found
+        return ids, scores
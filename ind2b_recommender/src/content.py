@@ -0,0 +1,29 @@
+"""
+TF-IDF recipe for the content model: the text built per product and the
+vectorizer settings. Shared by train_model, the API's startup fallback fit and
+evaluate, so every path scores the same catalog the same way.
+"""
+
+TFIDF_PARAMS = {"stop_words": "english", "max_features": 5000}
+
+
+def content_text(df):
+    """TF-IDF input per product: title, description, category, brand / seller."""
+    # Combine title, description, category etc.
+    text = (
+        df["title"].fillna("") + " " +
+        df["description"].fillna("") + " " +
+        df["category_id"].fillna("").astype(str)
+    )
+    # Handle cases where columns might be missing in CSV schema
+    for col in ["brand", "seller_name"]:
+        if col in df.columns:
+            text += " " + df[col].fillna("").astype(str)
+    return text
+
+
+def tfidf_vectorizer():
+    """Unfitted vectorizer with the content model's settings (imports sklearn)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(**TFIDF_PARAMS)
@@ -8,6 +8,12 @@ from bs4 import BeautifulSoup
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import concurrent.futures
+import sys
+
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.catalog import write_snapshot
 
 # Load environment variables
 load_dotenv()
@@ -166,6 +172,10 @@ def main():
         output_path = os.path.join(os.path.dirname(__file__), "../data/products.csv")
         df.to_csv(output_path, index=False)
         print(f"Saved {len(df)} products to {output_path}")
+
+        # Columnar snapshot the API loads instead of parsing the CSV
+        write_snapshot(df, os.path.dirname(output_path), source=output_path)
+        print("Saved columnar catalog snapshot")
     else:
         print("No data collected.")
 
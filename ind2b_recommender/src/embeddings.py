@@ -0,0 +1,71 @@
+"""
+Dense low-rank (LSA) product vectors over the TF-IDF features.
+
+Layout in models/:
+  embeddings.npy        N x d row-normalized vectors (float32 / float16 / int8), memory-mapped by the API
+  embedding_meta.npz    SVD components (d x n_features), int8 scale, product_ids for row alignment
+"""
+
+import os
+
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "embedding_meta.npz"
+DTYPES = ("float32", "float16", "int8")
+
+
+def _normalize_rows(a):
+    norms = np.linalg.norm(a, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (a / norms).astype(np.float32)
+
+
+def fit_lsa(tfidf_matrix, dim=128, seed=0):
+    """Truncated SVD of the TF-IDF matrix -> (normalized embeddings, components)."""
+    from sklearn.decomposition import TruncatedSVD
+
+    dim = max(1, min(dim, min(tfidf_matrix.shape) - 1))
+    svd = TruncatedSVD(n_components=dim, random_state=seed)
+    embeddings = _normalize_rows(svd.fit_transform(tfidf_matrix))
+    return embeddings, svd.components_.astype(np.float32)
+
+
+def quantize(embeddings, dtype="float32"):
+    """Cast normalized vectors for storage -> (array, scale); scores are multiplied by scale."""
+    if dtype == "float16":
+        return embeddings.astype(np.float16), 1.0
+    if dtype == "int8":
+        # components of unit vectors lie in [-1, 1]
+        return np.round(embeddings * 127).astype(np.int8), 1.0 / 127
+    return embeddings.astype(np.float32), 1.0
+
+
+def save(model_dir, embeddings, components, product_ids, dtype="float32"):
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}', expected one of {DTYPES}")
+    stored, scale = quantize(embeddings, dtype)
+    np.save(os.path.join(model_dir, EMBEDDINGS_FILE), stored)
+    np.savez(
+        os.path.join(model_dir, META_FILE),
+        components=components,
+        scale=np.float32(scale),
+        product_ids=np.asarray(product_ids),
+    )
+
+
+def exists(model_dir):
+    return all(os.path.exists(os.path.join(model_dir, f)) for f in (EMBEDDINGS_FILE, META_FILE))
+
+
+def load(model_dir):
+    """(embeddings memmap, components, scale, product_ids)"""
+    embeddings = np.load(os.path.join(model_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    with np.load(os.path.join(model_dir, META_FILE)) as meta:
+        return embeddings, meta["components"], float(meta["scale"]), meta["product_ids"]
+
+
+def encode(tfidf_vec, components):
+    """Project TF-IDF row(s) into the LSA space, L2-normalized float32."""
+    dense = np.asarray(tfidf_vec @ components.T, dtype=np.float32)
+    return _normalize_rows(dense)
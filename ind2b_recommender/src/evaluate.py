@@ -1,76 +1,375 @@
-import pandas as pd
-import numpy as np
-from collections import defaultdict
+"""
+Offline evaluation of the recommenders on a temporal split.
+
+Interactions (interactions.csv orders and the event log, by ts) are split
+globally in time: interactions at or after the cutoff timestamp (the last
+EVAL_TEST_FRACTION) are held out and every model is retrained on the rest, so
+no test interaction leaks into training. All rows of an order share its ts,
+so an order is never split across the folds.
+Test users are scored with the batched recommend path, sharded over a process
+pool, and each ranked list is compared with the held-out products the user had
+not already interacted with. Users unseen in training get the popularity
+ranking, as in the API.
+
+Reports HitRate / Precision / Recall / NDCG / MAP / Coverage @K per model, batch
+throughput and single-user latency percentiles.
+
+python src/evaluate.py [knn item als hybrid popular]
+"""
+
 import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
 
-from hybrid_recommender import recommend_for_user
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import model_store
+from src.als import ALSModel
+from src.catalog import load_catalog
+from src.collaborative import ItemKNN, UserKNN, build_user_item, top_unseen
+from src.event_log import LOG_FILE, read_log
+from src.content import content_text, tfidf_vectorizer
+from src.train_model import ALS_PARAMS, CF_TOP_K, ITEM_CF_TOP_K
+from src.user_profiles import HYBRID_CANDIDATES, blend, profile_vectors
+from src.vector_search import top_k, top_k_rows
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
-MODEL_DIR = os.path.join(BASE_DIR, "models")
-DATA_DIR = os.path.join(BASE_DIR, "data")
-
-# Load interactions
-interactions = pd.read_csv(f"{DATA_DIR}/interactions.csv")
-products = pd.read_csv(f"{DATA_DIR}/products.csv")
-
-# Convert to user -> product list
-user_history = defaultdict(list)
-for _, row in interactions.iterrows():
-    user_history[row["user_id"]].append(row["product_id"])
-
-# Split into train / test
-train_ratio = 0.8
-train_history = {}
-test_history = {}
-
-for user, items in user_history.items():
-    cutoff = int(len(items) * train_ratio)
-    train_history[user] = items[:cutoff]
-    test_history[user] = items[cutoff:]  # next items user interacted with
-
-def evaluate_at_k(k=10):
-    hits = 0
-    total = 0
-    precision_sum = 0
-    recall_sum = 0
-    recommended_items = set()
-
-    for user, test_items in test_history.items():
-        if len(test_items) == 0:
-            continue
-
-        recs = recommend_for_user(user, n=k)
-        rec_ids = [p["product_id"] for p in recs]
-
-        recommended_items.update(rec_ids)
-
-        # Hit = did we recommend at least one item user later interacted with?
-        hit = any(item in rec_ids for item in test_items)
-        hits += int(hit)
-        total += 1
-
-        # Precision & Recall
-        relevant = set(test_items)
-        recommended = set(rec_ids)
-
-        intersect = relevant & recommended
-        precision_sum += len(intersect) / k
-        recall_sum += len(intersect) / len(relevant)
-
-    hit_rate = hits / total if total > 0 else 0
-    precision_at_k = precision_sum / total if total > 0 else 0
-    recall_at_k = recall_sum / total if total > 0 else 0
-    coverage = len(recommended_items) / len(products)
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+MODELS = ("knn", "item", "als", "hybrid", "popular")
+EVAL_K = [int(k) for k in os.getenv("EVAL_K", "5,10").split(",")]
+EVAL_TEST_FRACTION = float(os.getenv("EVAL_TEST_FRACTION", "0.2"))
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "0")) or os.cpu_count() or 1
+EVAL_BATCH_USERS = int(os.getenv("EVAL_BATCH_USERS", "256"))
+EVAL_LATENCY_SAMPLE = int(os.getenv("EVAL_LATENCY_SAMPLE", "200"))  # single-user calls timed per model
+CF_MODEL = os.getenv("CF_MODEL", "knn").lower()  # CF side of the hybrid, as in the API
+CF_NEIGHBORS = int(os.getenv("CF_NEIGHBORS", "5"))
+
+
+# ======================
+# DATA + SPLIT
+# ======================
+def load_interactions():
+    """
+    (user_id, product_id, weight, ts) in time order: interactions.csv orders and the event log.
+    Rows without a timestamp (exports from before fetch_data.py wrote ts) come first, in file order.
+    """
+    columns = ["user_id", "product_id", "weight", "ts"]
+    frames = []
+    path = os.path.join(DATA_DIR, "interactions.csv")
+    if os.path.exists(path) and os.path.getsize(path) >= 10:
+        df = pd.read_csv(path)
+        if "ts" not in df.columns:
+            print("⚠️ Warning: interactions.csv has no ts column (re-run src/fetch_data.py). "
+                  "Its rows are split in file order.")
+            df["ts"] = np.nan
+        frames.append(df[columns])
+    events, _ = read_log(os.path.join(DATA_DIR, LOG_FILE))
+    if len(events):
+        frames.append(events[columns])
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    interactions = pd.concat(frames, ignore_index=True)
+    return interactions.sort_values("ts", kind="stable", na_position="first", ignore_index=True)
+
+
+def temporal_split(interactions, test_fraction=EVAL_TEST_FRACTION):
+    """
+    Everything before the cutoff timestamp trains; interactions at or after it (about
+    the last `test_fraction`) are held out. Without timestamps, rows split in order.
+    """
+    cut = int(round(len(interactions) * (1 - test_fraction)))
+    if cut >= len(interactions):
+        return interactions, interactions.iloc[:0]
+    ts = interactions["ts"].to_numpy(dtype=np.float64) if "ts" in interactions.columns else None
+    if ts is None or np.isnan(ts[cut]):
+        return interactions.iloc[:cut], interactions.iloc[cut:]
+    test = ts >= ts[cut]
+    return interactions[~test], interactions[test]
+
+
+def _catalog_vectors(products_df):
+    """TF-IDF rows aligned with the catalog (trained vectors when they still line up)."""
+    path = os.path.join(model_store.active_dir(MODEL_DIR), "tfidf_matrix.pkl")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            matrix = pickle.load(f)
+        if matrix.shape[0] == len(products_df):
+            return matrix.tocsr()
+    # Same text as the served TF-IDF; descriptions live in the catalog's cold store
+    if "description" not in products_df.columns:
+        catalog = load_catalog(DATA_DIR)
+        catalog_ids = catalog.hot["product_id"].to_numpy()
+        if len(catalog_ids) == len(products_df) and (catalog_ids == products_df["product_id"].to_numpy()).all():
+            products_df = products_df.assign(description=catalog.cold.column("description"))
+        else:
+            products_df = products_df.assign(description="")
+    return tfidf_vectorizer().fit_transform(content_text(products_df)).tocsr()
+
+
+# ======================
+# RANKERS
+# ======================
+# Each ranker maps train-user indices to catalog product ids [B, n], -1 padded.
+class CFRanker:
+    """Any CF model with the batched `recommend(uidxs, n, k, exclude)` interface."""
+
+    def __init__(self, model, catalog_ids, rows_map):
+        self.model = model
+        self.catalog_ids = catalog_ids
+        self.rows_map = rows_map
+
+    def _ids(self, cols):
+        ids = np.full(cols.shape, -1, dtype=np.int64)
+        found = cols >= 0
+        ids[found] = self.catalog_ids[self.rows_map[cols[found]]]
+        return ids
+
+    def __call__(self, uidxs, n):
+        cols, _ = self.model.recommend(uidxs, n, CF_NEIGHBORS, exclude=self.rows_map < 0)
+        return self._ids(cols)
+
+
+class PopularRanker(CFRanker):
+    """Most-interacted products in the train fold, minus each user's own history."""
+
+    def __init__(self, matrix, catalog_ids, rows_map):
+        super().__init__(None, catalog_ids, rows_map)
+        self.matrix = matrix
+        self.scores = np.asarray(matrix.sum(axis=0), dtype=np.float32).ravel()
+
+    def __call__(self, uidxs, n):
+        item_scores = np.repeat(self.scores[None, :], len(uidxs), axis=0)
+        cols, _ = top_unseen(item_scores, self.matrix[uidxs], n, exclude=self.rows_map < 0)
+        return self._ids(cols)
+
+
+class HybridRanker(CFRanker):
+    """
+    The API's CF + content-profile blend, batched: profiles for a block of users
+    come from one sparse product and the catalog is scored in one pass.
+    """
 
+    def __init__(self, model, catalog_ids, rows_map, item_vectors):
+        super().__init__(model, catalog_ids, rows_map)
+        self.item_vectors = item_vectors
+        # train column -> catalog row, as a 0/1 selection matrix
+        valid = np.flatnonzero(rows_map >= 0)
+        select = sparse.csr_matrix(
+            (np.ones(len(valid), dtype=np.float32), (valid, rows_map[valid])),
+            shape=(len(rows_map), len(catalog_ids)),
+        )
+        self.history = (model.matrix.to_csr() @ select).tocsr()
+
+    def __call__(self, uidxs, n):
+        n_cand = n * HYBRID_CANDIDATES
+        cols, cf_scores = self.model.recommend(uidxs, n_cand, CF_NEIGHBORS, exclude=self.rows_map < 0)
+        history = self.history[uidxs]
+        similarity = profile_vectors(history, self.item_vectors) @ self.item_vectors.T
+        similarity = similarity.toarray() if sparse.issparse(similarity) else np.asarray(similarity)
+        seen_users, seen_rows = history.nonzero()
+        similarity[seen_users, seen_rows] = 0
+        content_rows, _ = top_k_rows(similarity, n_cand)
+
+        ids = np.full((len(uidxs), n), -1, dtype=np.int64)
+        for b in range(len(uidxs)):
+            found = cols[b] >= 0
+            cf_rows = self.rows_map[cols[b][found]]
+            cand = np.union1d(cf_rows, content_rows[b][content_rows[b] >= 0])
+            if cand.size == 0:
+                continue
+            blended = blend(cand, similarity[b, cand], cf_rows, cf_scores[b][found])
+            best = cand[top_k(blended, n)]
+            ids[b, :len(best)] = self.catalog_ids[best]
+        return ids
+
+
+def train_rankers(names, train, products_df):
+    """Retrain the requested models on the train fold -> ({name: ranker}, train user_ids)."""
+    matrix, user_ids, product_ids = build_user_item(train)
+    catalog_ids = products_df["product_id"].to_numpy()
+    row_of_product = {pid: row for row, pid in enumerate(catalog_ids.tolist())}
+    rows_map = np.array([row_of_product.get(pid, -1) for pid in product_ids], dtype=np.int64)
+
+    models = {}
+
+    def cf(name):
+        if name not in models:
+            t = time.perf_counter()
+            if name == "item":
+                models[name] = ItemKNN.build(matrix, user_ids, product_ids, top_k=ITEM_CF_TOP_K)
+            elif name == "als":
+                models[name] = ALSModel.build(matrix, user_ids, product_ids, **ALS_PARAMS)
+            else:
+                models[name] = UserKNN.from_matrix(matrix, user_ids, product_ids, top_k=CF_TOP_K)
+            print(f"   Trained {name} in {time.perf_counter() - t:.1f}s")
+        return models[name]
+
+    rankers = {}
+    for name in names:
+        if name == "popular":
+            rankers[name] = PopularRanker(matrix, catalog_ids, rows_map)
+        elif name == "hybrid":
+            base = CF_MODEL if CF_MODEL in ("knn", "item", "als") else "knn"
+            rankers[name] = HybridRanker(cf(base), catalog_ids, rows_map, _catalog_vectors(products_df))
+        else:
+            rankers[name] = CFRanker(cf(name), catalog_ids, rows_map)
+    return rankers, user_ids
+
+
+# ======================
+# SCORING (process pool)
+# ======================
+_worker_ranker = None
+
+
+def _init_worker(ranker):
+    global _worker_ranker
+    _worker_ranker = ranker
+
+
+def _score_shard(uidxs, n, batch_users):
+    """Ranked ids for one shard of users, scored in batches -> (ids [len, n], batch seconds)."""
+    ids = np.full((len(uidxs), n), -1, dtype=np.int64)
+    seconds = []
+    for start in range(0, len(uidxs), batch_users):
+        t = time.perf_counter()
+        ids[start:start + batch_users] = _worker_ranker(uidxs[start:start + batch_users], n)
+        seconds.append(time.perf_counter() - t)
+    return ids, seconds
+
+
+def score_users(ranker, uidxs, n, workers=EVAL_WORKERS, batch_users=EVAL_BATCH_USERS):
+    """Ranked ids [len(uidxs), n] for all test users; shards run on `workers` processes."""
+    if len(uidxs) == 0:
+        return np.empty((0, n), dtype=np.int64), []
+    if workers <= 1 or len(uidxs) <= batch_users:
+        _init_worker(ranker)
+        return _score_shard(uidxs, n, batch_users)
+    shards = np.array_split(uidxs, min(len(uidxs) // batch_users, workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ranker,)) as pool:
+        results = list(pool.map(_score_shard, shards, [n] * len(shards), [batch_users] * len(shards)))
+    return np.vstack([ids for ids, _ in results]), [s for _, secs in results for s in secs]
+
+
+def single_user_latency(ranker, uidxs, n, sample=EVAL_LATENCY_SAMPLE, seed=0):
+    """Milliseconds per single-user call on a sample of users (the API's request shape)."""
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(uidxs, size=min(sample, len(uidxs)), replace=False)
+    times = []
+    for u in picked:
+        t = time.perf_counter()
+        ranker(np.array([u]), n)
+        times.append((time.perf_counter() - t) * 1000)
+    return np.array(times)
+
+
+# ======================
+# METRICS
+# ======================
+def ranking_metrics(recs, test_keys, n_relevant, n_catalog, k):
+    """
+    Metrics @k over all test users at once.
+    recs: product codes [U, >=k] (-1 padded); test_keys: sorted user * n_codes + code
+    of held-out items; n_relevant: held-out items per user.
+    """
+    recs = recs[:, :k]
+    n_codes = n_catalog + 1
+    keys = np.arange(len(recs))[:, None] * n_codes + recs
+    rel = np.isin(keys, test_keys) & (recs >= 0)
+
+    hits = rel.sum(axis=1)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal_hits = np.minimum(n_relevant, k)
+    ndcg = (rel * discounts).sum(axis=1) / np.cumsum(discounts)[ideal_hits - 1]
+    precision_at = np.cumsum(rel, axis=1) / np.arange(1, k + 1)
+    average_precision = (precision_at * rel).sum(axis=1) / ideal_hits
+    covered = np.unique(recs[recs >= 0])
     return {
-        "HitRate@K": round(hit_rate, 3),
-        "Precision@K": round(precision_at_k, 3),
-        "Recall@K": round(recall_at_k, 3),
-        "Coverage": round(coverage, 3),
-        "Users evaluated": total
+        f"HitRate@{k}": round(float((hits > 0).mean()), 4),
+        f"Precision@{k}": round(float(hits.mean() / k), 4),
+        f"Recall@{k}": round(float((hits / n_relevant).mean()), 4),
+        f"NDCG@{k}": round(float(ndcg.mean()), 4),
+        f"MAP@{k}": round(float(average_precision.mean()), 4),
+        f"Coverage@{k}": round(len(covered) / n_catalog, 4),
     }
 
+
+def evaluate(names=MODELS, ks=EVAL_K, test_fraction=EVAL_TEST_FRACTION, workers=EVAL_WORKERS,
+             interactions=None, products_df=None):
+    """
+    Train on the train fold, score every test user with each model -> {name: metrics}.
+    `interactions` (time-ordered) and `products_df` default to the data/ files.
+    """
+    if products_df is None:
+        products_df = load_catalog(DATA_DIR).hot
+    if interactions is None:
+        interactions = load_interactions()
+    train, test = temporal_split(interactions, test_fraction)
+    print(f"📊 {len(train)} train / {len(test)} test interactions")
+
+    rankers, user_ids = train_rankers(names, train, products_df)
+
+    # Relevant = held-out products in the catalog the user had not interacted with before the cutoff
+    catalog_index = pd.Index(products_df["product_id"])
+    seen = set(zip(train["user_id"].tolist(), train["product_id"].tolist()))
+    test = test.drop_duplicates(["user_id", "product_id"])
+    fresh = [(u, p) not in seen for u, p in zip(test["user_id"].tolist(), test["product_id"].tolist())]
+    test = test[np.array(fresh, dtype=bool) & test["product_id"].isin(catalog_index).to_numpy()]
+    test_users = pd.Index(test["user_id"].unique())
+    n_catalog = len(products_df)
+    test_keys = np.unique(
+        test_users.get_indexer(test["user_id"]) * (n_catalog + 1) + catalog_index.get_indexer(test["product_id"])
+    )
+    n_relevant = np.bincount(test_users.get_indexer(test["user_id"]), minlength=len(test_users))
+
+    user_to_idx = {u: i for i, u in enumerate(user_ids)}
+    uidx = np.array([user_to_idx.get(u, -1) for u in test_users.tolist()], dtype=np.int64)
+    known = uidx >= 0
+    print(f"👥 {len(test_users)} test users ({int(known.sum())} seen in training)")
+
+    # Users unseen in training get the train fold's most popular catalog products
+    n = max(ks)
+    popular = train.groupby("product_id")["weight"].sum().sort_values(ascending=False, kind="stable")
+    popular = popular.index[popular.index.isin(catalog_index)][:n]
+    cold = np.full(n, -1, dtype=np.int64)
+    cold[:len(popular)] = popular
+    results = {}
+    for name, ranker in rankers.items():
+        recs = np.full((len(test_users), n), -1, dtype=np.int64)
+        t = time.perf_counter()
+        recs[known], batch_seconds = score_users(ranker, uidx[known], n, workers)
+        elapsed = time.perf_counter() - t
+        recs[~known] = cold
+        latency = single_user_latency(ranker, uidx[known], n)
+
+        codes = np.full(recs.shape, -1, dtype=np.int64)
+        codes[recs >= 0] = catalog_index.get_indexer(recs[recs >= 0])
+        metrics = {}
+        for k in ks:
+            metrics.update(ranking_metrics(codes, test_keys, n_relevant, n_catalog, k))
+        metrics["Users evaluated"] = len(test_users)
+        metrics["Users/s (batched)"] = round(int(known.sum()) / elapsed, 1) if elapsed > 0 else 0.0
+        if batch_seconds:
+            metrics["Batch ms p50"] = round(float(np.percentile(batch_seconds, 50)) * 1000, 2)
+        if latency.size:
+            for p in (50, 95, 99):
+                metrics[f"Latency ms p{p}"] = round(float(np.percentile(latency, p)), 3)
+        results[name] = metrics
+    return results
+
+
 if __name__ == "__main__":
-    for k in [5, 10]:
-        print(f"\n📌 Evaluating at K={k}")
-        print(evaluate_at_k(k))
+    names = [a for a in sys.argv[1:] if a in MODELS] or list(MODELS)
+    for name, metrics in evaluate(names).items():
+        print(f"\n📌 {name}")
+        for key, value in metrics.items():
+            print(f"   {key}: {value}")
@@ -0,0 +1,177 @@
+"""
+Append-only interaction event log (data/events.csv) for incremental CF updates.
+
+Each line is `ts,user_id,product_id,event_type,weight`, where weight comes from
+EVENT_WEIGHTS. Old events decay with a half-life. Decay uses a fixed reference
+time t0 ("forward decay"): an event at time ts contributes
+weight * 2 ** ((ts - t0) / half_life). Entries already in the matrix therefore
+never change when new events arrive. Rankings only compare values against each
+other, so the common 2 ** (-(now - t0) / half_life) factor is never applied.
+Compaction rebases t0 to the current time.
+
+The log is split into segments: data/events.csv, then events.1.csv,
+events.2.csv, ... New events always go to the newest segment. Compaction
+starts a new one (rotate_log), so the hot path never rereads folded history,
+and segments that no model version still reads are pruned once older than
+EVENT_LOG_RETENTION_DAYS.
+
+models/cf_state.json records the t0 and the log position (segment, byte offset)
+the saved CF artifacts include, so loaders replay only the tail.
+"""
+
+import glob
+import json
+import os
+import re
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+LOG_FILE = "events.csv"
+STATE_FILE = "cf_state.json"
+LOG_COLUMNS = ["ts", "user_id", "product_id", "event_type", "weight"]
+
+EVENT_WEIGHTS = {"view": 1.0, "cart": 3.0, "purchase": 5.0}
+DECAY_HALF_LIFE_DAYS = float(os.getenv("DECAY_HALF_LIFE_DAYS", "30"))
+# Folded segments are kept this long for full retraining, then deleted
+EVENT_LOG_RETENTION_DAYS = float(os.getenv("EVENT_LOG_RETENTION_DAYS", "90"))
+
+
+def event_weight(event_type):
+    if event_type not in EVENT_WEIGHTS:
+        raise ValueError(f"Unknown event type '{event_type}', expected one of {list(EVENT_WEIGHTS)}")
+    return EVENT_WEIGHTS[event_type]
+
+
+def segment_path(log_path, segment):
+    """Segment 0 is `log_path` itself (events.csv); later ones are events.<n>.csv."""
+    if segment == 0:
+        return log_path
+    root, ext = os.path.splitext(log_path)
+    return f"{root}.{segment}{ext}"
+
+
+def segments(log_path):
+    """Sorted numbers of the segments on disk."""
+    root, ext = os.path.splitext(log_path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"\.(\d+)" + re.escape(ext) + "$")
+    found = [0] if os.path.exists(log_path) else []
+    for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            found.append(int(match.group(1)))
+    return sorted(found)
+
+
+def rotate_log(log_path):
+    """Start a new segment; events appended from now on go there. Returns its number."""
+    segment = max(segments(log_path), default=0) + 1
+    open(segment_path(log_path, segment), "a").close()
+    return segment
+
+
+def prune_log(log_path, before, retention_days=EVENT_LOG_RETENTION_DAYS):
+    """Delete segments numbered below `before` that are older than the retention period."""
+    cutoff = time.time() - retention_days * 86400
+    removed = 0
+    for segment in segments(log_path):
+        path = segment_path(log_path, segment)
+        if segment < before and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def append_events(log_path, events):
+    """
+    Append events (dicts with user_id, product_id, event_type and optional ts)
+    in one write. Returns them as a frame with `ts` and `weight` filled in.
+    """
+    now = time.time()
+    rows = [
+        (float(e.get("ts") or now), e["user_id"], e["product_id"], e["event_type"], event_weight(e["event_type"]))
+        for e in events
+    ]
+    df = pd.DataFrame(rows, columns=LOG_COLUMNS)
+    log_path = segment_path(log_path, max(segments(log_path), default=0))
+    new_file = not os.path.exists(log_path) or os.path.getsize(log_path) == 0
+    with open(log_path, "a", newline="") as f:
+        df.to_csv(f, header=new_file, index=False)
+    return df
+
+
+def read_events(log_path, offset=0, stop=None):
+    """
+    (events of one segment file after byte `offset`, up to byte `stop` if given,
+    offset of the end of the last complete line).
+    """
+    if not os.path.exists(log_path):
+        return pd.DataFrame(columns=LOG_COLUMNS), 0
+    with open(log_path, "rb") as f:
+        f.seek(offset)
+        chunk = f.read() if stop is None else f.read(max(0, stop - offset))
+    # A writer may be mid-line; leave the partial line for the next read
+    end = chunk.rfind(b"\n") + 1
+    chunk = chunk[:end]
+    if offset == 0 and chunk.startswith(b"ts,"):
+        header_end = chunk.find(b"\n") + 1
+        chunk, offset = chunk[header_end:], header_end
+    if not chunk:
+        return pd.DataFrame(columns=LOG_COLUMNS), offset
+    return pd.read_csv(BytesIO(chunk), names=LOG_COLUMNS), offset + len(chunk)
+
+
+def read_log(log_path, position=None, stop=None):
+    """
+    (events after `position`, up to `stop` if given, new position). Positions are
+    (segment, byte offset) tuples; reading continues through later segments.
+    position=None reads every segment still on disk.
+    """
+    segment, offset = position or (0, 0)
+    frames = []
+    for n in segments(log_path):
+        if n < segment:
+            continue
+        if stop is not None and n > stop[0]:
+            break
+        start = offset if n == segment else 0
+        events, end = read_events(
+            segment_path(log_path, n), start, stop=stop[1] if stop is not None and n == stop[0] else None
+        )
+        if len(events):
+            frames.append(events)
+        segment, offset = n, end
+    events = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=LOG_COLUMNS)
+    return events, (segment, offset)
+
+
+def decayed_weights(events, t0, half_life_days=DECAY_HALF_LIFE_DAYS):
+    """Forward-decayed weights relative to t0 (float32)."""
+    age_halves = (events["ts"].to_numpy(dtype=np.float64) - t0) / (half_life_days * 86400)
+    return (events["weight"].to_numpy(dtype=np.float64) * np.exp2(age_halves)).astype(np.float32)
+
+
+def rebase_factor(old_t0, new_t0, half_life_days=DECAY_HALF_LIFE_DAYS):
+    """Multiply matrix values saved relative to old_t0 by this to express them relative to new_t0."""
+    return float(np.exp2((old_t0 - new_t0) / (half_life_days * 86400)))
+
+
+def read_state(model_dir):
+    path = os.path.join(model_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def state_position(state):
+    """Log position recorded in a CF state (states from before segments are in events.csv)."""
+    return (int(state.get("log_segment", 0)), int(state["log_offset"]))
+
+
+def write_state(model_dir, log_position, decay_t0):
+    segment, offset = log_position
+    with open(os.path.join(model_dir, STATE_FILE), "w") as f:
+        json.dump({"log_segment": int(segment), "log_offset": int(offset), "decay_t0": float(decay_t0)}, f)
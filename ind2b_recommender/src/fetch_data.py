@@ -2,6 +2,12 @@ from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 import pandas as pd
+import sys
+
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.catalog import write_snapshot
 
 load_dotenv()
 
@@ -9,6 +15,7 @@ uri = os.getenv("MONGODB_URI")
 db_name = os.getenv("PROD_DB", "test")
 product_collection = os.getenv("PRODUCT_COLLECTION", "products")
 event_collection = os.getenv("EVENT_COLLECTION", "orders")
+order_time_field = os.getenv("ORDER_TIME_FIELD", "createdAt")
 
 client = MongoClient(uri)
 db = client[db_name]
@@ -20,8 +27,8 @@ products = list(db[product_collection].find({}, {"_id": 0}))
 products_df = pd.DataFrame(products)
 print(f"✔ {len(products_df)} products loaded")
 
-# Fetch orders
-orders = list(db[event_collection].find({}, {"_id": 0}))
+# Fetch orders (oldest first; _id identifies the order)
+orders = list(db[event_collection].find({}).sort(order_time_field, 1))
 orders_df = pd.DataFrame(orders)
 print(f"✔ {len(orders_df)} orders loaded")
 
@@ -35,20 +42,32 @@ seller_products = (
     .to_dict()
 )
 
+missing_time = 0
 for _, row in orders_df.iterrows():
     buyer = row.get("buyer_id")
     seller = row.get("seller_id")
+    order_id = str(row.get("_id"))
+
+    # Order time (unix seconds) so evaluation can split on it; all rows of an order share it
+    placed = pd.to_datetime(row.get(order_time_field), utc=True, errors="coerce")
+    if pd.isna(placed):
+        missing_time += 1
+        ts = float("nan")
+    else:
+        ts = placed.timestamp()
 
     # If seller has products, assign them to this buyer
     product_ids = seller_products.get(seller, [])
 
     for pid in product_ids:
-        interaction_rows.append([buyer, pid, "purchase", 5])
+        interaction_rows.append([buyer, pid, "purchase", 5, order_id, ts])
 
 interactions_df = pd.DataFrame(interaction_rows,
-                               columns=["user_id", "product_id", "event_type", "weight"])
+                               columns=["user_id", "product_id", "event_type", "weight", "order_id", "ts"])
 
 print(f"✔ {len(interactions_df)} user-product interactions created")
+if missing_time:
+    print(f"⚠️ Warning: {missing_time} orders have no {order_time_field}; their interactions have an empty ts.")
 
 # Create data folder if missing
 os.makedirs("../data", exist_ok=True)
@@ -56,6 +75,10 @@ os.makedirs("../data", exist_ok=True)
 products_df.to_csv("../data/products.csv", index=False)
 interactions_df.to_csv("../data/interactions.csv", index=False)
 
+# Columnar snapshot the API loads instead of parsing the CSV
+write_snapshot(products_df, "../data", source="../data/products.csv")
+
 print("\n🎯 EXPORT COMPLETE!")
 print(f"📁 products.csv = {len(products_df)} rows")
 print(f"📁 interactions.csv = {len(interactions_df)} rows")
+print("📁 catalog_store/ = columnar snapshot")
@@ -0,0 +1,189 @@
+"""
+Precomputed facet indexes (price, category, brand) and browse sort orders
+"""
+
+import numpy as np
+
+CATEGORY_FIELDS = ("category_name", "sub_category_name", "category_id")
+BRAND_FIELDS = ("seller_name", "model")
+
+# Alternate spellings tried only when a facet value matches nothing as typed
+CATEGORY_SYNONYMS = {
+    "glue": ["adhesive"],
+    "adhesive": ["glue"],
+    "jigsaw": ["jig saw"],
+    "jig saw": ["jigsaw"],
+    "stabiliser": ["stabilizer"],
+    "stabilizer": ["stabiliser"],
+}
+BRAND_SYNONYMS = {
+    "black and decker": ["black+decker"],
+    "black & decker": ["black+decker"],
+    "blackdecker": ["black+decker"],
+}
+
+# (column, descending) for the no-query browse path
+SORT_ORDERS = {
+    "rating": ("rating", True),
+    "discount": ("discount", True),
+    "price_asc": ("price", False),
+    "price_desc": ("price", True),
+    "stock": ("stock", True),
+}
+
+
+def normalize_value(value):
+    """Facet vocabulary key for a raw column value; None for missing."""
+    if value is None or value != value:
+        return None
+    return str(value).strip().lower()
+
+
+def _variants(term, synonyms, fold_plural=False):
+    """Synonym (and optionally singular/plural) variants of a facet term."""
+    out = list(synonyms.get(term, []))
+    if fold_plural:
+        if term.endswith("es") and len(term) > 4:
+            out.append(term[:-2])
+        if term.endswith("s") and len(term) > 3:
+            out.append(term[:-1])
+        else:
+            out.append(term + "s")
+    return [v for v in out if v != term]
+
+
+class FacetIndex:
+    """
+    Row-id sets per normalized category/brand value plus a sorted price array.
+    Rows are positional indices into the catalog DataFrame it was built from;
+    every lookup returns a sorted int64 array of rows.
+    """
+
+    def __init__(self, df, keyword_index=None):
+        self.n_rows = len(df)
+        self.keyword_index = keyword_index
+        self.all_rows = np.arange(self.n_rows, dtype=np.int64)
+
+        # Price: rows sorted by price (missing prices never match a range)
+        prices = df["price"].to_numpy(dtype=np.float64) if "price" in df.columns else np.full(self.n_rows, np.nan)
+        priced = np.flatnonzero(~np.isnan(prices))
+        order = priced[np.argsort(prices[priced], kind="stable")]
+        self.price_rows_sorted = order
+        self.prices_sorted = prices[order]
+
+        self.category_fields = [c for c in CATEGORY_FIELDS if c in df.columns]
+        self.brand_fields = [c for c in BRAND_FIELDS if c in df.columns]
+        self.category_vocab = self._build_vocab(df, self.category_fields)
+        self.brand_vocab = self._build_vocab(df, self.brand_fields)
+
+        # Browse orders: position of each row in every precomputed ranking
+        self.sort_ranks = {}
+        for name, (col, descending) in SORT_ORDERS.items():
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy(dtype=np.float64)
+            keys = np.where(np.isnan(values), np.inf, -values if descending else values)
+            order = np.argsort(keys, kind="stable")
+            ranks = np.empty(self.n_rows, dtype=np.int64)
+            ranks[order] = np.arange(self.n_rows)
+            self.sort_ranks[name] = ranks
+        self.default_sort = "rating" if "rating" in self.sort_ranks else "discount"
+
+    @staticmethod
+    def _build_vocab(df, fields):
+        vocab = {}
+        for col in fields:
+            buckets = {}
+            for row, value in enumerate(df[col].tolist()):
+                key = normalize_value(value)
+                if key:
+                    buckets.setdefault(key, []).append(row)
+            for key, rows in buckets.items():
+                prev = vocab.get(key)
+                rows = np.asarray(rows, dtype=np.int64)
+                vocab[key] = rows if prev is None else np.union1d(prev, rows)
+        return vocab
+
+    # ----------------------
+    # Single-facet lookups
+    # ----------------------
+    def price_rows(self, min_price=None, max_price=None):
+        lo = 0 if min_price is None else np.searchsorted(self.prices_sorted, min_price, side="left")
+        hi = len(self.prices_sorted) if max_price is None else np.searchsorted(self.prices_sorted, max_price, side="right")
+        return np.sort(self.price_rows_sorted[lo:hi])
+
+    def _resolve(self, vocab, term, title_fallback, variants):
+        """Union of rows whose vocabulary value contains `term` (case-insensitive)."""
+        rows = self._substring_rows(vocab, term, title_fallback)
+        if rows.size == 0:
+            for variant in variants:
+                rows = self._substring_rows(vocab, variant, title_fallback)
+                if rows.size:
+                    break
+        return rows
+
+    def _substring_rows(self, vocab, term, title_fallback):
+        parts = [rows for key, rows in vocab.items() if term in key]
+        if title_fallback and self.keyword_index is not None:
+            parts.append(np.asarray(self.keyword_index.search(term, fields=("title",)), dtype=np.int64))
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+    def category_rows(self, category):
+        term = str(category).strip().lower()
+        # If no category columns, search in title as a backup
+        return self._resolve(
+            self.category_vocab, term,
+            title_fallback=not self.category_fields,
+            variants=_variants(term, CATEGORY_SYNONYMS, fold_plural=True),
+        )
+
+    def brand_rows(self, brand):
+        term = str(brand).strip().lower()
+        return self._resolve(
+            self.brand_vocab, term,
+            title_fallback=True,
+            variants=_variants(term, BRAND_SYNONYMS),
+        )
+
+    # ----------------------
+    # Combined filter + browse order
+    # ----------------------
+    def filter(self, min_price=None, max_price=None, category=None, brand=None):
+        """Sorted candidate rows for the given filters, or None when unfiltered."""
+        sets = []
+        if min_price is not None or max_price is not None:
+            sets.append(self.price_rows(min_price, max_price))
+        if category:
+            sets.append(self.category_rows(category))
+        if brand:
+            sets.append(self.brand_rows(brand))
+        if not sets:
+            return None
+
+        sets.sort(key=len)
+        rows = sets[0]
+        for other in sets[1:]:
+            if rows.size == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def top_rows(self, rows=None, n=5, sort=None):
+        """
+        First `n` rows (restricted to `rows`) in a precomputed browse order.
+        Raises ValueError for a `sort` that is not one of SORT_ORDERS.
+        """
+        if sort is not None and sort not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort '{sort}'; expected one of {', '.join(SORT_ORDERS)}")
+        ranks = self.sort_ranks.get(sort or self.default_sort)
+        if rows is None:
+            rows = self.all_rows
+        if ranks is None:
+            return rows[:n]
+        keys = ranks[rows]
+        if n < len(rows):
+            part = np.argpartition(keys, n)[:n]
+            return rows[part[np.argsort(keys[part])]]
+        return rows[np.argsort(keys)]
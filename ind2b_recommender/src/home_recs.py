@@ -0,0 +1,79 @@
+"""
+Precomputed home-page recommendations (written by src/precompute_recommendations.py).
+
+Layout in a model version:
+  home_recommendations.npz
+    user_ids      [U]
+    product_ids   [U, n] best first, -1 padded
+    scores        [U, n] float32
+    log_position  event-log (segment, byte offset) the scores include
+    cf_model      CF_MODEL they were scored with
+    sources       sha256 of the CF artifacts they were scored from (JSON)
+
+The API serves a user's precomputed row until an event for that user is
+applied, then scores them live. A version whose CF artifacts no longer match
+`sources` (retrain, compaction, build_als) ignores the table.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from src.als import ALS_FILE
+from src.collaborative import CF_FILE, ITEM_NEIGHBORS_FILE, NEIGHBORS_FILE
+
+HOME_RECS_FILE = "home_recommendations.npz"
+CF_SOURCES = (CF_FILE, NEIGHBORS_FILE, ITEM_NEIGHBORS_FILE, ALS_FILE)
+
+
+def cf_sources(manifest):
+    """{artifact: sha256} of the CF artifacts in a model version manifest (None if unversioned)."""
+    if manifest is None:
+        return None
+    return {name: manifest["files"][name]["sha256"] for name in CF_SOURCES if name in manifest["files"]}
+
+
+class HomeRecommendations:
+    def __init__(self, user_ids, product_ids, scores, log_position, cf_model, sources):
+        self.user_ids = np.asarray(user_ids)
+        self.product_ids = product_ids
+        self.scores = scores
+        self.log_position = tuple(int(v) for v in log_position)
+        self.cf_model = cf_model
+        self.sources = sources
+        self.user_to_idx = {u: i for i, u in enumerate(self.user_ids.tolist())}
+
+    def save(self, model_dir):
+        np.savez(
+            os.path.join(model_dir, HOME_RECS_FILE),
+            user_ids=self.user_ids,
+            product_ids=self.product_ids,
+            scores=self.scores,
+            log_position=np.array(self.log_position),
+            cf_model=np.array(self.cf_model),
+            sources=np.array(json.dumps(self.sources, sort_keys=True)),
+        )
+
+    @classmethod
+    def load(cls, model_dir):
+        with np.load(os.path.join(model_dir, HOME_RECS_FILE)) as saved:
+            return cls(
+                saved["user_ids"],
+                saved["product_ids"],
+                saved["scores"],
+                saved["log_position"].tolist(),
+                str(saved["cf_model"]),
+                json.loads(str(saved["sources"])),
+            )
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def product_ids_for(self, user_id, n):
+        """The user's top-n precomputed product ids, or None if not covered (unknown user, n too large)."""
+        i = self.user_to_idx.get(user_id)
+        if i is None or n > self.product_ids.shape[1]:
+            return None
+        ids = self.product_ids[i, :n]
+        return ids[ids >= 0]
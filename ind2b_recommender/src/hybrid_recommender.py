@@ -1,259 +1,887 @@
 import pickle
+import threading
+import time
 import numpy as np
 import pandas as pd
 import os
 
+from src import embeddings, model_store, popularity, vector_search
+from src.ann_index import IVFIndex
+from src.catalog import load_catalog, read_manifest as read_catalog_manifest, source_stamp
+from src.als import ALS_FILE, ALSModel
+from src.content import content_text, tfidf_vectorizer
+from src.collaborative import CF_FILE, ITEM_NEIGHBORS_FILE, InteractionMatrix, ItemKNN, UserKNN, add_interactions
+from src.event_log import LOG_FILE, append_events, decayed_weights, read_log, read_state, state_position
+from src.filter_index import FacetIndex, normalize_value
+from src.home_recs import HOME_RECS_FILE, HomeRecommendations, cf_sources
+from src.payload_cache import PayloadCache, catalog_fingerprint
+from src.popularity import PopularityRanker, category_keys
+from src.query_parser import QueryParser
+from src.response_cache import (
+    CACHE_WARM_QUERIES,
+    QUERY_LOG_FILE,
+    QUERY_VECTOR_CACHE_BYTES,
+    RESPONSE_CACHE_BYTES,
+    RESPONSE_CACHE_TTL,
+    LRUCache,
+    QueryLog,
+    normalize_filter,
+    normalize_query,
+    vector_nbytes,
+)
+from src.text_index import INDEX_FIELDS, InvertedIndex
+from src.user_profiles import HYBRID_CANDIDATES, UserProfiles, blend
+
 # ======================
 # PATH SETUP
 # ======================
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
-MODEL_DIR = os.path.join(BASE_DIR, "models")
-DATA_DIR = os.path.join(BASE_DIR, "data")
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+CONTENT_TOP_K = int(os.getenv("CONTENT_TOP_K", "50"))
+# Collaborative filtering model: "knn" (user-user cosine), "item" (item-item
+# co-interaction neighbors) or "als" (implicit ALS factors)
+CF_MODEL = os.getenv("CF_MODEL", "knn").lower()
+CF_NEIGHBORS = int(os.getenv("CF_NEIGHBORS", "5"))  # similar users blended per recommendation (knn)
+
+# Semantic search index: "exact" scores every candidate row, "ivf" probes an
+# approximate index built by train_model (ANN_NPROBE trades recall for latency)
+SEARCH_INDEX = os.getenv("SEARCH_INDEX", "exact").lower()
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_EXACT_BELOW = int(os.getenv("ANN_EXACT_BELOW", "2000"))  # small candidate sets are scored exactly
+
+# Semantic vectors: "sparse" TF-IDF rows, or "dense" LSA embeddings (memory-mapped .npy)
+SEMANTIC_MODE = os.getenv("SEMANTIC_MODE", "sparse").lower()
+DENSE_MIN_SCORE = float(os.getenv("DENSE_MIN_SCORE", "0.2"))  # LSA scores are rarely exactly 0
+
+# search_product blends keyword (BM25, scaled to the best hit) and vector scores
+HYBRID_KEYWORD_WEIGHT = float(os.getenv("HYBRID_KEYWORD_WEIGHT", "0.6"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.4"))
+
+# Seconds between checks for a new model version / catalog (0 = only on demand)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "30"))
+
+# "build": missing or out-of-date artifacts are rebuilt while loading (TF-IDF refit,
+# neighbor table, catalog import). "prebuilt": only a published, catalog-matched model
+# version is accepted; anything that would need a rebuild raises ValueError instead.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "build").lower()
+
+# The log is shared by every snapshot; each one tracks how far it has replayed it
+EVENT_LOG_PATH = os.path.join(DATA_DIR, LOG_FILE)
+query_log = QueryLog(os.path.join(DATA_DIR, QUERY_LOG_FILE), enabled=CACHE_WARM_QUERIES > 0)
+
+
+def search_params(query="", n=5, min_price=None, max_price=None, category=None, brand=None, sort=None):
+    """Normalized search arguments: the response cache key and the query log record."""
+    return {
+        "query": normalize_query(query),
+        "n": n,
+        "min_price": min_price,
+        "max_price": max_price,
+        "category": normalize_filter(category),
+        "brand": normalize_filter(brand),
+        "sort": sort,
+    }
+
+
+def catalog_stamp(data_dir):
+    """Changes whenever products.csv changes or a new columnar snapshot becomes active."""
+    csv_path = os.path.join(data_dir, "products.csv")
+    manifest = read_catalog_manifest(data_dir)
+    return (
+        source_stamp(csv_path) if os.path.exists(csv_path) else None,
+        manifest.get("created_at") if manifest else None,
+    )
 
-# ======================
-# LOAD DATA + MODELS
-# ======================
-products_df = pd.read_csv(os.path.join(DATA_DIR, "products.csv"))
 
-user_ids = pickle.load(open(os.path.join(MODEL_DIR, "user_ids.pkl"), "rb"))
-product_ids = pickle.load(open(os.path.join(MODEL_DIR, "product_ids.pkl"), "rb"))
-matrix = pickle.load(open(os.path.join(MODEL_DIR, "user_item_matrix.pkl"), "rb"))
-user_sim = pickle.load(open(os.path.join(MODEL_DIR, "user_similarity.pkl"), "rb"))
+class Snapshot:
+    """
+    Everything the API serves from: one catalog load plus one model version.
+
+    Built in full before it is used, then swapped in as a whole by reload();
+    a request keeps the snapshot it started with (see current()), so it never
+    mixes rows from one catalog with payloads or models from another.
+    Logged events are the only thing applied to a snapshot in place.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, data_dir=DATA_DIR, mode=STARTUP_MODE):
+        self.prebuilt = mode == "prebuilt"
+        self.version = model_store.current_version(model_dir)
+        self.loaded_at = time.time()
+        self.timings = {}
+        self._tfidf = None
+        self._tfidf_bytes = None
+        self._tfidf_lock = threading.Lock()
+        artifact_dir = model_store.active_dir(model_dir)
+
+        # Raises ValueError on missing / corrupt files; the caller keeps its old snapshot
+        self._timed("verify", self._verify, artifact_dir)
+        self._timed("catalog", self._load_catalog, data_dir)
+        self._timed("cf", self._load_cf, artifact_dir)
+        self._timed("content", self._load_content, artifact_dir)
+        self._timed("indexes", self._build_indexes, artifact_dir)
+        self._timed("events", self._init_events, artifact_dir)
+        print(f"⏱️ Snapshot {self.version or 'unversioned'} loaded in {sum(self.timings.values()):.2f}s (" +
+              ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.timings.items()) + ")")
+        if self._tfidf is None:
+            # Unpickling imports sklearn (seconds): done off the load path, before the first query needs it
+            threading.Thread(target=self._load_tfidf, name="tfidf-load", daemon=True).start()
+
+    def _timed(self, phase, load, *args):
+        t = time.perf_counter()
+        load(*args)
+        self.timings[phase] = round(time.perf_counter() - t, 3)
+
+    def _rebuild(self, reason):
+        """Called before building something at load time; refused in prebuilt mode."""
+        if self.prebuilt:
+            raise ValueError(f"STARTUP_MODE=prebuilt: {reason}. Run `python src/train_model.py` and reload.")
+        print(f"Warning: {reason}. Rebuilding on startup...")
+
+    # ======================
+    # LOAD DATA + MODELS
+    # ======================
+    def _verify(self, model_dir):
+        self.manifest = model_store.verify(model_dir)
+        if self.manifest is None and self.prebuilt:
+            raise ValueError(
+                f"STARTUP_MODE=prebuilt: no published model version in {model_dir}. Run `python src/train_model.py`."
+            )
+
+    def _load_catalog(self, data_dir):
+        # Hot columns stay in RAM; descriptions/images live in a memory-mapped side store
+        # Stamp first: a snapshot published mid-load then still reads as a change
+        self.catalog_stamp = catalog_stamp(data_dir)
+        self.catalog = load_catalog(data_dir, import_stale=not self.prebuilt)
+        self.products_df = self.catalog.hot
+        self.catalog_fingerprint = catalog_fingerprint(self.products_df)
+
+        trained_on = (self.manifest or {}).get("catalog_fingerprint")
+        if trained_on is not None and trained_on != self.catalog_fingerprint:
+            if self.prebuilt:
+                raise ValueError(
+                    f"STARTUP_MODE=prebuilt: model version {self.version} was trained on catalog {trained_on}, "
+                    f"the current catalog is {self.catalog_fingerprint}. Retrain before serving it."
+                )
+            print(f"Warning: model version {self.version} was trained on a different catalog. "
+                  "Artifacts that no longer line up fall back to startup builds.")
+
+        # CF column -> catalog row (-1 for products no longer in the catalog)
+        self.row_of_product = {pid: row for row, pid in enumerate(self.products_df["product_id"].tolist())}
+        self.indices = pd.Series(self.products_df.index, index=self.products_df["product_id"])
+
+    def _load_cf(self, model_dir):
+        # cf_matrix.npz is loaded once; every CF model below shares it (and its id maps)
+        cf_data = InteractionMatrix.load(model_dir) if os.path.exists(os.path.join(model_dir, CF_FILE)) else None
+
+        # Item-item neighbors also back "customers also bought", whatever CF_MODEL is
+        self.item_cf = None
+        if cf_data is not None and os.path.exists(os.path.join(model_dir, ITEM_NEIGHBORS_FILE)):
+            try:
+                self.item_cf = ItemKNN.load(model_dir, cf_data)
+            except ValueError as e:
+                print(f"Warning: {e}. 'Customers also bought' falls back to similar products.")
+
+        # Sparse user-item matrix; KNN user neighbors come from a precomputed top-K table
+        # (if train_model wrote one) or a sparse mat-vec per request
+        cf_model = None
+        if CF_MODEL == "item":
+            if self.item_cf is not None:
+                cf_model = self.item_cf
+            else:
+                print("Warning: CF_MODEL=item but no item neighbors found. Using user KNN.")
+        elif CF_MODEL == "als":
+            if cf_data is not None and os.path.exists(os.path.join(model_dir, ALS_FILE)):
+                try:
+                    cf_model = ALSModel.load(model_dir, cf_data)
+                except ValueError as e:
+                    print(f"Warning: {e}. Using user KNN.")
+            else:
+                print("Warning: CF_MODEL=als but no trained factors found. Using user KNN.")
+        if cf_model is None:
+            if cf_data is not None:
+                cf_model = UserKNN.load(model_dir, cf_data)
+            else:
+                print("Warning: no collaborative filtering model found. Every user gets cold-start results.")
+                cf_model = UserKNN.empty()
+        self.cf_model = cf_model
+
+        self.cf_rows = self._extend_rows(None, cf_model.product_ids)
+        self.item_cf_rows = None if self.item_cf is None else self._extend_rows(None, self.item_cf.product_ids)
+
+        # Nightly precomputed rows (precompute_recommendations.py), only if scored from these CF artifacts
+        self.home_recs = None
+        if os.path.exists(os.path.join(model_dir, HOME_RECS_FILE)):
+            home_recs = HomeRecommendations.load(model_dir)
+            if home_recs.cf_model == CF_MODEL and home_recs.sources == cf_sources(self.manifest):
+                self.home_recs = home_recs
+            else:
+                print("Warning: precomputed home recommendations are out of date. Scoring users per request.")
+        # Users with events applied after the precompute; their precomputed rows are stale
+        self.home_stale_users = set()
+
+    @property
+    def tfidf(self):
+        """Fitted TF-IDF vectorizer, unpickled from the bytes read at load time."""
+        if self._tfidf is None:
+            with self._tfidf_lock:
+                if self._tfidf is None:
+                    t = time.perf_counter()
+                    self._tfidf = pickle.loads(self._tfidf_bytes)
+                    self._tfidf_bytes = None
+                    self.timings["tfidf_vectorizer"] = round(time.perf_counter() - t, 3)
+        return self._tfidf
+
+    def _load_tfidf(self):
+        try:
+            self.tfidf
+        except Exception as e:
+            print(f"Warning: could not unpickle the TF-IDF vectorizer ({e}). Text queries will fail.")
+
+    def _extend_rows(self, rows, product_ids):
+        """Catalog rows for CF columns, extended for columns added since `rows` was built."""
+        if rows is not None and len(rows) == len(product_ids):
+            return rows
+        start = 0 if rows is None else len(rows)
+        extra = np.array([self.row_of_product.get(pid, -1) for pid in product_ids[start:]], dtype=np.int64)
+        return extra if rows is None else np.concatenate([rows, extra])
+
+    def _load_content(self, model_dir):
+        # ======================
+        # CONTENT BASED (TF-IDF)
+        # ======================
+        # Load pre-trained models if available (Preferred). The vectorizer's bytes are
+        # read now, so a later prune of this version can't break it; unpickling it
+        # (which imports sklearn) happens on a background thread after the load.
+        try:
+            with open(os.path.join(model_dir, "tfidf_vectorizer.pkl"), "rb") as f:
+                tfidf_bytes = f.read()
+            self.tfidf_matrix = pickle.load(open(os.path.join(model_dir, "tfidf_matrix.pkl"), "rb"))
+            self._tfidf_bytes = tfidf_bytes
+            tfidf_trained = True
+
+        except Exception as e:
+            self._rebuild(f"Could not load trained models ({e})")
+            # Fallback to training, with train_model's text recipe and vectorizer settings
+            self._tfidf = tfidf_vectorizer()
+            # Descriptions are read once from the cold store
+            text_df = self.catalog.frame(["title", "description", "category_id", "brand", "seller_name"])
+            text = content_text(text_df)
+            self.tfidf_matrix = self._tfidf.fit_transform(text)
+            del text_df, text
+            tfidf_trained = False
+        self.tfidf_trained = tfidf_trained
+        catalog_ids = self.products_df["product_id"].to_numpy()
+
+        # Content neighbors: per-product top-K table (ids + float32 scores) from train_model.
+        # Replaces the dense N x N cosine_sim matrix; memory is O(N * K).
+        neighbors_path = os.path.join(model_dir, "content_neighbors.npz")
+        self.neighbor_ids = self.neighbor_scores = None
+        if tfidf_trained and os.path.exists(neighbors_path):
+            with np.load(neighbors_path) as saved:
+                # Rows must still line up with products.csv
+                if np.array_equal(saved["product_ids"], catalog_ids):
+                    self.neighbor_ids, self.neighbor_scores = saved["ids"], saved["scores"]
+        if self.neighbor_ids is None:
+            self._rebuild("content neighbor table is missing or out of date with products.csv")
+            self.neighbor_ids, self.neighbor_scores = vector_search.build_neighbor_table(
+                self.tfidf_matrix, k=CONTENT_TOP_K
+            )
+
+        # Semantic vectors: sparse TF-IDF by default, dense LSA embeddings when enabled
+        self.semantic_matrix = self.tfidf_matrix
+        self.semantic_components = None
+        self.semantic_scale = 1.0
+        self.semantic_min_score = 0.0
+        if SEMANTIC_MODE == "dense":
+            if tfidf_trained and embeddings.exists(model_dir):
+                dense_vecs, components, scale, dense_product_ids = embeddings.load(model_dir)
+                if np.array_equal(dense_product_ids, catalog_ids):
+                    self.semantic_matrix, self.semantic_components, self.semantic_scale = dense_vecs, components, scale
+                    self.semantic_min_score = DENSE_MIN_SCORE
+                else:
+                    print("Warning: dense embeddings are out of date with products.csv. Using TF-IDF vectors.")
+            else:
+                print("Warning: SEMANTIC_MODE=dense but no trained embeddings found. Using TF-IDF vectors.")
+
+        # Optional approximate index for semantic search
+        self.ann_index = None
+        ann_path = os.path.join(model_dir, "ann_ivf.npz" if self.semantic_components is None else "ann_ivf_dense.npz")
+        if SEARCH_INDEX == "ivf":
+            if tfidf_trained and os.path.exists(ann_path):
+                self.ann_index, ann_product_ids = IVFIndex.load(ann_path, nprobe=ANN_NPROBE)
+                if not np.array_equal(ann_product_ids, catalog_ids):
+                    print("Warning: ANN index is out of date with products.csv. Using exact search.")
+                    self.ann_index = None
+            else:
+                print("Warning: SEARCH_INDEX=ivf but no trained ANN index found. Using exact search.")
+
+    def _build_indexes(self, model_dir):
+        # Keyword index (title/description/model/seller) and facet indexes, built once per catalog load
+        # (descriptions are tokenized once; only short fields keep raw text for substring matching)
+        self.keyword_index = InvertedIndex(
+            self.catalog.frame(INDEX_FIELDS), text_fields=("title", "model", "seller_name")
+        )
+        self.facet_index = FacetIndex(self.products_df, self.keyword_index)
+        # Brand / category / price fast path for /smart-search, from the same vocabularies
+        self.query_parser = QueryParser(self.products_df, self.keyword_index)
+
+        # Cold-start rankings (trending / popular / per category) as ranked row arrays
+        self.popularity_ranker = PopularityRanker(
+            popularity.load(model_dir),
+            self.row_of_product,
+            category_keys(self.products_df),
+            fallback=self.facet_index.top_rows(None, len(self.products_df)),
+        )
+
+        # Per-user content profiles in the semantic space, kept current by sync_events
+        self.user_profiles = UserProfiles(self.semantic_matrix, self._user_history)
+
+        # Cleaned, JSON-ready payload per product; rebuilt whenever the catalog is loaded
+        self.payload_cache = PayloadCache(self.products_df, self.catalog.cold, self.catalog_fingerprint)
+
+        # Encoded responses and query vectors; a new snapshot starts with empty caches
+        self.response_cache = LRUCache(RESPONSE_CACHE_BYTES, ttl=RESPONSE_CACHE_TTL)
+        self.query_vectors = LRUCache(QUERY_VECTOR_CACHE_BYTES, size=vector_nbytes)
+
+    # ======================
+    # INCREMENTAL CF UPDATES (event log)
+    # ======================
+    # The saved models include the log up to cf_state.json's position; the tail is
+    # replayed by sync_events and new events are applied in place as they arrive.
+    def _init_events(self, model_dir):
+        cf_state = read_state(model_dir)
+        if cf_state is None:
+            # Models trained before the event log existed: treat the matrix as of its write time
+            cf_path = os.path.join(model_dir, CF_FILE)
+            cf_state = {"log_offset": 0, "decay_t0": os.path.getmtime(cf_path) if os.path.exists(cf_path) else time.time()}
+        self.cf_state = cf_state
+        self.event_log_position = state_position(cf_state)
+        # Bumped whenever events are applied; part of the cache key of CF / popularity responses
+        self.event_generation = 0
+
+    def sync_events(self):
+        """Apply events appended to the log since the last sync (by any process). Returns the count."""
+        with _events_lock:
+            applied = 0
+            if self.home_recs is not None and self.event_log_position < self.home_recs.log_position:
+                # Already part of the precomputed home recommendations
+                events, self.event_log_position = read_log(
+                    EVENT_LOG_PATH, self.event_log_position, stop=self.home_recs.log_position
+                )
+                applied += self._apply_events(events)
+            events, self.event_log_position = read_log(EVENT_LOG_PATH, self.event_log_position)
+            self.home_stale_users.update(events["user_id"].tolist())
+            return applied + self._apply_events(events)
+
+    def _apply_events(self, events):
+        # Called under _events_lock
+        if len(events) == 0:
+            return 0
+        users = events["user_id"].tolist()
+        products = events["product_id"].tolist()
+        weights = decayed_weights(events, self.cf_state["decay_t0"])
+        item_cf, cf_model = self.item_cf, self.cf_model
+        models = [cf_model] if item_cf is None or item_cf is cf_model else [cf_model, item_cf]
+        with self.user_profiles.lock:
+            add_interactions(models, users, products, weights)
+            self.cf_rows = self._extend_rows(self.cf_rows, cf_model.product_ids)
+            if item_cf is not None:
+                self.item_cf_rows = self._extend_rows(self.item_cf_rows, item_cf.product_ids)
+            rows = [self.row_of_product.get(pid, -1) for pid in products]
+            self.user_profiles.add_interactions(users, rows, weights)
+        self.popularity_ranker.add_events(products, events["weight"].to_numpy(), events["ts"].to_numpy())
+        self.event_generation += 1
+        return len(events)
+
+    # ======================
+    # COLLABORATIVE FILTERING (User KNN, item KNN or ALS)
+    # ======================
+    def _cold_start_rows(self, n, user_id=None):
+        # cold start: trending, then popular, then the default browse order,
+        # without what a known user has already interacted with
+        history = self._user_history(user_id) if user_id is not None else None
+        return self.popularity_ranker.cold_start(n, exclude=history[0] if history is not None else None)
+
+    def recommend_rows_for_users(self, user_ids, n=10):
+        """
+        Catalog rows (best first) for each of `user_ids`, from the CF model.
+        Users covered by the precomputed home recommendations (and without newer
+        events) are served from them; other known users are scored together in one batch; unknown users,
+        or users without any positive-scoring item, get cold-start rows (minus their history).
+        """
+        rows_map = self.cf_rows  # may be swapped by sync_events mid-request
+        cf_model = self.cf_model
+        results = [None] * len(user_ids)
+        if self.home_recs is not None:
+            for i, u in enumerate(user_ids):
+                if u not in self.home_stale_users:
+                    ids = self.home_recs.product_ids_for(u, n)
+                    if ids is not None and ids.size:
+                        rows = np.array([self.row_of_product.get(pid, -1) for pid in ids.tolist()], dtype=np.int64)
+                        results[i] = rows[rows >= 0]
+        known = [i for i, u in enumerate(user_ids) if results[i] is None and u in cf_model.user_to_idx]
+        if known:
+            uidxs = [cf_model.user_to_idx[user_ids[i]] for i in known]
+            cols, _ = cf_model.recommend(uidxs, n, CF_NEIGHBORS, exclude=rows_map < 0)
+            for i, user_cols in zip(known, cols):
+                user_cols = user_cols[user_cols >= 0]
+                if user_cols.size:
+                    results[i] = rows_map[user_cols]
+        return [rows if rows is not None else self._cold_start_rows(n, u) for u, rows in zip(user_ids, results)]
+
+    def recommend_rows_for_user(self, user_id, n=10):
+        """Catalog rows recommended by the CF model, best first."""
+        return self.recommend_rows_for_users([user_id], n)[0]
+
+    def recommend_for_user(self, user_id, n=10):
+        """Return item recommendations from the CF model (CF_MODEL=knn|item|als)."""
+        return self._records(self.recommend_rows_for_user(user_id, n))
+
+    # ======================
+    # CONTENT BASED (TF-IDF)
+    # ======================
+    def encode_query(self, text):
+        """Query vector in the active semantic space (cached per normalized text)."""
+        text = normalize_query(text)
+        return self.query_vectors.get_or_build(text, lambda: self._encode_query(text))
+
+    def _encode_query(self, text):
+        query_vec = self.tfidf.transform([text])
+        if self.semantic_components is not None:
+            return embeddings.encode(query_vec, self.semantic_components)
+        return query_vec
+
+    def _semantic_top(self, query_vec, n, rows=None):
+        """Top-n (rows, scores) for a query vector, via the ANN index when enabled."""
+        # int8 embeddings score in quantized units; threshold and scores are rescaled
+        min_score = self.semantic_min_score / self.semantic_scale
+        if self.ann_index is not None and (rows is None or len(rows) > ANN_EXACT_BELOW):
+            cand = self.ann_index.candidates(query_vec)
+            if rows is not None:
+                cand = np.intersect1d(cand, rows, assume_unique=True)
+            rows = cand
+        top_rows, scores = vector_search.search(query_vec, self.semantic_matrix, n, rows=rows, min_score=min_score)
+        return top_rows, scores * self.semantic_scale
+
+    def _hybrid_top(self, query, n, rows=None):
+        """
+        One scoring pass over the candidate rows: BM25 + vector similarity,
+        blended with HYBRID_KEYWORD_WEIGHT / HYBRID_VECTOR_WEIGHT -> top-n (rows, scores).
+        """
+        kw_rows, kw_scores = self.keyword_index.bm25(query, rows=rows)
+        query_vec = self.encode_query(query)
+
+        cand = rows
+        if self.ann_index is not None and (rows is None or len(rows) > ANN_EXACT_BELOW):
+            cand = self.ann_index.candidates(query_vec)
+            if rows is not None:
+                cand = np.intersect1d(cand, rows, assume_unique=True)
+            # keyword hits are always scored, even outside the probed lists
+            cand = np.union1d(cand, kw_rows)
+
+        vec_scores = vector_search.score_rows(query_vec, self.semantic_matrix, cand) * self.semantic_scale
+        vec_scores[vec_scores <= self.semantic_min_score] = 0
+        cand_rows = self.facet_index.all_rows if cand is None else np.asarray(cand, dtype=np.int64)
+
+        blended = HYBRID_VECTOR_WEIGHT * vec_scores
+        if kw_rows.size:
+            blended[np.searchsorted(cand_rows, kw_rows)] += HYBRID_KEYWORD_WEIGHT * kw_scores / kw_scores.max()
+
+        best = vector_search.top_k(blended, n)
+        return cand_rows[best], blended[best]
+
+    def _user_history(self, user_id):
+        """(catalog rows, CF weights) of a user's interactions, or None for unknown users."""
+        uidx = self.cf_model.user_to_idx.get(user_id)
+        if uidx is None:
+            return None
+        rows_map = self.cf_rows  # the matrix may gain columns before cf_rows
+        cols, weights = self.cf_model.matrix.row(uidx)
+        rows = np.full(len(cols), -1, dtype=np.int64)
+        known = cols < len(rows_map)
+        rows[known] = rows_map[cols[known]]
+        return rows, weights
+
+    def _records(self, rows):
+        """JSON-ready records for positional catalog rows."""
+        return self.payload_cache.records_for(rows)
+
+    def payload_json(self, rows):
+        """Pre-encoded JSON array for positional catalog rows."""
+        return self.payload_cache.json_for(rows)
+
+    def cached_json(self, key, build, live=False):
+        """
+        Response bytes for `key` from the response cache, else build() them.
+        `live` responses depend on CF / popularity state, so they are only
+        reused until the next batch of events is applied.
+        """
+        if live:
+            key = key + (self.event_generation,)
+        return self.response_cache.get_or_build(key, build)
+
+    def search_json(self, query="", n=5, **filters):
+        """Encoded search results for the normalized query + filters, cached."""
+        params = search_params(query, n, **filters)
+        query = params.pop("query")
+        key = ("search", query) + tuple(params.values())
+        return self.response_cache.get_or_build(
+            key, lambda: self.payload_json(self.search_product_rows(query, **params))
+        )
+
+    def trending_rows(self, n=10):
+        """Trending catalog rows (decayed recent interactions), topped up with popular ones."""
+        return self.popularity_ranker.top("trending", n)
+
+    def popular_rows(self, n=10, category=None):
+        """Most-interacted catalog rows, optionally within a category (facet match)."""
+        if not category:
+            return self.popularity_ranker.top("popular", n)
+        rows = self.facet_index.category_rows(category)
+        return self.popularity_ranker.category(
+            normalize_value(category), n, category_rows=rows, filler=self.facet_index.top_rows(rows, n)
+        )
+
+    def similar_product_rows(self, product_id, n=10):
+        """Catalog rows of content-similar products from the precomputed top-K neighbor table."""
+        if product_id not in self.indices:
+            return np.empty(0, dtype=np.int64)
+
+        idx = self.indices[product_id]
+        neighbors = self.neighbor_ids[idx, :n]
+        return neighbors[neighbors >= 0]
+
+    def similar_products(self, product_id, n=10):
+        """Return content-similar products from the precomputed top-K neighbor table."""
+        return self._records(self.similar_product_rows(product_id, n))
+
+    def also_bought_rows(self, product_id, n=10):
+        """
+        "Customers also bought": catalog rows of products most co-interacted with
+        `product_id` (item-item CF), topped up with content-similar products.
+        """
+        rows = np.empty(0, dtype=np.int64)
+        if self.item_cf is not None:
+            rows_map = self.item_cf_rows
+            cols, _ = self.item_cf.similar(product_id, n)
+            rows = rows_map[cols[cols < len(rows_map)]]
+            rows = rows[rows >= 0]
+        if len(rows) < n:
+            filler = self.similar_product_rows(product_id, n)
+            rows = np.concatenate([rows, filler[~np.isin(filler, rows)]])[:n]
+        return rows
+
+    def hybrid_rows_for_user(self, user_id, n=10):
+        """
+        Catalog rows blending CF and content: candidates are the CF top n * HYBRID_CANDIDATES
+        plus the products closest to the user's profile (one scoring pass, or an ANN probe);
+        each is scored with user_profiles.blend. Unknown users get cold-start rows.
+        """
+        uidx = self.cf_model.user_to_idx.get(user_id)
+        profile = self.user_profiles.vector(user_id)
+        if uidx is None or profile is None:
+            return self.recommend_rows_for_user(user_id, n)
+
+        rows_map = self.cf_rows
+        seen, _ = self._user_history(user_id)
+        n_cand = n * HYBRID_CANDIDATES
+        cols, cf_scores = self.cf_model.recommend([uidx], n_cand, CF_NEIGHBORS, exclude=rows_map < 0)
+        cols, cf_scores = cols[0], cf_scores[0]
+        cf_cand, cf_scores = rows_map[cols[cols >= 0]], cf_scores[cols >= 0]
+
+        content_cand, _ = self._semantic_top(profile, n_cand + len(seen))
+        content_cand = content_cand[~np.isin(content_cand, seen)]
+
+        cand = np.union1d(cf_cand, content_cand)
+        if cand.size == 0:
+            return self._cold_start_rows(n, user_id)
+        similarity = vector_search.score_rows(profile, self.semantic_matrix, cand) * self.semantic_scale
+        similarity[similarity <= self.semantic_min_score] = 0
+        blended = blend(cand, similarity, cf_cand, cf_scores)
+        best = vector_search.top_k(blended, n)
+        return cand[best]
+
+    def search_by_vector(self, query: str, n: int = 5):
+        """Search products by semantic similarity using TF-IDF vectors."""
+        # Transform query to vector
+        query_vec = self.encode_query(query)
+
+        # Score against all products and keep the top N with non-zero similarity
+        top_indices, _ = self._semantic_top(query_vec, n)
+
+        return self._records(top_indices)
+
+    def search_product_rows(
+        self,
+        query: str,
+        n: int = 5,
+        min_price: float = None,
+        max_price: float = None,
+        category: str = None,
+        brand: str = None,
+        sort: str = None,
+    ):
+        """
+        Catalog rows for a title/keyword + vector semantic search, with structured filtering.
+        """
+        # Candidate rows from the facet indexes (None = whole catalog, no copy)
+        rows = self.facet_index.filter(
+            min_price=min_price,
+            max_price=max_price,
+            category=category,
+            brand=brand,
+        )
+
+        # If no query provided, return top N filtered results in a precomputed order (rating/discount/price)
+        if not query:
+            return self.facet_index.top_rows(rows, n, sort=sort)
+
+        if rows is not None and len(rows) == 0:
+            return rows
+
+        # If query provided, filter first then search within filtered rows
+        # 1. Clean query of common filler words that LLMs might pass if they don't strip them well
+        clean_query = query.lower()
+        for skip in ["they must be of ", "must be of ", "find me ", "show me "]:
+            if clean_query.startswith(skip):
+                clean_query = clean_query[len(skip):]
+
+        # 2. Keyword (BM25) + vector (semantic) scores for the filtered rows, blended in one pass
+        # (empty when nothing relevant is within the filtered set)
+        final_indices, _ = self._hybrid_top(clean_query, n, rows=rows)
+        return final_indices
+
+    def search_product(
+        self,
+        query: str,
+        n: int = 5,
+        min_price: float = None,
+        max_price: float = None,
+        category: str = None,
+        brand: str = None,
+        sort: str = None,
+    ):
+        """
+        Search products by title/keyword + vector semantic search, with structured filtering.
+        """
+        return self._records(self.search_product_rows(
+            query,
+            n,
+            min_price=min_price,
+            max_price=max_price,
+            category=category,
+            brand=brand,
+            sort=sort,
+        ))
 
-user_to_idx = {u: i for i, u in enumerate(user_ids)}
-product_to_idx = {p: i for i, p in enumerate(product_ids)}
 
 # ======================
-# COLLABORATIVE FILTERING (User-based KNN)
+# ACTIVE SNAPSHOT + HOT RELOAD
 # ======================
+# Serializes event application with snapshot swaps (re-entrant: reload syncs under it)
+_events_lock = threading.RLock()
+_reload_lock = threading.Lock()
+reload_status = {"reloading": False, "last_error": None, "last_reload": None}
+
+_current = Snapshot(MODEL_DIR, DATA_DIR)
+
+# Catch up on events logged since the models were trained
+replayed = _current.sync_events()
+if replayed:
+    print(f"Applied {replayed} logged events since the last CF training.")
+
+
+def current():
+    """The snapshot to serve from; take it once per request and use it throughout."""
+    return _current
+
+
+def reload_needed(snapshot=None):
+    """True when a newer model version was published or the catalog changed on disk."""
+    snapshot = snapshot or _current
+    return (
+        model_store.current_version(MODEL_DIR) != snapshot.version
+        or catalog_stamp(DATA_DIR) != snapshot.catalog_stamp
+    )
+
+
+def reload(force=False):
+    """
+    Build a snapshot from the active model version and catalog, then swap it in.
+    Requests already running finish on the old one. Returns the new snapshot, or
+    None when nothing changed or another reload is in progress. The old snapshot
+    stays in use if loading fails.
+    """
+    global _current
+    if not _reload_lock.acquire(blocking=False):
+        return None
+    try:
+        if not force and not reload_needed():
+            return None
+        reload_status["reloading"] = True
+        t = time.perf_counter()
+        snapshot = Snapshot(MODEL_DIR, DATA_DIR)
+        snapshot.tfidf  # unpickle the vectorizer before the swap rather than on its first request
+        warm_cache(snapshot)
+        with _events_lock:
+            # Events recorded while it was loading went to the old snapshot
+            snapshot.sync_events()
+            _current = snapshot
+        reload_status.update(last_error=None, last_reload=time.time())
+        print(f"🔄 Model version {snapshot.version or 'unversioned'} live after {time.perf_counter() - t:.1f}s")
+        return snapshot
+    except Exception as e:
+        reload_status["last_error"] = str(e)
+        raise
+    finally:
+        reload_status["reloading"] = False
+        _reload_lock.release()
+
+
+def _try_reload(force=False):
+    try:
+        reload(force)
+    except Exception as e:
+        print(f"Warning: reload failed ({e}). Still serving model version {_current.version or 'unversioned'}.")
+
+
+def reload_in_background(force=False):
+    """Start reload() on a background thread; False if one is already running."""
+    if _reload_lock.locked():
+        return False
+    threading.Thread(target=_try_reload, args=(force,), name="model-reload", daemon=True).start()
+    return True
+
+
+_watcher = None
+
+
+def watch(interval=MODEL_WATCH_INTERVAL):
+    """Poll for new model versions / catalog changes every `interval` seconds and reload."""
+    global _watcher
+    if interval <= 0 or _watcher is not None:
+        return _watcher
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            _try_reload()
+
+    _watcher = threading.Thread(target=loop, name="model-watch", daemon=True)
+    _watcher.start()
+    return _watcher
+
+
+def warm_cache(snapshot=None, n=CACHE_WARM_QUERIES):
+    """Replay the `n` most frequent logged searches into a snapshot's response cache."""
+    snapshot = snapshot or _current
+    queries = query_log.top(n)
+    t = time.perf_counter()
+    for params in queries:
+        try:
+            snapshot.search_json(**params)
+        except (TypeError, ValueError):
+            continue  # records from an older parameter set
+    if queries:
+        print(f"🔥 Warmed the response cache with {len(queries)} queries in {time.perf_counter() - t:.2f}s")
+    return len(queries)
+
+
+def cache_stats():
+    """Hit rate, size and hit/miss latency of the current snapshot's caches."""
+    return {
+        "version": _current.version,
+        "responses": _current.response_cache.stats(),
+        "query_vectors": _current.query_vectors.stats(),
+    }
+
+
+def status():
+    """Version info for the snapshot being served."""
+    manifest = _current.manifest or {}
+    return {
+        "version": _current.version,
+        "built_at": manifest.get("created_at"),
+        "catalog_fingerprint": _current.catalog_fingerprint,
+        "startup_mode": STARTUP_MODE,
+        "loaded_at": _current.loaded_at,
+        "load_timings": _current.timings,
+        "reload_pending": reload_needed(),
+        **reload_status,
+    }
+
+
+def record_events(events):
+    """Append events (dicts: user_id, product_id, event_type[, ts]) to the log and apply them."""
+    append_events(EVENT_LOG_PATH, events)
+    return _current.sync_events()
+
+
+# Module-level serving API for scripts; each call uses the snapshot live at that moment
+def sync_events():
+    return _current.sync_events()
+
+
+def recommend_rows_for_users(user_ids, n=10):
+    return _current.recommend_rows_for_users(user_ids, n)
+
+
+def recommend_rows_for_user(user_id, n=10):
+    return _current.recommend_rows_for_user(user_id, n)
+
+
 def recommend_for_user(user_id, n=10):
-    """Return item recommendations using user-user cosine similarity."""
-    if user_id not in user_to_idx:
-        # cold start fallback = random products
-        return products_df.sample(n).to_dict(orient='records')
+    return _current.recommend_for_user(user_id, n)
 
-    uidx = user_to_idx[user_id]
 
-    # similarity scores for target user
-    sim_scores = user_sim[uidx]
+def encode_query(text):
+    return _current.encode_query(text)
 
-    # get top 5 similar users (skip self at index 0)
-    nearest_users = np.argsort(-sim_scores)[1:6]
 
-    # weighted sum of neighbor interactions
-    scores = np.zeros(len(product_ids))
-    for neigh in nearest_users:
-        scores += matrix.iloc[neigh].values * sim_scores[neigh]
+def payload_json(rows):
+    return _current.payload_json(rows)
 
-    # remove items user has already interacted with
-    user_row = matrix.iloc[uidx].values
-    scores = scores * (user_row == 0)
 
-    top_idx = np.argsort(-scores)[:n]
-    pids = [product_ids[i] for i in top_idx]
+def trending_rows(n=10):
+    return _current.trending_rows(n)
 
-    recommendations = products_df[products_df["product_id"].isin(pids)]
-    return (
-    recommendations.fillna("").replace({np.nan: None}).to_dict(orient="records")
-   )
 
+def popular_rows(n=10, category=None):
+    return _current.popular_rows(n, category)
 
-# ======================
-# CONTENT BASED (TF-IDF)
-# ======================
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
-
-# Build product text - ensure no NaNs
-products_df["text"] = (
-    products_df["title"].fillna("") + " " +
-    products_df["description"].fillna("") + " " +
-    products_df["category_id"].astype(str)
-)
 
-# Load pre-trained models if available (Preferred)
-try:
-    tfidf = pickle.load(open(os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl"), "rb"))
-    tfidf_matrix = pickle.load(open(os.path.join(MODEL_DIR, "tfidf_matrix.pkl"), "rb"))
-    # Also load similarity matrix if we want user-item similarity to use it? 
-    # But search_product uses linear_kernel on fly or pre-computed.
-    # The original variable `cosine_sim` was computed: `cosine_sim = linear_kernel(tfidf_matrix, tfidf_matrix)`
-    # This is O(N^2) memory. For 130 products it's instant. For 10k it crashes.
-    # Let's re-compute cosine_sim for small N, or load it.
-    cosine_sim = linear_kernel(tfidf_matrix, tfidf_matrix)
-
-except Exception as e:
-    print(f"Warning: Could not load trained models ({e}). Retraining on startup...")
-    # Fallback to training
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    tfidf = TfidfVectorizer(stop_words="english")
-    # Ensure text column is perfect string
-    products_df["text"] = products_df["text"].fillna("").astype(str)
-    tfidf_matrix = tfidf.fit_transform(products_df["text"])
-    cosine_sim = linear_kernel(tfidf_matrix, tfidf_matrix)
-
-indices = pd.Series(products_df.index, index=products_df["product_id"])
+def similar_product_rows(product_id, n=10):
+    return _current.similar_product_rows(product_id, n)
+
 
 def similar_products(product_id, n=10):
-    """Return content-similar products using TF-IDF cosine similarity."""
-    if product_id not in indices:
-        return []
+    return _current.similar_products(product_id, n)
 
-    idx = indices[product_id]
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:n+1]
-    prod_idxs = [i for i, _ in sim_scores]
 
-    return (
-    products_df.iloc[prod_idxs]
-    .fillna("")
-    .replace({np.nan: None})
-    .to_dict(orient="records")
-   )
+def also_bought_rows(product_id, n=10):
+    return _current.also_bought_rows(product_id, n)
+
 
+def hybrid_rows_for_user(user_id, n=10):
+    return _current.hybrid_rows_for_user(user_id, n)
 
 
 def search_by_vector(query: str, n: int = 5):
-    """Search products by semantic similarity using TF-IDF vectors."""
-    # Transform query to vector
-    query_vec = tfidf.transform([query])
-    
-    # Calculate cosine similarity between query and all products
-    # query_vec is (1, n_features), tfidf_matrix is (n_products, n_features)
-    # linear_kernel result is (1, n_products)
-    sim_scores = linear_kernel(query_vec, tfidf_matrix).flatten()
-    
-    # Get top N indices
-    top_indices = sim_scores.argsort()[::-1][:n]
-    
-    # Filter out zero similarity (irrelevant)
-    top_indices = [i for i in top_indices if sim_scores[i] > 0]
-    
-    if not top_indices:
-        return []
+    return _current.search_by_vector(query, n)
 
-    return (
-        products_df.iloc[top_indices]
-        .fillna("")
-        .replace({np.nan: None})
-        .to_dict(orient="records")
-    )
 
-def search_product(
-    query: str,
-    n: int = 5,
-    min_price: float = None,
-    max_price: float = None,
-    category: str = None,
-    brand: str = None,
-):
-    """
-    Search products by title/keyword + vector semantic search, with structured filtering.
-    """
-    # Start with all products
-    df = products_df.copy()
-
-    # Apply Filters
-    if min_price is not None:
-        df = df[df["price"] >= min_price]
-    if max_price is not None:
-        df = df[df["price"] <= max_price]
-    
-    if category:
-        # Case insensitive partial match on category_name or sub_category_name
-        # Fallback to category_id if name columns are missing
-        cat_cols = [c for c in ["category_name", "sub_category_name", "category_id"] if c in df.columns]
-        if cat_cols:
-            cat_mask = False
-            for col in cat_cols:
-                cat_mask = cat_mask | df[col].astype(str).str.contains(category, case=False, na=False)
-            df = df[cat_mask]
-        else:
-            # If no category columns, search in title as a backup
-            df = df[df["title"].str.contains(category, case=False, na=False)]
-    
-    if brand:
-        # Case insensitive partial match on seller_name or title
-        # Safely handle 'model' only if it exists in the dataframe
-        brand_mask = (
-            df["seller_name"].astype(str).str.contains(brand, case=False, na=False) |
-            df["title"].str.contains(brand, case=False, na=False)
-        )
-        if "model" in df.columns:
-            brand_mask = brand_mask | df["model"].astype(str).str.contains(brand, case=False, na=False)
-            
-        df = df[brand_mask]
-
-    # If no query provided, just return top N filtered results by some metric (e.g. rating or price)
-    if not query:
-        return (
-            df.head(n)
-            .fillna("")
-            .replace({np.nan: None})
-            .to_dict(orient="records")
-        )
+def search_product_rows(query: str, n: int = 5, **filters):
+    return _current.search_product_rows(query, n, **filters)
 
-    # If query provided, filter first then search within filtered dataset
-    # 1. Keyword search on filtered df
-    # Clean query of common filler words that LLMs might pass if they don't strip them well
-    clean_query = query.lower()
-    for skip in ["they must be of ", "must be of ", "find me ", "show me "]:
-        if clean_query.startswith(skip):
-            clean_query = clean_query[len(skip):]
-    
-    mask = df["title"].str.contains(clean_query, case=False, na=False) | \
-           df["description"].str.contains(clean_query, case=False, na=False)
-    keyword_results = df[mask]
-    
-    if not keyword_results.empty:
-         # If plenty of exact matches, return them
-        if len(keyword_results) >= n:
-            return (
-                keyword_results.head(n)
-                .fillna("")
-                .replace({np.nan: None})
-                .to_dict(orient="records")
-            )
-        # Else, we might want to combine keyword results with vector results
-        # To do vector search on subset, we need to subset the vector matrix which is tricky since indices change.
-        # Simple approach: Return keyword results. 
-        return (
-            keyword_results.head(n)
-            .fillna("")
-            .replace({np.nan: None})
-            .to_dict(orient="records")
-        )
-    
-    # 2. Vector search (Semantic)
-    # Since vector search index `tfidf_matrix` corresponds to original `products_df` indices,
-    # we can run vector search on full dataset, get indices, and INTERSECT with filtered `df` indices.
-    
-    query_vec = tfidf.transform([clean_query])
-    sim_scores = linear_kernel(query_vec, tfidf_matrix).flatten()
-    top_indices_all = sim_scores.argsort()[::-1] # Get all sorted indices
-    
-    # Filter to keep only those in our filtered dataframe `df`
-    valid_indices = set(df.index)
-    
-    final_indices = []
-    count = 0
-    for idx in top_indices_all:
-        if idx in valid_indices and sim_scores[idx] > 0:
-            final_indices.append(idx)
-            count += 1
-            if count >= n:
-                break
-    
-    # If vector search also returned nothing but we have a query, 
-    # then we couldn't find anything relevant within the filtered set.
-    if not final_indices and query:
-        return []
 
-    return (
-        products_df.loc[final_indices]
-        .fillna("")
-        .replace({np.nan: None})
-        .to_dict(orient="records")
-    )
+def search_product(query: str, n: int = 5, **filters):
+    return _current.search_product(query, n, **filters)
 
 
+def __getattr__(name):
+    # Loaded state (products_df, cf_model, tfidf, ...) reads through to the current snapshot
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return getattr(_current, name)
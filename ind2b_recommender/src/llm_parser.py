@@ -1,15 +1,22 @@
 
+import asyncio
 import os
 import json
-from litellm import completion
 from dotenv import load_dotenv
 
+from src.parse_cache import ParseCache, prompt_version
+
 # Setup paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY") 
 ERROR_LOG_PATH = os.path.join(BASE_DIR, "parser_error.log")
+LLM_MODEL = "groq/llama-3.1-8b-instant"  # Updated from decommissioned llama3-8b-8192
+HISTORY_TURNS = 4  # history turns sent to the model (and part of the cache key)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "8"))  # seconds per parse before falling back
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))  # upstream calls in flight (async path)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, "data", "llm_parse_cache.sqlite"))
 
 SYSTEM_PROMPT = """
 You are an expert agentic AI shopping assistant for 'ind2b'. 
@@ -45,66 +52,133 @@ User: "bosch drill" -> {search_term: "drill", brand: "Bosch"}
 User: "under 500 rupee" -> {search_term: "drill", brand: "Bosch", max_price: 500}
 """
 
+# Successful parses, keyed on query + recent history + prompt/model version
+parse_cache = ParseCache(LLM_CACHE_PATH, prompt_version(SYSTEM_PROMPT, LLM_MODEL))
+
+def _messages(query, recent):
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages.extend(recent)
+    messages.append({"role": "user", "content": f"{query}\n\nReturn the result as a raw JSON object."})
+    return messages
+
+_litellm = None
+
+def load_litellm():
+    """The litellm module, imported once. It takes seconds, so the API calls this from a startup thread."""
+    global _litellm
+    if _litellm is None:
+        import litellm
+        _litellm = litellm
+    return _litellm
+
+def _parsed(query, response):
+    content = response.choices[0].message.content
+    data = json.loads(content.strip())
+    
+    # Ensure fallback for missing keys
+    defaults = {
+        "intent": "search",
+        "search_term": query,
+        "min_price": None,
+        "max_price": None,
+        "brand": None,
+        "category": None,
+        "conversational_response": f"Searching for {query}..."
+    }
+    for k, v in defaults.items():
+        if k not in data:
+            data[k] = v
+    return data
+
+def _error_fallback(query, e):
+    try:
+        with open(ERROR_LOG_PATH, "a") as f:
+            f.write(f"LLM Error: {str(e) or type(e).__name__}\n")
+    except:
+        pass
+    print(f"LLM Parsing Error: {str(e) or type(e).__name__}")
+    return {
+        "intent": "search",
+        "search_term": query,
+        "conversational_response": f"I'm looking into '{query}' for you..."
+    }
+
+def _lookup(query, history):
+    """(immediate result or None, cache key, history turns to send)"""
+    if not GROQ_API_KEY:
+        print("ERROR: GROQ_API_KEY is not set!")
+        return {"intent": "search", "search_term": query, "conversational_response": "Searching..."}, None, None
+    if not query:
+        return {"intent": "ask_clarification", "conversational_response": "How can I help you today?"}, None, None
+
+    # history is expected to be list of {"role": "user"|"assistant", "content": "..."}
+    # Limit history to last 4 turns for tokens/context
+    recent = history[-HISTORY_TURNS:] if history else []
+    cache_key = parse_cache.key(query, recent)
+    return parse_cache.get(cache_key), cache_key, recent
+
 def parse_query_with_llm(query: str, history=None):
     """
     Uses Groq via LiteLLM to parse query with conversation history.
+    Repeats of a query with the same recent history are answered from parse_cache.
     """
-    if not GROQ_API_KEY:
-        print("ERROR: GROQ_API_KEY is not set!")
-        return {"intent": "search", "search_term": query, "conversational_response": "Searching..."}
-
     try:
-        if not query:
-            return {"intent": "ask_clarification", "conversational_response": "How can I help you today?"}
-
-        # Construct messages
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-        
-        if history:
-            # history is expected to be list of {"role": "user"|"assistant", "content": "..."}
-            # Limit history to last 4 turns for tokens/context
-            messages.extend(history[-4:])
-            
-        messages.append({"role": "user", "content": f"{query}\n\nReturn the result as a raw JSON object."})
-
-        response = completion(
-            model="groq/llama-3.1-8b-instant", # Updated from decommissioned llama3-8b-8192
-            messages=messages,
+        result, cache_key, recent = _lookup(query, history)
+        if result is not None:
+            return result
+
+        response = load_litellm().completion(
+            model=LLM_MODEL,
+            messages=_messages(query, recent),
             api_key=GROQ_API_KEY,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            timeout=LLM_TIMEOUT,
         )
-        
-        content = response.choices[0].message.content
-        data = json.loads(content.strip())
-        
-        # Ensure fallback for missing keys
-        defaults = {
-            "intent": "search",
-            "search_term": query,
-            "min_price": None,
-            "max_price": None,
-            "brand": None,
-            "category": None,
-            "conversational_response": f"Searching for {query}..."
-        }
-        for k, v in defaults.items():
-            if k not in data:
-                data[k] = v
-                
+        data = _parsed(query, response)
+        # Only real model output is cached; the fallbacks never are
+        parse_cache.put(cache_key, data)
+        return data
+
+    except Exception as e:
+        return _error_fallback(query, e)
+
+_llm_slots = None
+
+async def aparse_query_with_llm(query: str, history=None):
+    """
+    Non-blocking parse_query_with_llm for async handlers: litellm's acompletion,
+    at most LLM_MAX_CONCURRENCY upstream calls in flight per process, and
+    LLM_TIMEOUT seconds per call including the wait for a slot. The SQLite
+    cache and the litellm import run in worker threads, off the event loop.
+    """
+    global _llm_slots
+    try:
+        result, cache_key, recent = await asyncio.to_thread(_lookup, query, history)
+        if result is not None:
+            return result
+
+        litellm = _litellm or await asyncio.to_thread(load_litellm)
+
+        if _llm_slots is None:
+            _llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+        async def call():
+            async with _llm_slots:
+                return await litellm.acompletion(
+                    model=LLM_MODEL,
+                    messages=_messages(query, recent),
+                    api_key=GROQ_API_KEY,
+                    response_format={"type": "json_object"},
+                    timeout=LLM_TIMEOUT,
+                )
+
+        response = await asyncio.wait_for(call(), LLM_TIMEOUT)
+        data = _parsed(query, response)
+        await asyncio.to_thread(parse_cache.put, cache_key, data)
         return data
 
     except Exception as e:
-        try:
-            with open(ERROR_LOG_PATH, "a") as f:
-                f.write(f"LLM Error: {str(e)}\n")
-        except:
-            pass
-        print(f"LLM Parsing Error: {e}")
-        return {
-            "intent": "search",
-            "search_term": query,
-            "conversational_response": f"I'm looking into '{query}' for you..."
-        }
+        return await asyncio.to_thread(_error_fallback, query, e)
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,138 @@
+"""
+Versioned model artifacts.
+
+Training scripts write into a staging copy of the active version and publish it
+as a new immutable directory; the API only ever loads complete versions:
+  models/versions/<version>/            artifact files + manifest.json
+  models/versions/<version>/manifest.json
+                                        version, build time, catalog fingerprint,
+                                        size + sha256 per file
+  models/CURRENT                        name of the active version (swapped atomically)
+
+A models/ directory without CURRENT (artifacts written by older scripts) is
+served as-is, so existing deployments keep working until the next training run.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+VERSIONS_DIRNAME = "versions"
+CURRENT_FILE = "CURRENT"
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "3"))  # published versions kept on disk
+# Artifacts no longer read by the API; never carried into a new version
+OBSOLETE_FILES = {"content_similarity.pkl"}
+
+
+def _sha256(path, block_bytes=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_bytes), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _artifact_files(version_dir):
+    return sorted(
+        name for name in os.listdir(version_dir)
+        if name != MANIFEST and os.path.isfile(os.path.join(version_dir, name))
+    )
+
+
+def current_version(model_dir):
+    """Name of the active version, or None for an unversioned models/ directory."""
+    path = os.path.join(model_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+def active_dir(model_dir):
+    """Directory holding the artifacts to serve (the active version, or model_dir itself)."""
+    version = current_version(model_dir)
+    return model_dir if version is None else os.path.join(model_dir, VERSIONS_DIRNAME, version)
+
+
+def read_manifest(version_dir):
+    path = os.path.join(version_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def verify(version_dir):
+    """Check every file listed in the manifest; raises ValueError on a missing or changed file."""
+    manifest = read_manifest(version_dir)
+    if manifest is None:
+        return None
+    for name, meta in manifest["files"].items():
+        path = os.path.join(version_dir, name)
+        if not os.path.exists(path):
+            raise ValueError(f"Model version {manifest['version']} is missing {name}")
+        if os.path.getsize(path) != meta["size"] or _sha256(path) != meta["sha256"]:
+            raise ValueError(f"Model version {manifest['version']} has a corrupt {name}")
+    return manifest
+
+
+def stage(model_dir):
+    """
+    New staging directory seeded with a copy of the active artifacts, so scripts
+    that update only some of them (build_als, compaction) start from the rest.
+    """
+    versions_dir = os.path.join(model_dir, VERSIONS_DIRNAME)
+    os.makedirs(versions_dir, exist_ok=True)
+    staging_dir = os.path.join(versions_dir, f".staging-{os.getpid()}-{time.time_ns()}")
+    os.makedirs(staging_dir)
+    source = active_dir(model_dir)
+    for name in _artifact_files(source) if os.path.isdir(source) else []:
+        if name != CURRENT_FILE and name not in OBSOLETE_FILES:
+            # Copies, not links: savers rewrite files in place
+            shutil.copy2(os.path.join(source, name), os.path.join(staging_dir, name))
+    return staging_dir
+
+
+def discard(staging_dir):
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def publish(model_dir, staging_dir, catalog_fingerprint=None):
+    """Write the manifest, move the staging directory into place and point CURRENT at it."""
+    version = time.strftime("%Y%m%d-%H%M%S", time.gmtime()) + f"-{os.getpid()}"
+    files = {
+        name: {"size": os.path.getsize(os.path.join(staging_dir, name)), "sha256": _sha256(os.path.join(staging_dir, name))}
+        for name in _artifact_files(staging_dir)
+    }
+    with open(os.path.join(staging_dir, MANIFEST), "w") as f:
+        json.dump({
+            "version": version,
+            "created_at": time.time(),
+            "previous": current_version(model_dir),
+            "catalog_fingerprint": catalog_fingerprint,
+            "files": files,
+        }, f, indent=2)
+
+    version_dir = os.path.join(model_dir, VERSIONS_DIRNAME, version)
+    os.replace(staging_dir, version_dir)
+    tmp_path = os.path.join(model_dir, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(model_dir, CURRENT_FILE))
+    prune(model_dir)
+    return version
+
+
+def prune(model_dir, keep=KEEP_VERSIONS):
+    """Delete all but the newest `keep` published versions (never the active one)."""
+    versions_dir = os.path.join(model_dir, VERSIONS_DIRNAME)
+    active = current_version(model_dir)
+    published = sorted(n for n in os.listdir(versions_dir) if not n.startswith("."))
+    for name in published[:-keep] if keep > 0 else []:
+        if name != active:
+            # Processes still serving it keep their mmaps; everything else a
+            # Snapshot needs is read into memory while it loads
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
@@ -0,0 +1,138 @@
+"""
+Two-tier cache for LLM query parses (src/llm_parser.py).
+
+Key: normalized query + sha256 of the canonical JSON of the history turns sent
+to the model + the prompt version (a hash of the system prompt and model name,
+so editing either starts a fresh keyspace). Values are the parsed JSON objects.
+  memory   LRU over encoded results (response_cache.LRUCache), per process
+  disk     SQLite table shared by workers and surviving restarts
+Both tiers expire entries after LLM_CACHE_TTL seconds. Expired SQLite rows are
+deleted when a lookup finds one, when the database is opened and every
+LLM_CACHE_PURGE_EVERY stores. Only successful parses are stored; callers never
+put fallbacks in.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.response_cache import LRUCache, normalize_query
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 86400)))  # seconds; 0 = no expiry
+LLM_CACHE_MEMORY_BYTES = int(os.getenv("LLM_CACHE_MEMORY_MB", "4")) * 1024 * 1024
+LLM_CACHE_PURGE_EVERY = int(os.getenv("LLM_CACHE_PURGE_EVERY", "1000"))  # stores between expired-row sweeps
+
+
+def prompt_version(*parts):
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def history_hash(history):
+    """Order-preserving, formatting-insensitive hash of the history turns."""
+    turns = [
+        {"role": str(turn.get("role", "")), "content": " ".join(str(turn.get("content", "")).split())}
+        for turn in history or []
+        if isinstance(turn, dict)
+    ]
+    canonical = json.dumps(turns, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, path, version, ttl=LLM_CACHE_TTL, memory_bytes=LLM_CACHE_MEMORY_BYTES,
+                 purge_every=LLM_CACHE_PURGE_EVERY):
+        self.path = path
+        self.version = version
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self.memory = LRUCache(memory_bytes, ttl=ttl)
+        self.lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.misses = self.stores = self.purged = 0
+        self._db = None
+
+    def _conn(self):
+        # Opened on first use, so importing the parser never touches the disk.
+        # Called with self.lock held.
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS parses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db = db
+            self._delete_expired()
+        return self._db
+
+    def _delete_expired(self):
+        # Called with self.lock held
+        if self.ttl:
+            self.purged += self._db.execute(
+                "DELETE FROM parses WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+
+    def key(self, query, history=None):
+        return f"{self.version}:{history_hash(history)}:{normalize_query(query)}"
+
+    def get(self, key):
+        """Cached parse (a fresh dict) or None."""
+        encoded = self.memory.get(key)
+        if encoded is not None:
+            self.memory_hits += 1
+            return json.loads(encoded)
+        try:
+            with self.lock:
+                db = self._conn()
+                row = db.execute("SELECT value, created_at FROM parses WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.ttl and time.time() - row[1] > self.ttl:
+                    db.execute("DELETE FROM parses WHERE key = ?", (key,))
+                    self.purged += 1
+                    row = None
+        except sqlite3.Error as e:
+            print(f"Warning: LLM parse cache read failed ({e})")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self.memory.put(key, row[0])
+        return json.loads(row[0])
+
+    def put(self, key, parsed):
+        encoded = json.dumps(parsed, ensure_ascii=False, separators=(",", ":"))
+        self.memory.put(key, encoded)
+        self.stores += 1
+        try:
+            with self.lock:
+                self._conn().execute(
+                    "INSERT OR REPLACE INTO parses (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, encoded, time.time()),
+                )
+                if self.purge_every and self.stores % self.purge_every == 0:
+                    self._delete_expired()
+        except sqlite3.Error as e:
+            print(f"Warning: LLM parse cache write failed ({e})")
+
+    def purge_expired(self):
+        """Delete expired rows from the disk tier; returns how many."""
+        with self.lock:
+            self._conn()
+            before = self.purged
+            self._delete_expired()
+            return self.purged - before
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "prompt_version": self.version,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "purged": self.purged,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.nbytes,
+        }
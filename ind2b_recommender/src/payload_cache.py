@@ -0,0 +1,79 @@
+"""
+Per-product response payloads, built once per catalog load.
+
+Every endpoint used to run `.fillna("").replace({np.nan: None}).to_dict(orient="records")`
+on its result slice. Here each row's cleaned record (and its pre-encoded JSON)
+is built once and kept in a row-indexed list, so responses are a gather + join.
+Heavy fields come pre-encoded from the catalog's memory-mapped cold store and
+are spliced in per response.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# Columns only used internally (search text), never sent to clients
+INTERNAL_COLUMNS = ("text",)
+
+
+def encode(obj):
+    """JSON bytes with the same settings as FastAPI's JSONResponse."""
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+# Columns whose edits change what the models were trained on (text) or what is served (prices)
+FINGERPRINT_COLUMNS = (
+    "title", "category_id", "sub_category_id", "category_name", "sub_category_name",
+    "brand", "seller_name", "model", "price", "discount",
+)
+
+
+def catalog_fingerprint(df):
+    """
+    Identity of a catalog load: row count + hash of the product_id order and of
+    the text and price columns, so an edited title or price gives a new fingerprint.
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(df["product_id"].to_numpy()).tobytes())
+    columns = [c for c in FINGERPRINT_COLUMNS if c in df.columns]
+    if columns:
+        content = pd.util.hash_pandas_object(df[columns], index=False)
+        digest.update(",".join(columns).encode("utf-8"))
+        digest.update(np.ascontiguousarray(content.to_numpy()).tobytes())
+    return f"{len(df)}:{digest.hexdigest()[:16]}"
+
+
+class PayloadCache:
+    """
+    JSON-ready records + encoded bytes per catalog row (positional index).
+    `cold` is an optional ColdStore holding the heavy fields for the same rows.
+    """
+
+    def __init__(self, df, cold=None, fingerprint=None):
+        public = df.drop(columns=[c for c in INTERNAL_COLUMNS if c in df.columns])
+        self.records = public.fillna("").replace({np.nan: None}).to_dict(orient="records")
+        # Encoded without the closing brace so cold fragments can be appended
+        self.encoded = [encode(r)[:-1] for r in self.records]
+        self.cold = cold
+        self.fingerprint = fingerprint or catalog_fingerprint(df)
+
+    def __len__(self):
+        return len(self.records)
+
+    def records_for(self, rows):
+        """Copies (hot fields + decoded heavy fields), so callers can't mutate the cache."""
+        if self.cold is None:
+            return [dict(self.records[i]) for i in rows]
+        return [{**self.records[i], **self.cold.record(i)} for i in rows]
+
+    def _encoded_row(self, row):
+        if self.cold is not None:
+            frag = self.cold.fragment(row)
+            if frag:
+                return self.encoded[row] + b"," + frag + b"}"
+        return self.encoded[row] + b"}"
+
+    def json_for(self, rows):
+        """Encoded JSON array for the given rows."""
+        return b"[" + b",".join(self._encoded_row(i) for i in rows) + b"]"
@@ -0,0 +1,204 @@
+"""
+Popularity and trending rankings for cold-start recommendations.
+
+Layout in models/popularity.npz (written by train_model, refreshed by --compact):
+  popular_ids / popular_scores      products by total interaction weight, best first
+  trending_ids / trending_scores    products by decayed weight over the trending window, best first
+  trend_t0                          reference time of trending_scores (forward decay, see event_log)
+  category_keys / category_offsets / category_ids
+                                    popular_ids split per normalized category (CSR-style)
+
+The API maps ids to catalog rows once, so a cold-start request is an array
+slice. New events bump the per-row scores; rankings are re-sorted lazily on
+the next read (stored per-category lists only for the categories touched).
+"""
+
+import os
+import time
+
+import numpy as np
+
+from src.event_log import decayed_weights, rebase_factor
+from src.filter_index import CATEGORY_FIELDS, normalize_value
+
+POPULARITY_FILE = "popularity.npz"
+TRENDING_HALF_LIFE_DAYS = float(os.getenv("TRENDING_HALF_LIFE_DAYS", "3"))
+TRENDING_WINDOW_DAYS = float(os.getenv("TRENDING_WINDOW_DAYS", "14"))
+TRENDING_MIN_SCORE = 0.01  # compaction drops products that have decayed out of the window
+
+
+def category_keys(df):
+    """Normalized category value per row, from the first category column the catalog has."""
+    field = next((c for c in CATEGORY_FIELDS if c in df.columns), None)
+    if field is None:
+        return [""] * len(df)
+    return [normalize_value(v) for v in df[field].tolist()]
+
+
+def _ranked(ids, scores):
+    keep = np.flatnonzero(scores > 0)
+    order = keep[np.argsort(-scores[keep], kind="stable")]
+    return np.asarray(ids)[order], scores[order].astype(np.float32)
+
+
+def _dedupe(rows):
+    """Drop repeated rows, keeping the first occurrence."""
+    _, first = np.unique(rows, return_index=True)
+    return rows[np.sort(first)]
+
+
+def build_rankings(matrix, product_ids, events, products_df, now, previous=None):
+    """
+    Ranked arrays for popularity.npz.
+    matrix / product_ids: CF user x product weights (popularity = column sums).
+    events: logged events to add to trending (only those inside the window count).
+    previous: the last saved file's arrays; its trending scores are rebased to `now`
+    so compaction only needs the log tail.
+    """
+    product_ids = np.asarray(product_ids)
+    popular_ids, popular_scores = _ranked(product_ids, np.asarray(matrix.sum(axis=0)).ravel())
+
+    trend = {}
+    if previous is not None:
+        factor = rebase_factor(float(previous["trend_t0"]), now, TRENDING_HALF_LIFE_DAYS)
+        for pid, score in zip(previous["trending_ids"].tolist(), previous["trending_scores"] * factor):
+            if score >= TRENDING_MIN_SCORE:
+                trend[pid] = float(score)
+    recent = events[events["ts"] >= now - TRENDING_WINDOW_DAYS * 86400]
+    if len(recent):
+        weights = decayed_weights(recent, now, TRENDING_HALF_LIFE_DAYS)
+        for pid, w in zip(recent["product_id"].tolist(), weights.tolist()):
+            trend[pid] = trend.get(pid, 0.0) + w
+    trending_ids, trending_scores = _ranked(
+        np.array(list(trend), dtype=product_ids.dtype), np.array(list(trend.values()), dtype=np.float64)
+    )
+
+    # Per-category popular lists, keyed like the facet index
+    key_of = dict(zip(products_df["product_id"].tolist(), category_keys(products_df)))
+    keys = np.array([key_of.get(pid, "") for pid in popular_ids.tolist()], dtype=object)
+    names = sorted(k for k in set(keys.tolist()) if k)
+    groups = [popular_ids[keys == k] for k in names]
+    offsets = np.concatenate([[0], np.cumsum([len(g) for g in groups])]).astype(np.int64)
+    return {
+        "popular_ids": popular_ids,
+        "popular_scores": popular_scores,
+        "trending_ids": trending_ids,
+        "trending_scores": trending_scores,
+        "trend_t0": np.float64(now),
+        "category_keys": np.array(names, dtype=str),
+        "category_offsets": offsets,
+        "category_ids": np.concatenate(groups) if groups else popular_ids[:0],
+    }
+
+
+def save(model_dir, rankings):
+    np.savez(os.path.join(model_dir, POPULARITY_FILE), **rankings)
+
+
+def load(model_dir):
+    path = os.path.join(model_dir, POPULARITY_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as saved:
+        return {k: saved[k] for k in saved.files}
+
+
+class PopularityRanker:
+    """
+    Cold-start rankings over catalog rows: trending, popular and popular per category.
+    `fallback` is a full browse order used to top lists up when there is little data.
+    """
+
+    def __init__(self, rankings, row_of_product, row_categories, fallback):
+        n_rows = len(row_categories)
+        self.row_of_product = row_of_product
+        self.row_categories = np.asarray(row_categories, dtype=object)
+        self.fallback = np.asarray(fallback, dtype=np.int64)
+        self.popular = np.zeros(n_rows, dtype=np.float64)
+        self.trending = np.zeros(n_rows, dtype=np.float64)
+        self.trend_t0 = time.time()
+        self._lists = {}
+        self._stored_categories = {}
+
+        if rankings is not None:
+            self.trend_t0 = float(rankings["trend_t0"])
+            self._scatter(self.popular, rankings["popular_ids"], rankings["popular_scores"])
+            self._scatter(self.trending, rankings["trending_ids"], rankings["trending_scores"])
+            self._lists["popular"] = self._rows(rankings["popular_ids"])
+            self._lists["trending"] = self._rows(rankings["trending_ids"])
+            offsets = rankings["category_offsets"]
+            for i, key in enumerate(rankings["category_keys"].tolist()):
+                ids = rankings["category_ids"][offsets[i]:offsets[i + 1]]
+                self._stored_categories[key] = self._rows(ids)
+
+    def _rows(self, product_ids):
+        rows = np.array([self.row_of_product.get(pid, -1) for pid in product_ids.tolist()], dtype=np.int64)
+        return rows[rows >= 0]
+
+    def _scatter(self, target, product_ids, scores):
+        for pid, score in zip(product_ids.tolist(), scores.tolist()):
+            row = self.row_of_product.get(pid)
+            if row is not None:
+                target[row] = score
+
+    def add_events(self, product_ids, weights, ts):
+        """Bump popularity (raw weights) and trending (decayed) for newly logged events."""
+        rows = np.array([self.row_of_product.get(pid, -1) for pid in product_ids], dtype=np.int64)
+        keep = rows >= 0
+        if not keep.any():
+            return
+        rows, weights, ts = rows[keep], np.asarray(weights, dtype=np.float64)[keep], np.asarray(ts, dtype=np.float64)[keep]
+        np.add.at(self.popular, rows, weights)
+        np.add.at(self.trending, rows, weights * np.exp2((ts - self.trend_t0) / (TRENDING_HALF_LIFE_DAYS * 86400)))
+        # Re-rank lazily on the next read; stored lists of untouched categories stay valid
+        for key in set(self.row_categories[rows].tolist()):
+            self._stored_categories.pop(key, None)
+        self._lists = {}
+
+    def _ranking(self, scores, rows=None):
+        rows = np.flatnonzero(scores > 0) if rows is None else rows[scores[rows] > 0]
+        return rows[np.argsort(-scores[rows], kind="stable")]
+
+    def ranked(self, kind):
+        """Rows by 'popular' or 'trending' score, best first (rows with a score only)."""
+        if kind not in self._lists:
+            self._lists[kind] = self._ranking(self.popular if kind == "popular" else self.trending)
+        return self._lists[kind]
+
+    def top(self, kind, n):
+        """
+        First n rows of a filled ranking: 'trending' (then popular, then fallback)
+        or 'popular' (then fallback).
+        """
+        cache_key = (kind, "filled")
+        order = self._lists.get(cache_key)
+        if order is None:
+            parts = [self.ranked("trending")] if kind == "trending" else []
+            order = _dedupe(np.concatenate(parts + [self.ranked("popular"), self.fallback]))
+            self._lists[cache_key] = order
+        return order[:n]
+
+    def cold_start(self, n, exclude=None):
+        """Trending rows (then popular, then fallback), minus the rows in `exclude` (a user's history)."""
+        if exclude is None or len(exclude) == 0:
+            return self.top("trending", n)
+        rows = self.top("trending", n + len(exclude))
+        return rows[~np.isin(rows, exclude)][:n]
+
+    def category(self, key, n, category_rows=None, filler=None):
+        """
+        Popular rows within a category, topped up with `filler` (e.g. the category's
+        rows in browse order). `key` is a normalized category value; `category_rows`
+        (a facet lookup) is ranked instead when the key is not an exact catalog category.
+        """
+        cache_key = ("category", key)
+        order = self._lists.get(cache_key)
+        if order is None:
+            ranked = self._stored_categories.get(key)
+            if ranked is None:
+                rows = np.flatnonzero(self.row_categories == key) if category_rows is None else category_rows
+                ranked = self._ranking(self.popular, np.asarray(rows, dtype=np.int64))
+            parts = [ranked] if filler is None else [ranked, np.asarray(filler, dtype=np.int64)]
+            order = _dedupe(np.concatenate(parts))
+            self._lists[cache_key] = order
+        return order[:n]
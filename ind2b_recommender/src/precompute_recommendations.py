@@ -0,0 +1,64 @@
+"""
+Nightly precompute of home-page recommendations for every active buyer.
+
+Scores all users in the served CF model with the batched sparse path and
+publishes a new model version (a copy of the active one) that adds
+home_recommendations.npz (see src/home_recs.py). The API serves
+/recommend/user from it for users with no newer events.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import model_store
+from src.home_recs import HomeRecommendations, cf_sources
+from src.hybrid_recommender import CF_MODEL, CF_NEIGHBORS, MODEL_DIR, current
+
+HOME_RECS_N = int(os.getenv("HOME_RECS_N", "20"))
+BATCH_USERS = int(os.getenv("PRECOMPUTE_BATCH_USERS", "10000"))
+
+
+def precompute(snapshot, n=HOME_RECS_N, batch_users=BATCH_USERS):
+    """(user_ids, product_ids [U, n], scores [U, n]) for every user in the snapshot's CF model."""
+    cf_model, cf_rows = snapshot.cf_model, snapshot.cf_rows
+    catalog_ids = snapshot.products_df["product_id"].to_numpy()
+    ids = np.full((len(cf_model), n), -1, dtype=catalog_ids.dtype)
+    scores = np.zeros((len(cf_model), n), dtype=np.float32)
+    for start in range(0, len(cf_model), batch_users):
+        uidxs = np.arange(start, min(len(cf_model), start + batch_users))
+        cols, block_scores = cf_model.recommend(uidxs, n, CF_NEIGHBORS, exclude=cf_rows < 0)
+        found = cols >= 0
+        ids[uidxs[0]:uidxs[-1] + 1][found] = catalog_ids[cf_rows[cols[found]]]
+        scores[uidxs[0]:uidxs[-1] + 1] = block_scores
+    return np.asarray(cf_model.user_ids), ids, scores
+
+
+if __name__ == "__main__":
+    # Importing hybrid_recommender loaded the active version and replayed the event log
+    snap = current()
+    if snap.manifest is None:
+        print("❌ No published model version. Run `python src/train_model.py` first.")
+        sys.exit(1)
+    log_position = snap.event_log_position
+
+    print(f"🚀 Precomputing top-{HOME_RECS_N} recommendations for {len(snap.cf_model)} users...")
+    t = time.perf_counter()
+    user_ids, product_ids, scores = precompute(snap)
+    covered = int((product_ids[:, 0] >= 0).sum()) if len(user_ids) else 0
+    print(f"✅ {covered}/{len(user_ids)} users with CF results in {time.perf_counter() - t:.1f}s")
+
+    if model_store.current_version(MODEL_DIR) != snap.version:
+        print("❌ A new model version was published meanwhile. Nothing written; run again.")
+        sys.exit(1)
+    stage_dir = model_store.stage(MODEL_DIR)
+    HomeRecommendations(
+        user_ids, product_ids, scores, log_position, CF_MODEL, cf_sources(snap.manifest)
+    ).save(stage_dir)
+    version = model_store.publish(MODEL_DIR, stage_dir, snap.catalog_fingerprint)
+    print(f"📦 Published model version {version} with home recommendations")
@@ -0,0 +1,222 @@
+"""
+Rule-based fast path for /smart-search query parsing.
+
+Simple chatbot queries ("bosch drill under 3000", "Polygrip S709 1L") don't
+need the LLM. QueryParser is built from the catalog once per snapshot:
+  brands       leading title words that behave like brand names (a word that
+               starts at least BRAND_MIN_PRODUCTS titles, at least as often as it
+               appears inside them, is written capitalized and is not in
+               GENERIC_WORDS), plus seller_name / brand columns and BRAND_SYNONYMS
+  categories   category_name / sub_category_name values (not numeric ids)
+  vocabulary   the keyword index, to judge whether the remaining words are searchable
+and extracts price bounds from phrases like "under 5k", "below rs 3,000",
+"above 500", "between 100 and 500", "from 2k to 4k".
+
+parse() returns the same schema as llm_parser.parse_query_with_llm plus a
+`confidence` in [0, 1]. Questions, comparisons, open-ended requests, unknown
+words and history-dependent follow-ups ("only red ones", "under 500" after an
+earlier search) score low and go to the LLM.
+"""
+
+import os
+import re
+from collections import Counter
+
+from src.filter_index import BRAND_SYNONYMS, CATEGORY_SYNONYMS
+from src.text_index import tokenize
+
+FAST_PARSE_MIN_CONFIDENCE = float(os.getenv("FAST_PARSE_MIN_CONFIDENCE", "0.8"))
+BRAND_MIN_PRODUCTS = int(os.getenv("BRAND_MIN_PRODUCTS", "2"))  # titles a lead word must start to count as a brand
+BRAND_MIN_CAPITALIZED = 0.8  # share of a brand word's title occurrences written with a capital
+MAX_PHRASE_TOKENS = 4
+LONG_QUERY_TOKENS = 6  # longer remaining terms read like prose; the LLM handles those better
+
+_AMOUNT = r"(?:rs\.?|inr|₹)?\s*(\d+(?:,\d{2,3})*(?:\.\d+)?)\s*(k|thousand|lakhs?|lacs?)?(?:\s*(?:rs|rupees?|inr|/-))?(?![a-z0-9])"
+PRICE_PATTERNS = [
+    # (regex, bound each captured amount sets)
+    (re.compile(rf"\b(?:between|from)\s+{_AMOUNT}\s*(?:and|to|-)\s*{_AMOUNT}"), ("min", "max")),
+    (re.compile(rf"(?:rs\.?|inr|₹)\s*(\d+(?:,\d{{2,3}})*(?:\.\d+)?)\s*(k|thousand|lakhs?|lacs?)?\s*(?:to|-)\s*{_AMOUNT}"), ("min", "max")),
+    (re.compile(rf"(?:\b(?:under|below|less than|upto|up to|within|max(?:imum)?|not more than|budget(?: of)?)|<)\s*{_AMOUNT}"), ("max",)),
+    (re.compile(rf"(?:\b(?:above|over|more than|at least|min(?:imum)?|starting(?: from| at)?)|>)\s*{_AMOUNT}"), ("min",)),
+]
+MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5}
+
+# Words that carry no product meaning in a search request
+FILLER_WORDS = {
+    "show", "me", "find", "i", "need", "want", "looking", "look", "search", "for", "a", "an", "the",
+    "some", "any", "please", "buy", "get", "price", "priced", "rs", "inr", "rupee", "rupees", "of",
+    "in", "with", "by", "from", "brand", "products", "product", "items", "item", "give", "list",
+}
+# Questions, comparisons and open-ended requests: the LLM decides intent
+CONVERSATIONAL_RE = re.compile(
+    r"\?|\b(?:compare|comparison|vs|versus|difference|recommend|suggest|best|which|what|how|why|"
+    r"should|can you|could you|help|better|good for|hi|hello|thanks?)\b"
+)
+# Follow-ups that only make sense against the conversation so far
+FOLLOW_UP_RE = re.compile(
+    r"\b(?:it|its|them|those|these|that|this one|ones|same|cheaper|costlier|another|other|else|"
+    r"only|just|also|instead|more|less|again|too)\b"
+)
+# Marketing and descriptive words that often start titles but are not brands
+GENERIC_WORDS = {
+    "imported", "pro", "master", "sky", "muscle", "xtra", "extra", "techno", "galaxy", "ace", "new",
+    "original", "premium", "heavy", "super", "ultra", "professional", "digital", "electric", "automatic",
+    "deluxe", "mini", "max", "power", "smart", "classic", "standard", "universal", "generic", "local",
+    "branded", "indian", "best", "top", "royal", "star", "gold", "silver", "prime", "plus", "combo",
+    "set", "pack", "kit", "multi", "multipurpose", "industrial", "high", "quality", "portable",
+}
+SPEC_RE = re.compile(r"^\d+(?:\.\d+)?[a-z]*$")  # 700w, 10mm, 12v: specs, never brands
+
+
+def _phrase_map(values, synonyms=None):
+    """token tuple -> display value, for values (and synonyms of values) present in the catalog."""
+    out = {}
+    for value in values:
+        tokens = tuple(tokenize(value))
+        if tokens and not all(t.isdigit() for t in tokens):
+            out.setdefault(tokens, value)
+    for term, targets in (synonyms or {}).items():
+        for target in targets:
+            display = out.get(tuple(tokenize(target)))
+            if display is not None:
+                out.setdefault(tuple(tokenize(term)), display)
+    return out
+
+
+def _match_phrases(tokens, phrases, used):
+    """Longest-first phrase matches over unused token positions -> [display values]."""
+    found = []
+    for size in range(min(MAX_PHRASE_TOKENS, len(tokens)), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            span = range(start, start + size)
+            if any(i in used for i in span):
+                continue
+            display = phrases.get(tuple(tokens[start:start + size]))
+            if display is not None:
+                found.append(display)
+                used.update(span)
+    return found
+
+
+def _amount(number, suffix):
+    value = float(number.replace(",", ""))
+    return value * MULTIPLIERS.get(suffix or "", 1.0)
+
+
+def _format_price(value):
+    return f"₹{value:,.0f}"
+
+
+class QueryParser:
+    def __init__(self, products_df, keyword_index):
+        self.keyword_index = keyword_index
+
+        leads, inner, capitalized, casing = Counter(), Counter(), Counter(), {}
+        for title in products_df["title"].dropna().tolist():
+            words = [w.strip(",()[]") for w in str(title).split()]
+            words = [w for w in words if w]
+            if not words:
+                continue
+            lead = words[0].lower()
+            leads[lead] += 1
+            casing.setdefault(lead, Counter())[words[0]] += 1
+            inner.update(w.lower() for w in words[1:])
+            capitalized.update(w.lower() for w in words if any(c.isupper() for c in w))
+        brands = [
+            casing[w].most_common(1)[0][0] for w, count in leads.items()
+            if count >= max(BRAND_MIN_PRODUCTS, inner[w])
+            and capitalized[w] >= BRAND_MIN_CAPITALIZED * (count + inner[w])
+            and any(c.isalpha() for c in w) and not SPEC_RE.match(w)
+            and w not in GENERIC_WORDS and w not in FILLER_WORDS
+        ]
+        for col in ("brand", "seller_name"):
+            if col in products_df.columns:
+                brands.extend(str(v).strip() for v in products_df[col].dropna().unique())
+        self.brands = _phrase_map(brands, BRAND_SYNONYMS)
+
+        categories = []
+        for col in ("category_name", "sub_category_name"):
+            if col in products_df.columns:
+                categories.extend(str(v).strip() for v in products_df[col].dropna().unique())
+        self.categories = _phrase_map(categories, CATEGORY_SYNONYMS)
+
+    def _known(self, token):
+        """Whether keyword search can match the token (or its singular) anywhere in the catalog."""
+        forms = [token] + ([token[:-1]] if token.endswith("s") and len(token) > 3 else [])
+        return any(
+            self.keyword_index.expand(field, form, "prefix")
+            for field in self.keyword_index.fields
+            for form in forms
+        )
+
+    @staticmethod
+    def _prices(text):
+        """(min_price, max_price, text with the price phrases removed)"""
+        bounds = {}
+        for pattern, targets in PRICE_PATTERNS:
+            match = pattern.search(text)
+            if match is None:
+                continue
+            groups = match.groups()
+            for target, (number, suffix) in zip(targets, zip(groups[::2], groups[1::2])):
+                bounds.setdefault(target, _amount(number, suffix))
+            text = text[:match.start()] + " " + text[match.end():]
+        low, high = bounds.get("min"), bounds.get("max")
+        if low is not None and high is not None and low > high:
+            low, high = high, low
+        return low, high, text
+
+    def parse(self, query, history=None):
+        """Parsed filters in the LLM parser's schema, plus `confidence`."""
+        text = " ".join(str(query or "").lower().split())
+        result = {
+            "intent": "search",
+            "search_term": None,
+            "min_price": None,
+            "max_price": None,
+            "brand": None,
+            "category": None,
+            "conversational_response": None,
+            "confidence": 0.0,
+        }
+        if not text or CONVERSATIONAL_RE.search(text):
+            return result
+
+        min_price, max_price, rest = self._prices(text)
+        tokens = tokenize(rest)
+        used = set()
+        brands = _match_phrases(tokens, self.brands, used)
+        category_span = set(used)
+        categories = _match_phrases(tokens, self.categories, category_span)  # category words stay in the term
+        term = [t for i, t in enumerate(tokens) if i not in used and t not in FILLER_WORDS]
+        matched = {tokens[i] for i in category_span - used}
+
+        result.update(
+            search_term=" ".join(term) or None,
+            min_price=min_price,
+            max_price=max_price,
+            brand=brands[0] if brands else None,
+            category=categories[0] if categories else None,
+        )
+
+        if not (term or brands or categories):
+            return result  # nothing to search for
+        if history and (not term or FOLLOW_UP_RE.search(rest)):
+            return result  # a refinement of an earlier turn
+        if len(brands) > 1:
+            return result  # "bosch or makita": let the LLM decide
+
+        confidence = sum(t in matched or self._known(t) for t in term) / len(term) if term else 0.9
+        if len(term) > LONG_QUERY_TOKENS:
+            confidence *= 0.8
+        result["confidence"] = round(confidence, 3)
+
+        parts = [p for p in (result["brand"], result["search_term"] or result["category"]) if p]
+        if max_price is not None and min_price is not None:
+            parts.append(f"between {_format_price(min_price)} and {_format_price(max_price)}")
+        elif max_price is not None:
+            parts.append(f"under {_format_price(max_price)}")
+        elif min_price is not None:
+            parts.append(f"above {_format_price(min_price)}")
+        result["conversational_response"] = f"Looking for {' '.join(parts)}..."
+        return result
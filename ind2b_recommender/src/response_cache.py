@@ -0,0 +1,207 @@
+"""
+In-process response caches.
+
+The chatbot sends the same searches over and over ("drill", "bosch drill under
+5000"). Encoded response bodies are cached per snapshot under a normalized key
+(query text, filters, n), in an LRU bounded by total bytes, with a TTL.
+Query vectors get a cache of their own, so a new filter combination for a
+known query skips the TF-IDF transform. A reload builds a new snapshot with
+empty caches, which is what invalidates them.
+
+With CACHE_WARM_QUERIES > 0, searches are appended to a size-capped query log
+(data/query_log.jsonl, buffered) and the most frequent ones are replayed into
+a fresh snapshot before it starts serving.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+import numpy as np
+
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_MB", "64")) * 1024 * 1024
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))  # seconds; 0 = no expiry
+QUERY_VECTOR_CACHE_BYTES = int(os.getenv("QUERY_VECTOR_CACHE_MB", "16")) * 1024 * 1024
+QUERY_LOG_FILE = "query_log.jsonl"
+QUERY_LOG_TAIL_BYTES = 8 * 1024 * 1024  # warming reads only the end of the log
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_MB", "16")) * 1024 * 1024  # then rotated to .1
+QUERY_LOG_FLUSH_LINES = int(os.getenv("QUERY_LOG_FLUSH_LINES", "100"))
+CACHE_WARM_QUERIES = int(os.getenv("CACHE_WARM_QUERIES", "0"))
+LATENCY_SAMPLES = 1000  # recent lookups kept per outcome for the latency percentiles
+
+
+def normalize_query(text):
+    """Cache key text: lowercased, whitespace collapsed (search is case/space-insensitive)."""
+    return " ".join(str(text or "").lower().split())
+
+
+def normalize_filter(value):
+    """Filter values the way FacetIndex matches them."""
+    if isinstance(value, str):
+        return value.strip().lower() or None
+    return value
+
+
+def vector_nbytes(vec):
+    if hasattr(vec, "indptr"):
+        return vec.data.nbytes + vec.indices.nbytes + vec.indptr.nbytes
+    return np.asarray(vec).nbytes
+
+
+class LRUCache:
+    """
+    Thread-safe LRU keyed on hashable tuples, bounded by the summed `size` of
+    its values and optionally expiring entries `ttl` seconds after they were stored.
+    """
+
+    def __init__(self, max_bytes, ttl=0, size=len):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = size
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, nbytes, stored_at)
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = self.expired = 0
+        self._hit_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._miss_ms = deque(maxlen=LATENCY_SAMPLES)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl and time.monotonic() - entry[2] > self.ttl:
+                self._drop(key)
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        nbytes = self.size(value)
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, nbytes, time.monotonic())
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self.nbytes -= nbytes
+
+    def get_or_build(self, key, build):
+        """Cached value for `key`, or build() it and store it. Hit/miss latency is recorded."""
+        t = time.perf_counter()
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            self._hit_ms.append((time.perf_counter() - t) * 1000)
+            return value
+        value = build()
+        self.put(key, value)
+        self.misses += 1
+        self._miss_ms.append((time.perf_counter() - t) * 1000)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        out = {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+        for name, samples in (("hit", self._hit_ms), ("miss", self._miss_ms)):
+            if samples:
+                ms = np.fromiter(samples, dtype=np.float64)
+                out[f"{name}_p50_ms"] = round(float(np.percentile(ms, 50)), 3)
+                out[f"{name}_p95_ms"] = round(float(np.percentile(ms, 95)), 3)
+        return out
+
+
+class QueryLog:
+    """
+    JSON-lines log of search parameters, for cache warming. Disabled unless
+    warming is on. Appends are buffered in memory and written QUERY_LOG_FLUSH_LINES
+    at a time; past QUERY_LOG_MAX_BYTES the file is rotated to `<path>.1`.
+    """
+
+    def __init__(self, path, enabled=True, flush_lines=QUERY_LOG_FLUSH_LINES, max_bytes=QUERY_LOG_MAX_BYTES):
+        self.path = path
+        self.enabled = enabled
+        self.flush_lines = flush_lines
+        self.max_bytes = max_bytes
+        self.buffer = []
+        self.lock = threading.Lock()
+
+    def append(self, params):
+        if not self.enabled:
+            return
+        line = json.dumps(params, sort_keys=True, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) < self.flush_lines:
+                return
+            lines, self.buffer = self.buffer, []
+        self._write(lines)
+
+    def flush(self):
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+        if lines:
+            self._write(lines)
+
+    def _write(self, lines):
+        try:
+            with self.lock:
+                with open(self.path, "a") as f:
+                    f.write("".join(lines))
+                    size = f.tell()
+                if size > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+        except OSError:
+            pass  # logging must never fail a request
+
+    def top(self, n, tail_bytes=QUERY_LOG_TAIL_BYTES):
+        """The `n` most frequent parameter sets in the last `tail_bytes` of the log (and its rotated part)."""
+        if n <= 0:
+            return []
+        self.flush()
+        lines = []
+        for path in (self.path, self.path + ".1"):
+            if tail_bytes <= 0 or not os.path.exists(path):
+                continue
+            start = max(0, os.path.getsize(path) - tail_bytes)
+            with open(path, "rb") as f:
+                f.seek(start)
+                chunk = f.read().splitlines()
+            if start > 0:
+                chunk = chunk[1:]  # partial line at the cut
+            lines.extend(chunk)
+            tail_bytes -= os.path.getsize(path) - start
+        out = []
+        for line, _ in Counter(lines).most_common(n):
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                continue
+        return out
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import parse_cache
+from src.parse_cache import ParseCache
+
+
+def _rows(path):
+    with sqlite3.connect(path) as db:
+        return [key for (key,) in db.execute("SELECT key FROM parses ORDER BY key")]
+
+
+def _age(path, key, seconds):
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE parses SET created_at = created_at - ? WHERE key = ?", (seconds, key))
+
+
+def test_expired_rows_leave_the_table(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ParseCache(path, "v1", ttl=60, purge_every=0)
+    for q in ("drill", "grinder", "tape"):
+        cache.put(cache.key(q), {"search_term": q})
+    _age(path, cache.key("drill"), 120)
+    _age(path, cache.key("grinder"), 120)
+
+    # A lookup that finds an expired row deletes it (a new process: no memory tier)
+    reader = ParseCache(path, "v1", ttl=60, purge_every=0)
+    reader._conn()  # opening sweeps; start from the state before it
+    _age(path, reader.key("tape"), 120)
+    assert reader.get(reader.key("tape")) is None
+    assert reader.key("tape") not in _rows(path)
+
+
+def test_open_and_periodic_sweeps(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ParseCache(path, "v1", ttl=60, purge_every=3)
+    for q in ("drill", "grinder"):
+        cache.put(cache.key(q), {"search_term": q})
+    _age(path, cache.key("drill"), 120)
+
+    # Every purge_every-th store sweeps expired rows
+    cache.put(cache.key("tape"), {"search_term": "tape"})
+    assert _rows(path) == sorted([cache.key("grinder"), cache.key("tape")])
+
+    # Opening the database sweeps too
+    _age(path, cache.key("grinder"), 120)
+    ParseCache(path, "v1", ttl=60).purge_expired()
+    assert _rows(path) == [cache.key("tape")]
+    reopened = ParseCache(path, "v1", ttl=60)
+    _age(path, cache.key("tape"), 120)
+    reopened._conn()
+    assert _rows(path) == []
+    assert reopened.stats()["purged"] == 1
+
+
+def test_no_ttl_keeps_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "LLM_CACHE_TTL", 0)
+    path = str(tmp_path / "cache.sqlite")
+    cache = ParseCache(path, "v1", ttl=0, purge_every=1)
+    cache.put(cache.key("drill"), {"search_term": "drill"})
+    _age(path, cache.key("drill"), 10 ** 9)
+    assert cache.purge_expired() == 0
+    assert ParseCache(path, "v1", ttl=0).get(cache.key("drill")) == {"search_term": "drill"}
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.filter_index import SORT_ORDERS, FacetIndex
+
+
+def _index():
+    df = pd.DataFrame({
+        "product_id": [1, 2, 3, 4],
+        "title": ["Drill", "Grinder", "Tape", "Valve"],
+        "price": [300.0, 100.0, 400.0, 200.0],
+        "discount": [10.0, 40.0, 0.0, 20.0],
+        "stock": [5, 0, 9, 1],
+        "rating": [4.0, 4.5, 3.0, np.nan],
+    })
+    return FacetIndex(df)
+
+
+def test_known_sorts_order_rows():
+    index = _index()
+    assert index.top_rows(n=4, sort="price_asc").tolist() == [1, 3, 0, 2]
+    assert index.top_rows(n=4, sort="price_desc").tolist() == [2, 0, 3, 1]
+    assert index.top_rows(n=2, sort="discount").tolist() == [1, 3]
+    assert index.top_rows(n=4).tolist() == [1, 0, 2, 3]  # default: rating, missing last
+    assert set(SORT_ORDERS) == set(index.sort_ranks)
+
+
+def test_unknown_sort_is_rejected():
+    with pytest.raises(ValueError, match="Unknown sort 'bogus'"):
+        _index().top_rows(n=4, sort="bogus")
+    with pytest.raises(ValueError):
+        _index().top_rows(np.array([0, 2]), n=1, sort="PRICE_ASC")
+
+
+def test_api_sort_values_match_sort_orders():
+    schemas = pytest.importorskip("api.schemas")
+    assert [s.value for s in schemas.SortOrder] == list(SORT_ORDERS)
+    with pytest.raises(ValueError):
+        schemas.SortOrder("bogus")
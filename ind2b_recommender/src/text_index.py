@@ -0,0 +1,252 @@
+"""
+Inverted token index over the product catalog (title, description, model, seller)
+"""
+
+import math
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+INDEX_FIELDS = ("title", "description", "model", "seller_name")
+
+# BM25F-lite: per-field BM25 scores are summed with these weights
+BM25_FIELD_WEIGHTS = {"title": 2.0, "description": 1.0, "model": 1.5, "seller_name": 1.5}
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_DISCOUNT = 0.8  # "drill" also scores "drills"/"drilling", slightly lower
+MAX_PREFIX_EXPANSIONS = 20
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a text value."""
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def _field_text(value):
+    # NaN / None never match, same as str.contains(..., na=False)
+    if value is None or value != value:
+        return ""
+    return str(value).lower()
+
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class InvertedIndex:
+    """
+    Positional postings per field: token -> {row: [positions]}.
+    Rows are positional indices into the catalog DataFrame it was built from.
+    Raw text (needed by substring `search`) is only kept for `text_fields`.
+    """
+
+    def __init__(self, df, fields=INDEX_FIELDS, text_fields=None):
+        self.n_rows = len(df)
+        self.fields = [f for f in fields if f in df.columns]
+        text_fields = self.fields if text_fields is None else text_fields
+        self.texts = {}
+        self.postings = {}
+        self.vocab = {}
+        self.reversed_vocab = {}
+        self.trigrams = {}
+        self.doc_lengths = {}
+        self.avg_lengths = {}
+
+        for field in self.fields:
+            texts = [_field_text(v) for v in df[field].tolist()]
+            postings = {}
+            lengths = np.zeros(self.n_rows, dtype=np.float32)
+            for row, text in enumerate(texts):
+                tokens = TOKEN_RE.findall(text)
+                lengths[row] = len(tokens)
+                for pos, token in enumerate(tokens):
+                    postings.setdefault(token, {}).setdefault(row, []).append(pos)
+
+            vocab = sorted(postings)
+            trigrams = {}
+            for token in vocab:
+                for gram in _trigrams(token):
+                    trigrams.setdefault(gram, set()).add(token)
+
+            if field in text_fields:
+                self.texts[field] = texts
+            self.postings[field] = postings
+            self.vocab[field] = vocab
+            self.reversed_vocab[field] = sorted(t[::-1] for t in vocab)
+            self.trigrams[field] = trigrams
+            self.doc_lengths[field] = lengths
+            self.avg_lengths[field] = float(lengths.mean()) if self.n_rows else 0.0
+
+    # ----------------------
+    # Vocabulary expansion
+    # ----------------------
+    @staticmethod
+    def _prefix_scan(sorted_terms, prefix):
+        start = bisect_left(sorted_terms, prefix)
+        out = []
+        for term in sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+        return out
+
+    def expand(self, field, term, mode="exact"):
+        """
+        Vocabulary tokens matching `term`.
+        mode: 'exact' | 'prefix' | 'suffix' | 'infix'
+        """
+        postings = self.postings[field]
+        if mode == "exact":
+            return [term] if term in postings else []
+        if mode == "prefix":
+            return self._prefix_scan(self.vocab[field], term)
+        if mode == "suffix":
+            return [t[::-1] for t in self._prefix_scan(self.reversed_vocab[field], term[::-1])]
+
+        # infix: narrow with the vocabulary trigram index, then confirm
+        if len(term) < 3:
+            return [t for t in self.vocab[field] if term in t]
+        grams = sorted(_trigrams(term), key=lambda g: len(self.trigrams[field].get(g, ())))
+        candidates = set(self.trigrams[field].get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self.trigrams[field].get(gram, set())
+        return [t for t in candidates if term in t]
+
+    # ----------------------
+    # Phrase / substring lookup
+    # ----------------------
+    def _field_candidates(self, field, query):
+        """Rows whose token stream can contain `query` as a contiguous phrase."""
+        matches = list(TOKEN_RE.finditer(query))
+        if not matches:
+            return None  # no tokens to look up (e.g. punctuation only)
+
+        postings = self.postings[field]
+        last = len(matches) - 1
+        per_token = []
+        for i, m in enumerate(matches):
+            # Edge tokens of a substring query may be cut mid-word in the text
+            left_open = i == 0 and m.start() == 0
+            right_open = i == last and m.end() == len(query)
+            if left_open and right_open:
+                mode = "infix"
+            elif left_open:
+                mode = "suffix"
+            elif right_open:
+                mode = "prefix"
+            else:
+                mode = "exact"
+            terms = self.expand(field, m.group(), mode)
+            if not terms:
+                return set()
+            per_token.append(terms)
+
+        # Postings intersection, rarest token first
+        row_sets = []
+        for terms in per_token:
+            rows = set()
+            for t in terms:
+                rows.update(postings[t])
+            row_sets.append(rows)
+        candidates = set.intersection(*sorted(row_sets, key=len))
+
+        if len(per_token) == 1 or not candidates:
+            return candidates
+
+        # Positional phrase check: token i must sit at offset i from token 0
+        out = set()
+        for row in candidates:
+            starts = None
+            for offset, terms in enumerate(per_token):
+                positions = set()
+                for t in terms:
+                    positions.update(p - offset for p in postings[t].get(row, ()))
+                starts = positions if starts is None else starts & positions
+                if not starts:
+                    break
+            if starts:
+                out.add(row)
+        return out
+
+    def search(self, query, fields=("title", "description"), rows=None):
+        """
+        Sorted rows where any of `fields` contains `query` (case-insensitive substring).
+        Optionally restricted to the candidate `rows`. Fields built without
+        stored text are skipped.
+        """
+        query = str(query).lower()
+        allowed = None if rows is None else set(rows)
+        hits = set()
+        for field in fields:
+            if field not in self.texts:
+                continue
+            texts = self.texts[field]
+            candidates = self._field_candidates(field, query)
+            if candidates is None:
+                candidates = range(self.n_rows)
+            for row in candidates:
+                if row in hits or (allowed is not None and row not in allowed):
+                    continue
+                # Confirm on the raw text so results equal a substring scan
+                if query in texts[row]:
+                    hits.add(row)
+        return sorted(hits)
+
+    # ----------------------
+    # BM25 ranking
+    # ----------------------
+    def _term_scores(self, field, term):
+        """(rows, BM25 contribution) for one vocabulary term in one field."""
+        posting = self.postings[field][term]
+        rows = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+        tf = np.fromiter((len(p) for p in posting.values()), dtype=np.float32, count=len(posting))
+        df_t = len(posting)
+        idf = math.log(1 + (self.n_rows - df_t + 0.5) / (df_t + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[field][rows] / (self.avg_lengths[field] or 1.0))
+        return rows, idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    def bm25(self, query, fields=None, rows=None):
+        """
+        Field-weighted BM25 for `query` -> (sorted rows, scores), only rows with a hit.
+        Each query token also matches vocabulary tokens it is a prefix of.
+        Optionally restricted to the sorted candidate `rows`.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        parts_rows, parts_scores = [], []
+        for field in fields or self.fields:
+            if field not in self.postings:
+                continue
+            weight = BM25_FIELD_WEIGHTS.get(field, 1.0)
+            for token in tokens:
+                expansions = self.expand(field, token, "prefix")[:MAX_PREFIX_EXPANSIONS]
+                token_rows, token_scores = [], []
+                for term in expansions:
+                    r, sc = self._term_scores(field, term)
+                    token_rows.append(r)
+                    token_scores.append(sc if term == token else sc * PREFIX_DISCOUNT)
+                if not token_rows:
+                    continue
+                r = np.concatenate(token_rows)
+                sc = np.concatenate(token_scores)
+                # A token counts once per row: keep its best-scoring expansion
+                order = np.lexsort((-sc, r))
+                r, sc = r[order], sc[order]
+                first = np.ones(len(r), dtype=bool)
+                first[1:] = r[1:] != r[:-1]
+                parts_rows.append(r[first])
+                parts_scores.append(sc[first] * weight)
+
+        if not parts_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        all_rows = np.concatenate(parts_rows)
+        all_scores = np.concatenate(parts_scores)
+        if rows is not None:
+            keep = np.isin(all_rows, rows)
+            all_rows, all_scores = all_rows[keep], all_scores[keep]
+        hit_rows, inverse = np.unique(all_rows, return_inverse=True)
+        return hit_rows, np.bincount(inverse, weights=all_scores, minlength=len(hit_rows))
@@ -2,15 +2,57 @@
 import os
 import sys
 import pickle
+import time
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity, linear_kernel
+
+# Add project root to path so 'src' can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import embeddings, model_store, popularity
+from src.ann_index import IVFIndex, recall_report
+from src.catalog import load_catalog
+from src.als import ALSModel
+from src.content import content_text, tfidf_vectorizer
+from src.collaborative import CF_FILE, ItemKNN, UserKNN, build_user_item, load_matrix
+from src.event_log import (
+    LOG_FILE,
+    decayed_weights,
+    prune_log,
+    read_log,
+    read_state,
+    rebase_factor,
+    rotate_log,
+    state_position,
+    write_state,
+)
+from src.home_recs import HOME_RECS_FILE
+from src.payload_cache import catalog_fingerprint
+from src.vector_search import build_neighbor_table
 
 # Setup Paths
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-MODEL_DIR = os.path.join(BASE_DIR, "models")
-DATA_DIR = os.path.join(BASE_DIR, "data")
-os.makedirs(MODEL_DIR, exist_ok=True)
+MODELS_ROOT = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+os.makedirs(MODELS_ROOT, exist_ok=True)
+# Where artifacts are read from and written to; a staging version when run as a script
+MODEL_DIR = model_store.active_dir(MODELS_ROOT)
+
+CONTENT_TOP_K = int(os.getenv("CONTENT_TOP_K", "50"))
+ANN_LISTS = int(os.getenv("ANN_LISTS", "0")) or None  # default: sqrt(N)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "128"))
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")  # float32 | float16 | int8
+CF_TOP_K = int(os.getenv("CF_TOP_K", "50"))  # precomputed neighbors per user; 0 = compute per request
+ITEM_CF_TOP_K = int(os.getenv("ITEM_CF_TOP_K", "50"))  # co-interaction neighbors kept per product
+CF_MIN_WEIGHT = float(os.getenv("CF_MIN_WEIGHT", "0.01"))  # compaction drops entries decayed below this
+EVENT_LOG_PATH = os.path.join(DATA_DIR, LOG_FILE)
+ALS_PARAMS = {
+    "factors": int(os.getenv("ALS_FACTORS", "64")),
+    "iterations": int(os.getenv("ALS_ITERATIONS", "15")),
+    "reg": float(os.getenv("ALS_REG", "0.01")),
+    "alpha": float(os.getenv("ALS_ALPHA", "40")),
+    "cg_steps": int(os.getenv("ALS_CG_STEPS", "3")),
+}
 
 def train_content_based():
     print("🚀 Training Content-Based Model...")
@@ -24,94 +66,185 @@ def train_content_based():
         print(f"   Loaded {len(df)} products.")
         
         # Build Text Feature
-        # Combine title, description, category etc.
-        df["text"] = (
-            df["title"].fillna("") + " " +
-            df["description"].fillna("") + " " +
-            df["category_id"].astype(str) + " " + 
-            df["brand"].fillna("") # Use brand if we scraped it? Or seller_name
-        )
-        # Handle cases where columns might be missing in CSV schema
-        if "seller_name" in df.columns:
-             df["text"] += " " + df["seller_name"].fillna("")
+        df["text"] = content_text(df)
 
         # TF-IDF
-        vec = TfidfVectorizer(stop_words="english", max_features=5000)
+        vec = tfidf_vectorizer()
         tfidf_matrix = vec.fit_transform(df["text"])
-        
-        # We don't necessarily compute full similarity on big datasets (N^2), 
-        # but for recommendations we might or compute on fly. 
-        # hybrid_recommender.py computes linear_kernel on import.
-        # But we should save the matrix or the vectorizer.
-        # Existing code saves 'tfidf_vectorizer.pkl' and 'content_similarity.pkl'?
-        # Let's save both.
-        
-        # NOTE: Saving huge similarity matrix is memory intensive. 
-        # If products > 10k, this might crash low-mem environments.
-        # Assuming < 5k products for now.
-        if len(df) < 10000:
-            similarity = linear_kernel(tfidf_matrix, tfidf_matrix)
-            pickle.dump(similarity, open(os.path.join(MODEL_DIR, "content_similarity.pkl"), "wb"))
-        
+
+        # Top-K neighbor table instead of the dense N x N similarity matrix.
+        # Built in memory-bounded row blocks across all cores; memory is O(N * K).
+        neighbor_ids, neighbor_scores = build_neighbor_table(tfidf_matrix, k=CONTENT_TOP_K)
+        # Neighbor ids are catalog row positions; product_ids lets the API check
+        # they still line up with products.csv.
+        np.savez(
+            os.path.join(MODEL_DIR, "content_neighbors.npz"),
+            ids=neighbor_ids,
+            scores=neighbor_scores,
+            product_ids=df["product_id"].to_numpy(),
+        )
+        print(f"   Neighbor table: {neighbor_ids.shape[0]} x {neighbor_ids.shape[1]}")
+
         pickle.dump(vec, open(os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl"), "wb"))
         pickle.dump(tfidf_matrix, open(os.path.join(MODEL_DIR, "tfidf_matrix.pkl"), "wb"))
-        
-        # Also need indices mapping? hybrid_recommender computes it.
-        # But we should ensure product_ids.pkl matches this df order for consistency?
-        # Actually, TF-IDF relies on row index. 
-        # We might need to save the DF order or index map.
-        # The existing code reloads csv, so order is presumed stable if CSV is stable.
-        
+
+        train_ann_index(vec, tfidf_matrix, df)
+        train_dense_embeddings(tfidf_matrix, df)
+
         print("✅ Content-Based Model Trained & Saved.")
         return True
     except Exception as e:
         print(f"❌ Content Training Failed: {e}")
         return False
 
+def _sample_queries(df, encode):
+    titles = df["title"].dropna()
+    return [encode(t) for t in titles.sample(min(200, len(titles)), random_state=0)]
+
+def train_ann_index(vec, tfidf_matrix, df):
+    """IVF index for SEARCH_INDEX=ivf, plus a recall report against exact scoring."""
+    index = IVFIndex.build(tfidf_matrix, n_lists=ANN_LISTS)
+    index.save(os.path.join(MODEL_DIR, "ann_ivf.npz"), df["product_id"].to_numpy())
+    print(f"   ANN index: {index.n_lists} lists")
+
+    queries = _sample_queries(df, lambda t: vec.transform([t]))
+    for row in recall_report(index, tfidf_matrix, queries):
+        print(f"   {row}")
+
+def train_dense_embeddings(tfidf_matrix, df):
+    """LSA vectors for SEMANTIC_MODE=dense, with their own IVF index."""
+    vectors, components = embeddings.fit_lsa(tfidf_matrix, dim=EMBEDDING_DIM)
+    embeddings.save(MODEL_DIR, vectors, components, df["product_id"].to_numpy(), dtype=EMBEDDING_DTYPE)
+    print(f"   Dense embeddings: {vectors.shape[0]} x {vectors.shape[1]} ({EMBEDDING_DTYPE})")
+
+    index = IVFIndex.build(vectors, n_lists=ANN_LISTS)
+    index.save(os.path.join(MODEL_DIR, "ann_ivf_dense.npz"), df["product_id"].to_numpy())
+
+def _train_cf_models(matrix, user_ids, product_ids, events, t0, previous_rankings=None):
+    """User KNN table, item neighbors, ALS factors and cold-start rankings for one user-item matrix."""
+    # Precomputed home recommendations were scored from the previous CF artifacts
+    home_path = os.path.join(MODEL_DIR, HOME_RECS_FILE)
+    if os.path.exists(home_path):
+        os.remove(home_path)
+    model = UserKNN.from_matrix(matrix, user_ids, product_ids, top_k=CF_TOP_K)
+    model.save(MODEL_DIR)
+    print(f"   User-item matrix: {matrix.shape[0]} x {matrix.shape[1]}, {matrix.nnz} interactions")
+
+    # Item-item co-interaction neighbors ("customers also bought", CF_MODEL=item)
+    items = ItemKNN.build(matrix, user_ids, product_ids, top_k=ITEM_CF_TOP_K)
+    items.save(MODEL_DIR)
+    print(f"   Item neighbors: {items.neighbor_ids.shape[0]} x {items.neighbor_ids.shape[1]}")
+
+    # Implicit ALS factors on the same matrix, for CF_MODEL=als
+    als = ALSModel.build(matrix, user_ids, product_ids, **ALS_PARAMS)
+    als.save(MODEL_DIR)
+    print(f"   ALS factors: {als.user_factors.shape[1]} per user/product")
+
+    # Popular / trending / per-category ranked ids for cold-start users
+    rankings = popularity.build_rankings(
+        matrix, product_ids, events, load_catalog(DATA_DIR).hot, t0, previous=previous_rankings
+    )
+    popularity.save(MODEL_DIR, rankings)
+    print(f"   Rankings: {len(rankings['popular_ids'])} popular, {len(rankings['trending_ids'])} trending, "
+          f"{len(rankings['category_keys'])} categories")
+
+def _add_logged_events(model, position, t0):
+    """
+    Fold event-log entries after `position` (None: every segment on disk) into
+    `model`; returns (events, new log position).
+    """
+    events, position = read_log(EVENT_LOG_PATH, position)
+    if len(events):
+        model.add_interactions(
+            events["user_id"].tolist(), events["product_id"].tolist(), decayed_weights(events, t0)
+        )
+        print(f"   Applied {len(events)} logged events")
+    return events, position
+
 def train_collaborative_filtering():
     print("🚀 Training Collaborative Filtering (User-Item)...")
     interactions_path = os.path.join(DATA_DIR, "interactions.csv")
     
     if not os.path.exists(interactions_path) or os.path.getsize(interactions_path) < 10:
-        print("⚠️ Warning: interactions.csv missing or empty. Skipping CF training.")
-        # Create Dummy/Empty models to prevent import errors in hybrid_recommender
-        # if it expects them.
-        # But hybrid_recommender loads them unconditionallly? 
-        # Let's check: Yes, it loads user_item_matrix.pkl etc.
-        # We MUST ensure these exist even if empty/mock to avoid crashes.
-        
-        # Create dummy data
-        empty_matrix = pd.DataFrame()
-        empty_sim = np.array([])
-        pickle.dump([], open(os.path.join(MODEL_DIR, "user_ids.pkl"), "wb"))
-        pickle.dump([], open(os.path.join(MODEL_DIR, "product_ids.pkl"), "wb"))
-        pickle.dump(empty_matrix, open(os.path.join(MODEL_DIR, "user_item_matrix.pkl"), "wb"))
-        pickle.dump(empty_sim, open(os.path.join(MODEL_DIR, "user_similarity.pkl"), "wb"))
-        return
+        print("⚠️ Warning: interactions.csv missing or empty. Training on the event log only.")
+        interactions = pd.DataFrame(columns=["user_id", "product_id", "weight"])
+    else:
+        interactions = pd.read_csv(interactions_path)
 
     try:
-        interactions = pd.read_csv(interactions_path)
-        # Pivot
-        if interactions.empty:
-             raise ValueError("Empty interactions")
+        # Sparse CSR user x product matrix; no dense pivot or users x users similarity.
+        # interactions.csv counts as of now, logged events decay relative to now.
+        t0 = time.time()
+        model = UserKNN(*build_user_item(interactions))
+        events, position = _add_logged_events(model, None, t0)
+        matrix = model.matrix.to_csr()
+        if matrix.nnz == 0:
+            raise ValueError("Empty interactions")
 
-        matrix = interactions.pivot_table(index='user_id', columns='product_id', values='weight', fill_value=0)
-        user_ids = matrix.index.tolist()
-        product_ids = matrix.columns.tolist()
-        
-        similarity = cosine_similarity(matrix)
-        
-        pickle.dump(user_ids, open(os.path.join(MODEL_DIR, "user_ids.pkl"), "wb"))
-        pickle.dump(product_ids, open(os.path.join(MODEL_DIR, "product_ids.pkl"), "wb"))
-        pickle.dump(matrix, open(os.path.join(MODEL_DIR, "user_item_matrix.pkl"), "wb"))
-        pickle.dump(similarity, open(os.path.join(MODEL_DIR, "user_similarity.pkl"), "wb"))
+        # Timestamped orders (fetch_data.py writes ts) feed trending like logged events
+        if "ts" in interactions.columns:
+            orders = interactions.dropna(subset=["ts"])[["user_id", "product_id", "weight", "ts"]]
+            events = pd.concat([orders, events[["user_id", "product_id", "weight", "ts"]]], ignore_index=True)
+
+        _train_cf_models(matrix, model.user_ids, model.product_ids, events, t0)
+        write_state(MODEL_DIR, position, t0)
         
         print("✅ Collaborative Filtering Model Trained & Saved.")
+        return True
     except Exception as e:
         print(f"❌ CF Training Failed: {e}")
+        return False
+
+def compact_collaborative_filtering():
+    """
+    Periodic compaction: fold the event-log tail into the saved matrix, rebase the
+    decay reference to now, drop fully decayed entries and rebuild the neighbor
+    tables / ALS factors / rankings. Reads only the events since the last train or compaction.
+    The log is rotated first, so the next compaction (and every API load) starts
+    from a fresh segment; segments no version reads any more are pruned.
+    """
+    print("🚀 Compacting Collaborative Filtering...")
+    state = read_state(MODEL_DIR)
+    if state is None or not os.path.exists(os.path.join(MODEL_DIR, CF_FILE)):
+        print("⚠️ No CF state found. Running a full training instead.")
+        return train_collaborative_filtering()
+
+    t0 = time.time()
+    matrix, user_ids, product_ids = load_matrix(MODEL_DIR)
+    matrix.data *= rebase_factor(state["decay_t0"], t0)
+    model = UserKNN(matrix, user_ids, product_ids)
+    # Events logged from here on go to the new segment; the folded ones stay
+    # readable until no model version's state points before them
+    rotate_log(EVENT_LOG_PATH)
+    previous = state_position(state)
+    events, position = _add_logged_events(model, previous, t0)
+
+    matrix = model.matrix.to_csr()
+    matrix.data[matrix.data < CF_MIN_WEIGHT] = 0
+    matrix.eliminate_zeros()
+    _train_cf_models(
+        matrix, model.user_ids, model.product_ids, events, t0, previous_rankings=popularity.load(MODEL_DIR)
+    )
+    write_state(MODEL_DIR, position, t0)
+    pruned = prune_log(EVENT_LOG_PATH, before=previous[0])
+    if pruned:
+        print(f"   Pruned {pruned} old event-log segments")
+    print("✅ Collaborative Filtering Compacted.")
+    return True
 
 if __name__ == "__main__":
-    import numpy as np # Local import for dummy
-    train_content_based()
-    train_collaborative_filtering()
+    # python src/train_model.py [--compact]
+    # Everything is written to a staging copy of the active version and published
+    # as a new version; a running API picks it up on its next reload.
+    MODEL_DIR = model_store.stage(MODELS_ROOT)
+    if "--compact" in sys.argv:
+        trained = [compact_collaborative_filtering()]
+    else:
+        trained = [train_content_based(), train_collaborative_filtering()]
+    if any(trained):
+        version = model_store.publish(MODELS_ROOT, MODEL_DIR, catalog_fingerprint(load_catalog(DATA_DIR).hot))
+        print(f"📦 Published model version {version}")
+    else:
+        model_store.discard(MODEL_DIR)
+        print("❌ Nothing was trained. The active model version is unchanged.")
     print("🎉 Training Complete.")
@@ -0,0 +1,131 @@
+"""
+Content profiles for CF users: the interaction-weighted mean of the semantic
+vectors (TF-IDF rows or dense LSA embeddings) of the products they interacted with.
+
+A profile is kept as the weighted sum of item vectors, built from the user's
+CF matrix row the first time it is needed. After that, new events add
+weight * item vector to the sum, so a profile is never rebuilt from scratch.
+Scoring only needs the direction (cosine against unit item vectors), so the
+sum is normalized rather than divided by the total weight.
+
+Profiles live in a bounded LRU; evicted users are rebuilt on their next request.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "100000"))
+
+# Hybrid user recommendations blend CF scores (scaled to the best) with the
+# similarity of each product to the user's content profile
+HYBRID_CF_WEIGHT = float(os.getenv("HYBRID_CF_WEIGHT", "0.7"))
+HYBRID_PROFILE_WEIGHT = float(os.getenv("HYBRID_PROFILE_WEIGHT", "0.3"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "5"))  # candidates per side = n * this
+
+
+def _unit(vec):
+    """L2-normalized copy of a 1 x d profile sum (sparse or dense); None if it is all zero."""
+    if sparse.issparse(vec):
+        norm = np.sqrt(vec.multiply(vec).sum())
+    else:
+        norm = np.linalg.norm(vec)
+    if norm == 0:
+        return None
+    return vec / norm if sparse.issparse(vec) else (vec / norm).astype(np.float32)
+
+
+def profile_vectors(history, item_vectors):
+    """Unit profiles for many users at once; `history` is a CSR users x catalog-rows weight matrix."""
+    if not sparse.issparse(item_vectors):
+        item_vectors = np.asarray(item_vectors, dtype=np.float32)
+    sums = history @ item_vectors
+    if sparse.issparse(sums):
+        norms = np.sqrt(np.asarray(sums.multiply(sums).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms) @ sums
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (sums / norms).astype(np.float32)
+
+
+def blend(cand, profile_scores, cf_rows, cf_scores):
+    """
+    Hybrid scores over sorted candidate rows: HYBRID_PROFILE_WEIGHT * profile similarity
+    + HYBRID_CF_WEIGHT * CF score / best CF score for the rows CF returned.
+    """
+    blended = HYBRID_PROFILE_WEIGHT * np.asarray(profile_scores, dtype=np.float64)
+    cf_scores = np.maximum(cf_scores, 0)  # ALS scores can be negative
+    if cf_scores.size and cf_scores.max() > 0:
+        blended[np.searchsorted(cand, cf_rows)] += HYBRID_CF_WEIGHT * cf_scores / cf_scores.max()
+    return blended
+
+
+class UserProfiles:
+    """
+    Cached profile vectors over `item_vectors` (catalog rows x d).
+    `history(user_id)` returns the user's (catalog rows, weights), or None for unknown users.
+    """
+
+    def __init__(self, item_vectors, history, max_size=PROFILE_CACHE_SIZE):
+        self.item_vectors = item_vectors
+        self.history = history
+        self.max_size = max_size
+        # Held while profiles or the interactions they are built from change,
+        # so a profile built mid-update does not count the new events twice
+        self.lock = threading.Lock()
+        self._sums = OrderedDict()  # user_id -> weighted sum (1 x d)
+
+    def __len__(self):
+        return len(self._sums)
+
+    def _weighted_sum(self, rows, weights):
+        weights = np.asarray(weights, dtype=np.float32)[None, :]
+        vecs = self.item_vectors[rows]
+        if sparse.issparse(vecs):
+            return sparse.csr_matrix(weights) @ vecs
+        return weights @ np.asarray(vecs, dtype=np.float32)
+
+    def _get(self, user_id):
+        profile = self._sums.get(user_id)
+        if profile is not None:
+            self._sums.move_to_end(user_id)
+            return profile
+        hist = self.history(user_id)
+        if hist is None:
+            return None
+        rows, weights = hist
+        keep = rows >= 0  # products no longer in the catalog
+        rows, weights = rows[keep], weights[keep]
+        if rows.size == 0:
+            return None
+        profile = self._weighted_sum(rows, weights)
+        self._sums[user_id] = profile
+        if len(self._sums) > self.max_size:
+            self._sums.popitem(last=False)
+        return profile
+
+    def vector(self, user_id):
+        """Unit profile vector (1 x d, same kind as item_vectors), or None without history."""
+        with self.lock:
+            profile = self._get(user_id)
+            return None if profile is None else _unit(profile)
+
+    def add_interactions(self, users, rows, weights):
+        """
+        Fold new (user, catalog row, weight) interactions into cached profiles.
+        Call with `lock` held, together with the update of the source interactions.
+        Users without a cached profile are skipped: theirs is built from the updated data.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+        users = np.asarray(users)
+        for user_id in set(users.tolist()):
+            if user_id not in self._sums:
+                continue
+            mine = (users == user_id) & (rows >= 0)
+            if mine.any():
+                self._sums[user_id] = self._sums[user_id] + self._weighted_sum(rows[mine], weights[mine])
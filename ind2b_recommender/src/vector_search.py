@@ -0,0 +1,115 @@
+"""
+Vector scoring restricted to candidate rows + partial-sort top-k
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+
+def top_k(scores, k, min_score=0.0):
+    """Positions of the k highest scores above `min_score`, best first."""
+    keep = np.flatnonzero(scores > min_score)
+    if k <= 0 or keep.size == 0:
+        return keep[:0]
+    if keep.size > k:
+        keep = keep[np.argpartition(-scores[keep], k - 1)[:k]]
+    return keep[np.argsort(-scores[keep], kind="stable")]
+
+
+def score_rows(query_vec, matrix, rows=None):
+    """Dot product of the query against `matrix` rows (all rows when `rows` is None)."""
+    sub = matrix if rows is None else matrix[rows]
+    scores = sub @ query_vec.T
+    if sparse.issparse(scores):
+        scores = scores.toarray()
+    return np.asarray(scores).ravel()
+
+
+def search(query_vec, matrix, k, rows=None, min_score=0.0):
+    """
+    Top-k catalog rows for a query vector, scoring only the candidate `rows`.
+    Returns (rows, scores) as arrays, best first.
+    """
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return rows, np.empty(0, dtype=np.float64)
+    scores = score_rows(query_vec, matrix, rows)
+    best = top_k(scores, k, min_score)
+    hit_rows = best if rows is None else rows[best]
+    return hit_rows, scores[best]
+
+
+# ======================
+# TOP-K NEIGHBOR TABLE
+# ======================
+NEIGHBOR_BLOCK_BYTES = 64 * 1024 * 1024  # dense score block per worker
+# Working set per scored pair: the float32 block, top_k_rows' negated copy and
+# its int64 argpartition indices
+NEIGHBOR_BYTES_PER_SCORE = 4 + 4 + 8
+
+
+def top_k_rows(scores, k, min_score=0.0):
+    """
+    Per-row top-k of a dense 2-D score block -> (ids int32 [B, k], scores float32 [B, k]).
+    Best first, ties broken by lower column; slots at or below `min_score` hold id -1.
+    """
+    b, n = scores.shape
+    ids = np.full((b, k), -1, dtype=np.int32)
+    out = np.zeros((b, k), dtype=np.float32)
+    kk = min(k, n)
+    if kk <= 0 or b == 0:
+        return ids, out
+
+    part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.lexsort((part, -part_scores), axis=1)
+    part = np.take_along_axis(part, order, axis=1)
+    part_scores = np.take_along_axis(part_scores, order, axis=1)
+
+    keep = part_scores > min_score
+    ids[:, :kk] = np.where(keep, part, -1)
+    out[:, :kk] = np.where(keep, part_scores, 0)
+    return ids, out
+
+
+def _block_neighbors(matrix, start, stop, k):
+    block = matrix[start:stop] @ matrix.T  # float32 in, float32 out
+    block = block.toarray() if sparse.issparse(block) else np.asarray(block)
+    block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # never your own neighbor
+    ids, scores = top_k_rows(block, k)
+    return start, ids, scores
+
+
+def build_neighbor_table(matrix, k=50, n_jobs=None, block_bytes=NEIGHBOR_BLOCK_BYTES):
+    """
+    Per-row top-k cosine neighbors of an L2-normalized matrix.
+    Returns (ids int32 [N, k], scores float32 [N, k]); unused slots hold id -1.
+    Rows are scored in blocks so peak memory stays at ~block_bytes per worker.
+    """
+    # Cast once up front so every block product is float32 (no float64 intermediate)
+    if sparse.issparse(matrix):
+        matrix = matrix.tocsr().astype(np.float32, copy=False)
+    else:
+        matrix = np.asarray(matrix, dtype=np.float32)
+    n = matrix.shape[0]
+    ids = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if n == 0:
+        return ids, scores
+
+    block_rows = max(1, min(n, block_bytes // (NEIGHBOR_BYTES_PER_SCORE * n)))
+    starts = range(0, n, block_rows)
+    workers = n_jobs or os.cpu_count() or 1
+
+    # sparse matmul and argpartition release the GIL, so threads use all cores
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_block_neighbors, matrix, s, min(n, s + block_rows), k) for s in starts]
+        for future in futures:
+            start, block_ids, block_scores = future.result()
+            ids[start:start + len(block_ids)] = block_ids
+            scores[start:start + len(block_scores)] = block_scores
+    return ids, scores